@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import Request, HTTPException
+from metrics import Counter, register_metric
+from database import DB_POOL_MAX_SIZE
+from module import decode_jwt
+from settings import settings
+
+# Define global variables from environment, a limit of 0 turns that limiter off
+ADMISSION_DB_CONCURRENCY=int(os.getenv("ADMISSION_DB_CONCURRENCY", str(DB_POOL_MAX_SIZE * 2)))
+ADMISSION_DB_QUEUE_SIZE=int(os.getenv("ADMISSION_DB_QUEUE_SIZE", "100"))
+ADMISSION_PAYPAL_CONCURRENCY=int(os.getenv("ADMISSION_PAYPAL_CONCURRENCY", "20"))
+ADMISSION_PAYPAL_QUEUE_SIZE=int(os.getenv("ADMISSION_PAYPAL_QUEUE_SIZE", "50"))
+ADMISSION_GOOGLE_CONCURRENCY=int(os.getenv("ADMISSION_GOOGLE_CONCURRENCY", "20"))
+ADMISSION_GOOGLE_QUEUE_SIZE=int(os.getenv("ADMISSION_GOOGLE_QUEUE_SIZE", "50"))
+ADMISSION_QUEUE_TIMEOUT=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+USER_RATE_LIMIT_PER_SECOND=float(os.getenv("USER_RATE_LIMIT_PER_SECOND", "10"))
+USER_RATE_LIMIT_BURST=float(os.getenv("USER_RATE_LIMIT_BURST", "20"))
+USER_RATE_LIMIT_MAX_USERS=int(os.getenv("USER_RATE_LIMIT_MAX_USERS", "10000"))
+
+ADMISSION_REJECTIONS = register_metric(Counter(
+    "admission_rejections_total", "Requests shed by admission control and per-user rate limiting",
+    ("resource", "reason")
+))
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds the requests working on one resource at a time. Requests over the
+    limit wait in a queue of at most max_queue_size for up to queue_timeout
+    seconds, anything beyond that is shed right away with a 503
+    """
+    def __init__(self, resource: str, limit: int, max_queue_size: int, queue_timeout: float):
+        self.resource = resource
+        self.limit = limit
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max(limit, 1))
+        self.in_flight = 0
+        self.queued = 0
+
+    def _reject(self, reason: str):
+        ADMISSION_REJECTIONS.inc(self.resource, reason)
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again later !",
+            headers={"Retry-After": str(max(int(self.queue_timeout), 1))}
+        )
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            if self.queued >= self.max_queue_size:
+                self._reject("queue_full")
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout")
+            finally:
+                self.queued -= 1
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold a slot for the with block, for endpoints that only use the resource
+        for part of the request
+        """
+        if self.limit <= 0:
+            yield
+            return
+
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def __call__(self):
+        """
+        FastAPI dependency holding a slot while the endpoint runs
+        """
+        async with self.slot():
+            yield
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue_size": self.max_queue_size
+        }
+
+
+def has_api_key(request: Request):
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+
+    return scheme.lower() == "bearer" and credentials.strip() == settings.backend_api_secret_key
+
+
+class UserRateLimiter:
+    """
+    Token bucket per user email: rate tokens a second up to burst, one per
+    request. Buckets of the least recently seen users are dropped beyond max_users
+    """
+    def __init__(self, rate: float, burst: float, max_users: int):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_users = max_users
+        self._buckets = OrderedDict()
+
+    def allow(self, user_email: str):
+        """
+        Take a token from the user's bucket, returns 0 when the request may go
+        ahead, otherwise the seconds until the next token
+        """
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(user_email, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        retry_after = 0.0
+        if tokens >= 1.0:
+            tokens -= 1.0
+        else:
+            retry_after = (1.0 - tokens) / self.rate
+        self._buckets[user_email] = (tokens, now)
+        while len(self._buckets) > self.max_users:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+    async def __call__(self, request: Request):
+        """
+        FastAPI dependency answering 429 once the user of the cookie_session JWT
+        runs out of tokens. Requests without the API key or a valid session are
+        left to the endpoint and do not use up the user's tokens
+        """
+        token = request.cookies.get("cookie_session")
+        if self.rate <= 0 or not token or not has_api_key(request):
+            return
+
+        user_email = decode_jwt(token).get("email")
+        if user_email is None:
+            return
+
+        retry_after = self.allow(user_email)
+        if retry_after:
+            ADMISSION_REJECTIONS.inc("user", "rate_limited")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down !",
+                headers={"Retry-After": str(max(round(retry_after), 1))}
+            )
+
+    def stats(self):
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tracked_users": len(self._buckets)
+        }
+
+
+db_admission = ConcurrencyLimiter("db", ADMISSION_DB_CONCURRENCY, ADMISSION_DB_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT)
+paypal_admission = ConcurrencyLimiter(
+    "paypal", ADMISSION_PAYPAL_CONCURRENCY, ADMISSION_PAYPAL_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+)
+google_admission = ConcurrencyLimiter(
+    "google", ADMISSION_GOOGLE_CONCURRENCY, ADMISSION_GOOGLE_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+)
+user_rate_limiter = UserRateLimiter(USER_RATE_LIMIT_PER_SECOND, USER_RATE_LIMIT_BURST, USER_RATE_LIMIT_MAX_USERS)
+
+
+def admission_stats():
+    return {
+        "db": db_admission.stats(),
+        "paypal": paypal_admission.stats(),
+        "google": google_admission.stats()
+    }
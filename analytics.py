@@ -0,0 +1,183 @@
+"""
+Full rebuilds of subscription_monthly_summary.
+
+    python analytics.py                          # rebuild every user
+    python analytics.py --user-email a@b.com     # rebuild one user
+
+The summary is kept up to date incrementally by the subscription insert and
+delete queries. A rebuild recomputes it from subscription_tracker_list, e.g.
+after a manual data fix. Each subscription period is expanded into the months
+it covers with NumPy (an optional dependency, only needed here), and every
+month gets an equal share of the period's price, the same way the
+subscription_monthly_amounts SQL function does it.
+"""
+import re
+import sys
+import argparse
+import psycopg2
+from datetime import date
+from database import connect_kwargs, iter_query, execute_query
+
+# Define global variables
+PERIOD_MONTHS_PATTERN=re.compile(r"\d+")
+MONTH_KEY_SPAN=1 << 17
+SUMMARY_WRITE_BATCH_SIZE=10000
+
+LOCK_SUMMARY_QUERY = "LOCK TABLE subscription_monthly_summary IN EXCLUSIVE MODE"
+SUMMARY_USERS_QUERY = (
+    "SELECT DISTINCT user_email FROM subscription_monthly_summary "
+    "WHERE %(user_email)s::text IS NULL OR user_email = %(user_email)s"
+)
+DELETE_SUMMARY_QUERY = (
+    "DELETE FROM subscription_monthly_summary "
+    "WHERE %(user_email)s::text IS NULL OR user_email = %(user_email)s"
+)
+INSERT_SUMMARY_QUERY = """
+    INSERT INTO subscription_monthly_summary(user_email, month, subscription_count, total_amount)
+    SELECT * FROM unnest(%(user_emails)s::text[], %(months)s::date[], %(counts)s::int[], %(totals)s::numeric[])
+"""
+
+
+def period_months(subscription_period: str):
+    """
+    Number of months in a subscription period, like the SQL function at least one
+    """
+    match = PERIOD_MONTHS_PATTERN.search(subscription_period or "")
+
+    return max(int(match.group(0)), 1) if match else 1
+
+
+def month_index(value):
+    return value.year * 12 + value.month - 1
+
+
+def month_from_index(index: int):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def expand_monthly_amounts(user_codes, start_months, months_per_period, prices):
+    """
+    Vectorized expansion of subscription periods into (user, month) totals.
+    Takes one array entry per subscription and returns the user codes, month
+    indexes, subscription counts and amounts of every (user, month) pair
+    """
+    import numpy as np
+
+    months_per_period = np.maximum(months_per_period, 1)
+    shares = np.round(np.nan_to_num(prices) / months_per_period, 4)
+
+    # One element per covered month, its offset counts up from 0 inside each period
+    row_index = np.repeat(np.arange(len(months_per_period)), months_per_period)
+    period_starts = np.repeat(np.cumsum(months_per_period) - months_per_period, months_per_period)
+    months = start_months[row_index] + (np.arange(len(row_index)) - period_starts)
+
+    keys = user_codes[row_index].astype(np.int64) * MONTH_KEY_SPAN + months
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    totals = np.bincount(inverse, weights=shares[row_index])
+
+    return unique_keys // MONTH_KEY_SPAN, unique_keys % MONTH_KEY_SPAN, counts, totals
+
+
+def aggregate_monthly_naive(rows):
+    """
+    Row by row expansion of (user_email, subscription_period, subscription_start_date,
+    subscription_price) rows, i.e. what aggregating on every request would cost
+    """
+    summary = {}
+    for user_email, subscription_period, subscription_start_date, subscription_price in rows:
+        months = period_months(subscription_period)
+        share = round(float(subscription_price or 0) / months, 4)
+        first_month = month_index(subscription_start_date)
+        for month in range(first_month, first_month + months):
+            entry = summary.setdefault((user_email, month), [0, 0.0])
+            entry[0] += 1
+            entry[1] += share
+
+    return summary
+
+
+def summary_arrays(rows):
+    """
+    Column arrays of source rows for expand_monthly_amounts, plus the user emails by code
+    """
+    import numpy as np
+
+    user_codes = {}
+    columns = ([], [], [], [])
+    months_cache = {}
+    for user_email, subscription_period, subscription_start_date, subscription_price in rows:
+        columns[0].append(user_codes.setdefault(user_email, len(user_codes)))
+        columns[1].append(month_index(subscription_start_date))
+        if subscription_period not in months_cache:
+            months_cache[subscription_period] = period_months(subscription_period)
+        columns[2].append(months_cache[subscription_period])
+        columns[3].append(float(subscription_price) if subscription_price is not None else 0.0)
+
+    return (
+        np.array(columns[0], dtype=np.int64),
+        np.array(columns[1], dtype=np.int64),
+        np.array(columns[2], dtype=np.int64),
+        np.array(columns[3], dtype=np.float64),
+        list(user_codes)
+    )
+
+
+def rebuild_subscription_summary(connection, user_email: str = None):
+    """
+    Recompute the summary of one user or of everyone in a single transaction. The
+    summary table is locked against writes first, so subscriptions added or
+    deleted meanwhile wait and are applied on top of the rebuilt rows. The
+    subscription versions of every user whose summary was rewritten are bumped,
+    so cached analytics ETags stop matching
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LOCK_SUMMARY_QUERY)
+            cursor.execute(SUMMARY_USERS_QUERY, {"user_email": user_email})
+            changed_users = {summary_user for summary_user, in cursor.fetchall()}
+        rows = list(iter_query(connection, "get_subscription_summary_source", {"user_email": user_email}))
+
+        written = 0
+        with connection.cursor() as cursor:
+            cursor.execute(DELETE_SUMMARY_QUERY, {"user_email": user_email})
+            if rows:
+                user_codes, start_months, months_per_period, prices, user_emails = summary_arrays(rows)
+                summary = expand_monthly_amounts(user_codes, start_months, months_per_period, prices)
+                for batch_start in range(0, len(summary[0]), SUMMARY_WRITE_BATCH_SIZE):
+                    batch = slice(batch_start, batch_start + SUMMARY_WRITE_BATCH_SIZE)
+                    cursor.execute(INSERT_SUMMARY_QUERY, {
+                        "user_emails": [user_emails[code] for code in summary[0][batch].tolist()],
+                        "months": [month_from_index(index) for index in summary[1][batch].tolist()],
+                        "counts": summary[2][batch].tolist(),
+                        "totals": [round(total, 4) for total in summary[3][batch].tolist()]
+                    })
+                written = len(summary[0])
+                changed_users.update(user_emails)
+            if changed_users:
+                execute_query(cursor, "bump_subscription_versions", {"user_emails": sorted(changed_users)})
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    return {"subscriptions": len(rows), "summary_rows": written}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-email", help="only rebuild this user's summary")
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(**connect_kwargs())
+    try:
+        result = rebuild_subscription_summary(connection, args.user_email)
+        print(f"Rebuilt {result['summary_rows']} summary rows from {result['subscriptions']} subscriptions")
+    finally:
+        connection.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,43 +1,86 @@
-import os
 import time
-import httpx
 import asyncio
+import hashlib
 import traceback
+from typing import Any
 from pydantic import BaseModel
-from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, JSONResponse
-from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse
+from fastapi import FastAPI, Request, Response, HTTPException, Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from module import (create_jwt,
-                    decode_jwt,
-                    insert_new_user,
-                    insert_payment,
-                    get_paypal_access_token,
-                    get_in_progress_payment,
-                    update_payment,
-                    get_user_data,
-                    get_subs_data,
-                    insert_new_subscription_data,
-                    delete_subscription_data)
-
-# Define global variables from environment
-CLIENT_ID = os.getenv("GOOGLE_OAUTH_CLIENT_ID")
-CLIENT_SECRET = os.getenv("GOOGLE_OAUTH_CLIENT_SECRET")
-REDIRECT_URI = f"{os.getenv('ADMIN_ENDPOINT_BASE_URL')}/auth/google/callback"
-BACKEND_API_SECRET_KEY = os.getenv("BACKEND_API_SECRET_KEY")
-WEBSITE_URL=os.getenv("WEBSITE_URL")
-COOKIE_SECURE_STATE=True if str(os.getenv("COOKIE_SECURE_STATE")) == "True" else False
-COOKIE_SAMESITE=str(os.getenv("COOKIE_SAMESITE"))
-
-
-app = FastAPI()
+from serialization import (APIResponse,
+                           ContentNegotiationMiddleware,
+                           CompressionMiddleware,
+                           dumps_json,
+                           negotiated_media_type)
+from settings import settings
+from metrics import METRICS_ENABLED, MetricsMiddleware, register_collector, render_metrics
+from async_database import init_pool, close_pool, pool_stats, replica_stats
+from subscription_cache import subscription_cache
+from subscription_io import iter_import_records
+from renewal_scheduler import renewal_scheduler, RENEWAL_SCHEDULER_ENABLED
+from write_coalescer import write_coalescer, WRITE_COALESCER_ENABLED
+from admission import (db_admission,
+                       paypal_admission,
+                       google_admission,
+                       user_rate_limiter,
+                       admission_stats)
+from http_clients import init_http_clients, close_http_clients, get_http_client, http_client_stats
+from module import create_jwt, decode_jwt, jwt_cache
+from paypal_auth import get_paypal_access_token, paypal_token_cache
+from google_auth import google_jwks_cache, verify_google_id_token
+from async_module import (insert_new_user,
+                          supersede_and_insert_payment,
+                          update_payment,
+                          get_user_data,
+                          get_subs_data,
+                          get_subs_data_page,
+                          get_subscription_version,
+                          get_subscription_analytics,
+                          get_upcoming_renewals,
+                          iter_subs_data,
+                          insert_new_subscriptions_data,
+                          delete_subscriptions_data,
+                          spool_import_records,
+                          import_spooled_subscriptions,
+                          export_subscriptions_csv)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open shared resources when the application starts and release them on shutdown
+    """
+    await init_pool()
+    init_http_clients()
+    google_jwks_cache.start()
+    if RENEWAL_SCHEDULER_ENABLED:
+        renewal_scheduler.start()
+    if WRITE_COALESCER_ENABLED:
+        write_coalescer.start()
+    yield
+    await write_coalescer.stop()
+    await renewal_scheduler.stop()
+    await google_jwks_cache.stop()
+    await close_http_clients()
+    await subscription_cache.close()
+    await close_pool()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=APIResponse)
+
+app.add_middleware(ContentNegotiationMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[WEBSITE_URL],
+    allow_origins=[settings.website_url],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"]
@@ -58,35 +101,77 @@ class PaymentData(BaseModel):
     plan: str
 
 
-thread_executors = ThreadPoolExecutor(
-    max_workers=int(os.getenv("THREAD_NUMBERS"))
-)
-
-
 @app.get("/test-api")
 async def testing_api():
     return "Testing API was successful !"
 
 
-@app.post("/create-paypal-payment")
+def collect_service_stats():
+    return {
+        "db_pool": pool_stats(),
+        "db_replicas": replica_stats(),
+        "http_clients": http_client_stats(),
+        "jwt_cache": jwt_cache.stats(),
+        "google_jwks_cache": google_jwks_cache.stats(),
+        "subscription_cache": subscription_cache.stats(),
+        "renewal_scheduler": renewal_scheduler.stats(),
+        "write_coalescer": write_coalescer.stats(),
+        "admission": admission_stats(),
+        "user_rate_limiter": user_rate_limiter.stats()
+    }
+
+
+def service_stats_gauges():
+    """
+    Numeric service stats as gauges, e.g. db_pool_in_use or http_clients_in_flight{upstream="paypal"}
+    """
+    for section, section_stats in collect_service_stats().items():
+        for stat_name, value in (section_stats or {}).items():
+            if isinstance(value, dict):
+                for nested_name, nested_value in value.items():
+                    if isinstance(nested_value, (int, float)) and not isinstance(nested_value, bool):
+                        yield f"{section}_{nested_name}", f"{section} {nested_name}", {"upstream": stat_name}, nested_value
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f"{section}_{stat_name}", f"{section} {stat_name}", {}, value
+
+
+register_collector(service_stats_gauges)
+
+
+@app.get("/service-stats")
+async def service_stats(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """
+    Runtime statistics of shared resources such as the database connection pool
+    """
+    token_bearer = credentials.credentials
+    if str(token_bearer) != settings.backend_api_secret_key:
+        raise HTTPException(status_code=403, detail="Authorization was failed !")
+
+    return collect_service_stats()
+
+
+@app.get("/metrics")
+async def metrics(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """
+    Request, query and upstream latency histograms plus service stats in Prometheus text format
+    """
+    token_bearer = credentials.credentials
+    if str(token_bearer) != settings.backend_api_secret_key:
+        raise HTTPException(status_code=403, detail="Authorization was failed !")
+
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/create-paypal-payment", dependencies=[Depends(user_rate_limiter), Depends(paypal_admission)])
 async def paypal_payment(payment_data: dict,
                    credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
     token_bearer = credentials.credentials
-    if str(token_bearer) != BACKEND_API_SECRET_KEY:
+    if str(token_bearer) != settings.backend_api_secret_key:
         raise HTTPException(status_code=403, detail="Authorization was failed !")
 
-    # Updating in progress payment
-    try:
-        in_progress_payment_token = await asyncio.to_thread(get_in_progress_payment, payment_data["user_email"])
-        if in_progress_payment_token is not None:
-            await asyncio.to_thread(update_payment, in_progress_payment_token, "Failed")
-    except Exception:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail="Error on updating in progress payment")
-
     # Get access token and prepare payload data
     try:
-        access_token = await asyncio.to_thread(get_paypal_access_token)
+        access_token = await get_paypal_access_token()
         body_payload = {
             "intent": "CAPTURE",
             "purchase_units": [
@@ -98,8 +183,8 @@ async def paypal_payment(payment_data: dict,
                 }
             ],
             "application_context": {
-                "return_url": f"{os.getenv('ADMIN_ENDPOINT_BASE_URL')}/paypal-callback",
-                "cancel_url": f"{os.getenv('ADMIN_ENDPOINT_BASE_URL')}/cancel-url",
+                "return_url": f"{settings.admin_endpoint_base_url}/paypal-callback",
+                "cancel_url": f"{settings.admin_endpoint_base_url}/cancel-url",
                 "landing_page": "BILLING"
             }
         }
@@ -108,32 +193,32 @@ async def paypal_payment(payment_data: dict,
         raise HTTPException(status_code=500, detail="Error on getting payment access token and prepare payload data")
 
     # Create payment
-    async with httpx.AsyncClient() as request_client:
-        payment_response = await request_client.post(
-            url=f"{os.getenv('PAYPAL_BASE_URL')}/v2/checkout/orders/",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {access_token}"
-            },
-            json=body_payload
-        )
-        if payment_response.status_code == 201:
-            payment_response = payment_response.json()
-            # Add status and payment id (order id) to payment_data
-            payment_data["payment_status"] = "In Progress"
-            payment_data["payment_id"] = str(payment_response["id"])
-            redirect_url = [
-                link_data["href"] for link_data in payment_response["links"] if link_data["rel"] == "approve"
-            ]
-
-            # Insert in progress payment data to database
-            try:
-                await asyncio.to_thread(insert_payment, payment_data)
-            except Exception:
-                traceback.print_exc()
-                raise HTTPException(status_code=500, detail="Error on inserting payment data")
-        else:
-            redirect_url = f"{WEBSITE_URL}/error"
+    payment_response = await get_http_client("paypal").post(
+        url=f"{settings.paypal_base_url}/v2/checkout/orders/",
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {access_token}"
+        },
+        json=body_payload
+    )
+    if payment_response.status_code == 401:
+        paypal_token_cache.invalidate()
+    if payment_response.status_code == 201:
+        payment_response = payment_response.json()
+        # Add payment id (order id) to payment_data
+        payment_data["payment_id"] = str(payment_response["id"])
+        redirect_url = [
+            link_data["href"] for link_data in payment_response["links"] if link_data["rel"] == "approve"
+        ]
+
+        # Fail the previous in progress payment and insert the new one in one transaction
+        try:
+            await supersede_and_insert_payment(payment_data)
+        except Exception:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail="Error on inserting payment data")
+    else:
+        redirect_url = f"{settings.website_url}/error"
 
     json_response = {
         "payment_url": redirect_url
@@ -145,40 +230,43 @@ async def paypal_payment(payment_data: dict,
 @app.get("/cancel-url")
 async def paypal_cancel_callback():
 
-    return RedirectResponse(f"{WEBSITE_URL}/user-profile")
+    return RedirectResponse(f"{settings.website_url}/user-profile")
 
 
-@app.get("/paypal-callback")
+@app.get("/paypal-callback", dependencies=[Depends(paypal_admission), Depends(db_admission)])
 async def paypal_callback(token: str):
+    """
+    Capture the approved order and record its outcome. Admitted to the database
+    before the capture, so a busy database sheds the callback before the payment
+    is taken rather than after, when the outcome could no longer be recorded
+    """
     # Get payment access token
     try:
-        access_token = await asyncio.to_thread(get_paypal_access_token)
+        access_token = await get_paypal_access_token()
     except Exception:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Error on getting payment access token")
 
-    capture_payment_url = f"{os.getenv('PAYPAL_BASE_URL')}/v2/checkout/orders/{token}/capture"
+    capture_payment_url = f"{settings.paypal_base_url}/v2/checkout/orders/{token}/capture"
 
-    async with httpx.AsyncClient() as request_client:
-        response = await request_client.post(
-            url=capture_payment_url,
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {access_token}"
-            }
-        )
+    response = await get_http_client("paypal").post(
+        url=capture_payment_url,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {access_token}"
+        }
+    )
+    if response.status_code == 401:
+        paypal_token_cache.invalidate()
     try:
-        if response.status_code == 201:
-            await asyncio.to_thread(update_payment, token, "Paid")
-            redirect_page = "user-profile"
-        else:
-            await asyncio.to_thread(update_payment, token, "Failed")
-            redirect_page = "payment-error"
+        # Conditional update, a replayed callback keeps the status of the first one
+        payment_status = await update_payment(token, "Paid" if response.status_code == 201 else "Failed")
+        redirect_page = "user-profile" if payment_status == "Paid" else "payment-error"
     except Exception:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Error on updating payment data")
 
-    return RedirectResponse(f"{WEBSITE_URL}/{redirect_page}")
+    return RedirectResponse(f"{settings.website_url}/{redirect_page}")
     
 
 
@@ -190,65 +278,61 @@ async def auth_google():
     google_auth_url = (
         "https://accounts.google.com/o/oauth2/v2/auth"
         "?response_type=code"
-        f"&client_id={CLIENT_ID}"
-        f"&redirect_uri={REDIRECT_URI}"
+        f"&client_id={settings.google_oauth_client_id}"
+        f"&redirect_uri={settings.google_redirect_uri}"
         "&scope=openid%20email%20profile"
     )
 
     return RedirectResponse(google_auth_url)
 
 
-@app.get("/auth/google/callback")
+@app.get("/auth/google/callback", dependencies=[Depends(google_admission), Depends(db_admission)])
 async def google_callback(code: str = None,
                           error: str = None):
     """
     Process google authentication callback
     """
     if error:
-        return RedirectResponse(url=WEBSITE_URL)
+        return RedirectResponse(url=settings.website_url)
 
     # Get access token from authentication process
     token_url = "https://oauth2.googleapis.com/token"
     data = {
         "code": code,
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "redirect_uri": REDIRECT_URI,
+        "client_id": settings.google_oauth_client_id,
+        "client_secret": settings.google_oauth_client_secret,
+        "redirect_uri": settings.google_redirect_uri,
         "grant_type": "authorization_code",
     }
     try:
-        async with httpx.AsyncClient() as request_client:
-            auth_response = await request_client.post(token_url, data=data)
-            token_data = auth_response.json()
-            access_token = token_data.get("access_token")
-
-            # Get user's data from available access token
-            userinfo_url = "https://www.googleapis.com/oauth2/v1/userinfo"
-            userinfo_res = await request_client.get(
-                userinfo_url, headers={"Authorization": f"Bearer {access_token}"}
-            )
-            user = userinfo_res.json()
+        auth_response = await get_http_client("google").post(token_url, data=data)
+        token_data = auth_response.json()
+
+        # Get user's data from the id_token, verified locally against Google's cached signing keys
+        user = await verify_google_id_token(token_data["id_token"], settings.google_oauth_client_id)
 
         # Create JWT token for transfering the file securely
         payload = {
             "email": user["email"],
-            "name": user["name"]
+            "name": user.get("name", user["email"])
         }
-        jwt_token = create_jwt(payload)
 
-        # Get user's profile data from database and redirect to specific page
-        user_profile_data = await asyncio.to_thread(get_user_data, user["email"])
+        # Get user's profile data from database while the JWT is created, then redirect to specific page
+        jwt_token, user_profile_data = await asyncio.gather(
+            asyncio.to_thread(create_jwt, payload),
+            get_user_data(user["email"])
+        )
         endpoint = "signup" if not user_profile_data else "dashboard"
 
-        response = RedirectResponse(url=f"{WEBSITE_URL}/{endpoint}")
+        response = RedirectResponse(url=f"{settings.website_url}/{endpoint}")
 
         # Set cookie to the client
         response.set_cookie(
             key='cookie_session',
             value=jwt_token,
             httponly=True,
-            secure=COOKIE_SECURE_STATE,
-            samesite=COOKIE_SAMESITE,
+            secure=settings.cookie_secure_state,
+            samesite=settings.cookie_samesite,
             path="/",
             expires=datetime.now(timezone.utc) + timedelta(hours=4)
         )
@@ -266,22 +350,22 @@ async def logout(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer(
     cookie will be deleted
     """
     token_bearer = credentials.credentials
-    if str(token_bearer) != BACKEND_API_SECRET_KEY:
+    if str(token_bearer) != settings.backend_api_secret_key:
         raise HTTPException(status_code=403, detail="Authorization was failed !")
 
     response = JSONResponse({"status_code": 200, "message": "successfully logout !"})
     response.delete_cookie(
         key="cookie_session",
         httponly=True,
-        secure=COOKIE_SECURE_STATE,
-        samesite=COOKIE_SAMESITE,
+        secure=settings.cookie_secure_state,
+        samesite=settings.cookie_samesite,
         path="/"
     )
 
     return response
 
 
-@app.post("/insert-new-user")
+@app.post("/insert-new-user", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
 async def insert_user(json_data: dict,
                       request: Request,
                       credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
@@ -289,7 +373,7 @@ async def insert_user(json_data: dict,
     When there is a new user signs up, this endpoint will inserts his/her data to database
     """
     token_bearer = credentials.credentials
-    if str(token_bearer) != BACKEND_API_SECRET_KEY:
+    if str(token_bearer) != settings.backend_api_secret_key:
         raise HTTPException(status_code=403, detail="Authorization was failed !")
 
     try:
@@ -299,7 +383,7 @@ async def insert_user(json_data: dict,
             redirect_url = "/login"
         else:
             json_data["email"] = data["email"]
-            await asyncio.to_thread(insert_new_user, json_data)
+            await insert_new_user(json_data)
             redirect_url = "/user-profile"
 
         json_data = {
@@ -315,32 +399,233 @@ async def insert_user(json_data: dict,
 
 
 
-@app.get("/get-subscription-data")
+async def ndjson_subscription_rows(user_email: str):
+    async for subscription_row in iter_subs_data(user_email):
+        yield dumps_json(subscription_row) + b"\n"
+
+
+def subscription_etag(request: Request, version: int, *variant):
+    """
+    ETag of a subscription response, a hash of the user's subscription version in
+    the database, the negotiated media type and the query parameters that shape
+    the representation
+    """
+    media_type = negotiated_media_type(request.headers.get("accept", ""))
+
+    return f'"{hashlib.sha1(repr((version, media_type, *variant)).encode()).hexdigest()[:20]}"'
+
+
+def etag_matches(request: Request, etag: str):
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def etag_headers(etag: str):
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+
+
+def not_modified_response(etag: str):
+    return Response(status_code=304, headers=etag_headers(etag))
+
+
+@app.get("/get-subscription-data", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
 async def get_subscription_data(request: Request,
+                                limit: int = None,
+                                cursor: str = None,
+                                format: str = "json",
                                 credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
     """
-    
+    Return the user's subscriptions. With limit it returns one keyset page and a
+    next_cursor to pass back for the following page, with format=ndjson the rows are
+    streamed one JSON object per line straight from a server-side cursor. Responses
+    carry an ETag and a matching If-None-Match gets a 304 after a single version lookup
     """
     token_bearer = credentials.credentials
-    if str(token_bearer) != BACKEND_API_SECRET_KEY:
+    if str(token_bearer) != settings.backend_api_secret_key:
         raise HTTPException(status_code=403, detail="Authorization was failed !")
 
     try:
         token = request.cookies.get("cookie_session")
         cookie_data = decode_jwt(token)
         if "email" not in cookie_data.keys():
-            return RedirectResponse(f"{WEBSITE_URL}/login")
+            return RedirectResponse(f"{settings.website_url}/login")
+
+        # Nothing changed since the client's copy, skip the query and the serialization
+        version = await get_subscription_version(cookie_data["email"])
+        etag = subscription_etag(request, version, "subscriptions", format, limit, cursor)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
 
         # Get data from database
-        subscription_data = await asyncio.to_thread(get_subs_data, cookie_data["email"])
-        return subscription_data
+        if format == "ndjson":
+            return StreamingResponse(
+                ndjson_subscription_rows(cookie_data["email"]),
+                media_type="application/x-ndjson",
+                headers=etag_headers(etag)
+            )
+        if limit is not None:
+            try:
+                subscription_page = await get_subs_data_page(cookie_data["email"], limit, cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid pagination cursor !")
+            return APIResponse(subscription_page, headers=etag_headers(etag))
+
+        # Returned as a response so the serializer formats the dates, not jsonable_encoder
+        subscription_data = await get_subs_data(cookie_data["email"], version)
+        return APIResponse(subscription_data, headers=etag_headers(etag))
+    except HTTPException:
+        raise
     except:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Error getting user profile data !")
     
 
 
-@app.post("/add-subscription")
+@app.post("/import-subscriptions", dependencies=[Depends(user_rate_limiter)])
+async def import_subscriptions(request: Request,
+                               format: str = "csv",
+                               credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """
+    Import the user's subscriptions from a CSV (with a header row) or NDJSON upload with the
+    subscription_name, subscription_period, subscription_start_date and optional
+    subscription_price fields. The upload is parsed and validated while it streams in,
+    invalid rows are reported and skipped. The database, and its admission slot, is only
+    used once the whole upload has arrived
+    """
+    token_bearer = credentials.credentials
+    if str(token_bearer) != settings.backend_api_secret_key:
+        raise HTTPException(status_code=403, detail="Authorization was failed !")
+
+    token = request.cookies.get("cookie_session")
+    cookie_data = decode_jwt(token)
+    if "email" not in cookie_data.keys():
+        return RedirectResponse(f"{settings.website_url}/login")
+
+    try:
+        records = iter_import_records(request.stream(), format)
+        spool, import_result = await spool_import_records(cookie_data["email"], records)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=f"Invalid import file: {error}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=408, detail="Import upload timed out !")
+    except Exception:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Importing data was failed !")
+
+    try:
+        async with db_admission.slot():
+            await import_spooled_subscriptions(cookie_data["email"], spool)
+    except HTTPException:
+        raise
+    except Exception:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Importing data was failed !")
+    finally:
+        spool.close()
+
+    json_response = {
+        "status": 200,
+        "message": f"{import_result['imported']} subscriptions were imported !",
+        **import_result
+    }
+
+    return json_response
+
+
+@app.get("/export-subscriptions", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
+async def export_subscriptions(request: Request,
+                               format: str = "csv",
+                               credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """
+    Stream every active subscription of the user as a CSV (COPY TO) or NDJSON download
+    """
+    token_bearer = credentials.credentials
+    if str(token_bearer) != settings.backend_api_secret_key:
+        raise HTTPException(status_code=403, detail="Authorization was failed !")
+
+    token = request.cookies.get("cookie_session")
+    cookie_data = decode_jwt(token)
+    if "email" not in cookie_data.keys():
+        return RedirectResponse(f"{settings.website_url}/login")
+
+    if format == "csv":
+        return StreamingResponse(
+            export_subscriptions_csv(cookie_data["email"]),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="subscriptions.csv"'}
+        )
+    if format == "ndjson":
+        return StreamingResponse(
+            ndjson_subscription_rows(cookie_data["email"]),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": 'attachment; filename="subscriptions.ndjson"'}
+        )
+
+    raise HTTPException(status_code=400, detail="Unsupported export format !")
+
+
+@app.get("/upcoming-renewals", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
+async def upcoming_renewals(request: Request,
+                            limit: int = 20,
+                            credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """
+    The user's subscriptions that end within the renewal scheduler horizon, earliest first
+    """
+    token_bearer = credentials.credentials
+    if str(token_bearer) != settings.backend_api_secret_key:
+        raise HTTPException(status_code=403, detail="Authorization was failed !")
+
+    token = request.cookies.get("cookie_session")
+    cookie_data = decode_jwt(token)
+    if "email" not in cookie_data.keys():
+        return RedirectResponse(f"{settings.website_url}/login")
+
+    list_renewal_data = await get_upcoming_renewals(cookie_data["email"], max(limit, 0))
+    json_response = {
+        "data": {
+            "user_email": cookie_data["email"],
+            "list_data": list_renewal_data
+        }
+    }
+
+    return APIResponse(json_response)
+
+
+@app.get("/subscription-analytics", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
+async def subscription_analytics(request: Request,
+                                 year: int = None,
+                                 credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """
+    Monthly and yearly totals of the user's tracked subscriptions
+    """
+    token_bearer = credentials.credentials
+    if str(token_bearer) != settings.backend_api_secret_key:
+        raise HTTPException(status_code=403, detail="Authorization was failed !")
+
+    token = request.cookies.get("cookie_session")
+    cookie_data = decode_jwt(token)
+    if "email" not in cookie_data.keys():
+        return RedirectResponse(f"{settings.website_url}/login")
+
+    version = await get_subscription_version(cookie_data["email"])
+    etag = subscription_etag(request, version, "analytics", year)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+
+    try:
+        subscription_analytics_data = await get_subscription_analytics(cookie_data["email"], year)
+        return APIResponse(subscription_analytics_data, headers=etag_headers(etag))
+    except Exception:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Error on getting subscription analytics")
+
+
+@app.post("/add-subscription", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
 async def add_subscription(json_data: dict,
                            credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
     """
@@ -348,11 +633,11 @@ async def add_subscription(json_data: dict,
     the database
     """
     token_bearer = credentials.credentials
-    if str(token_bearer) != BACKEND_API_SECRET_KEY:
+    if str(token_bearer) != settings.backend_api_secret_key:
         raise HTTPException(status_code=403, detail="Authorization was failed !")
 
     try:
-        await asyncio.to_thread(insert_new_subscription_data, json_data)
+        await write_coalescer.submit("insert", json_data)
         json_result = {
             "status": 200,
             "message": "Data was successfully updated !"
@@ -364,15 +649,15 @@ async def add_subscription(json_data: dict,
         raise HTTPException(status_code=500, detail="Updating data was failed !")
     
 
-@app.post("/delete-subscription")
+@app.post("/delete-subscription", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
 async def delete_subscription(json_data: dict,
                               credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
     token_bearer = credentials.credentials
-    if str(token_bearer) != BACKEND_API_SECRET_KEY:
+    if str(token_bearer) != settings.backend_api_secret_key:
         raise HTTPException(status_code=403, detail="Authorization was failed !")
     
     try:
-        await asyncio.to_thread(delete_subscription_data, json_data)
+        await write_coalescer.submit("delete", json_data)
 
         json_result = {
             "status": 200,
@@ -382,4 +667,54 @@ async def delete_subscription(json_data: dict,
         return json_result
     except Exception:
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail="Deleting data was failed !")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Deleting data was failed !")
+
+
+@app.post("/add-subscriptions", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
+async def add_subscriptions(json_data: list[Any],
+                            credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """
+    Add many subscriptions at once (e.g. when importing them), every item has the same
+    fields as /add-subscription and gets its own result in the response
+    """
+    token_bearer = credentials.credentials
+    if str(token_bearer) != settings.backend_api_secret_key:
+        raise HTTPException(status_code=403, detail="Authorization was failed !")
+
+    try:
+        results = await insert_new_subscriptions_data(json_data)
+        json_result = {
+            "status": 200,
+            "message": "Data was successfully updated !",
+            "results": results
+        }
+
+        return json_result
+    except Exception:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Updating data was failed !")
+
+
+@app.post("/delete-subscriptions", dependencies=[Depends(user_rate_limiter), Depends(db_admission)])
+async def delete_subscriptions(json_data: list[Any],
+                               credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    """
+    Delete many subscriptions at once, every item has the same fields as /delete-subscription
+    and gets its own result in the response
+    """
+    token_bearer = credentials.credentials
+    if str(token_bearer) != settings.backend_api_secret_key:
+        raise HTTPException(status_code=403, detail="Authorization was failed !")
+
+    try:
+        results = await delete_subscriptions_data(json_data)
+        json_result = {
+            "status": 200,
+            "message": "Data was successfully deleted !",
+            "results": results
+        }
+
+        return json_result
+    except Exception:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Deleting data was failed !")
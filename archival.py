@@ -0,0 +1,309 @@
+"""
+Archival of soft-deleted subscriptions.
+
+    python archival.py                                  # archive rows deleted before the retention window
+    python archival.py --retention-days 30 --batch-size 500
+
+Meant to run periodically, e.g. daily from cron. Rows soft-deleted more than
+the retention window ago are moved from subscription_tracker_list to
+subscription_tracker_list_archive in batches, each its own short transaction:
+the batch is picked with FOR UPDATE SKIP LOCKED and moved with one
+DELETE ... RETURNING / INSERT statement, so user traffic never waits on the job.
+
+When the table was range-partitioned with
+migrations/optional/partition_subscription_tracker_list.sql, every monthly
+partition past the retention window is detached concurrently, copied to the
+archive and dropped instead, and partitions for the coming months are attached
+ahead. Both only take SHARE UPDATE EXCLUSIVE on subscription_tracker_list, which
+does not block reads or writes. A month left detached or half detached by an
+interrupted run is finished by the next one. The table is vacuumed afterwards
+and the table and index sizes reported.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import psycopg2
+from datetime import datetime, timezone, timedelta
+from database import QUERIES, connect_kwargs
+
+# Define global variables from environment
+ARCHIVE_RETENTION_DAYS=int(os.getenv("ARCHIVE_RETENTION_DAYS", "90"))
+ARCHIVE_BATCH_SIZE=int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_BATCH_PAUSE_MS=float(os.getenv("ARCHIVE_BATCH_PAUSE_MS", "100"))
+ARCHIVE_PARTITION_MONTHS_AHEAD=int(os.getenv("ARCHIVE_PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_NAME_PATTERN=re.compile(r"^subscription_tracker_list_p(\d{4})(\d{2})$")
+ARCHIVED_TABLES=("subscription_tracker_list", "subscription_tracker_list_archive")
+
+IS_PARTITIONED_QUERY = "SELECT relkind = 'p' FROM pg_class WHERE oid = 'subscription_tracker_list'::regclass"
+# Monthly partitions, attached or not: inhdetachpending is NULL once detached and true while a
+# DETACH ... CONCURRENTLY was interrupted before it finished
+PARTITIONS_QUERY = """
+    SELECT child.relname, pg_inherits.inhdetachpending
+    FROM pg_class child
+    LEFT JOIN pg_inherits
+        ON pg_inherits.inhrelid = child.oid
+        AND pg_inherits.inhparent = 'subscription_tracker_list'::regclass
+    WHERE child.relkind = 'r'
+        AND child.relnamespace = 'public'::regnamespace
+        AND child.relname ~ '^subscription_tracker_list_p[0-9]{6}$'
+"""
+ENSURE_PARTITIONS_QUERY = "SELECT ensure_subscription_list_partitions(%(months_from)s, %(months_until)s)"
+ARCHIVE_PARTITION_QUERY = """
+    INSERT INTO subscription_tracker_list_archive(
+        id, user_id, user_email, subscription_name, subscription_period,
+        subscription_start_date, subscription_end_date, subscription_price, deleted_at, archived_at
+    )
+    SELECT
+        id, user_id, user_email, subscription_name, subscription_period,
+        subscription_start_date, subscription_end_date, subscription_price, deleted_at, %(archived_at)s
+    FROM {partition}
+    ON CONFLICT (id) DO UPDATE
+    SET user_id = excluded.user_id,
+        user_email = excluded.user_email,
+        subscription_name = excluded.subscription_name,
+        subscription_period = excluded.subscription_period,
+        subscription_start_date = excluded.subscription_start_date,
+        subscription_end_date = excluded.subscription_end_date,
+        subscription_price = excluded.subscription_price,
+        deleted_at = excluded.deleted_at,
+        archived_at = excluded.archived_at
+"""
+TABLE_SIZE_QUERY = """
+    SELECT
+        COALESCE(sum(pg_table_size(relid)), 0),
+        COALESCE(sum(pg_indexes_size(relid)), 0),
+        COALESCE(sum(GREATEST(pg_class.reltuples, 0)), 0)::bigint
+    FROM pg_partition_tree(%(table)s::regclass) tree
+    JOIN pg_class ON pg_class.oid = tree.relid
+    WHERE tree.isleaf
+"""
+
+
+def utc_now():
+    return datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+
+
+def is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(IS_PARTITIONED_QUERY)
+        partitioned = cursor.fetchone()[0]
+    connection.commit()
+
+    return partitioned
+
+
+def expired_partitions(connection, deleted_before: datetime):
+    """
+    Monthly partitions whose whole month lies before deleted_before, oldest
+    first, as (name, detach_pending) with detach_pending None when the
+    partition is already detached
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(PARTITIONS_QUERY)
+        rows = cursor.fetchall()
+    connection.commit()
+
+    partitions = []
+    for partition_name, detach_pending in rows:
+        match = PARTITION_NAME_PATTERN.match(partition_name)
+        if match is None:
+            continue
+        year, month = int(match.group(1)), int(match.group(2))
+        month_end = datetime(year + month // 12, month % 12 + 1, 1)
+        if month_end <= deleted_before:
+            partitions.append((month_end, partition_name, detach_pending))
+
+    return [(partition_name, detach_pending) for _, partition_name, detach_pending in sorted(partitions)]
+
+
+def archive_partitions(connection, deleted_before: datetime):
+    """
+    Detach every expired monthly partition without blocking the table, copy its
+    rows to the archive and drop it. Returns the number of rows archived
+    """
+    archived = 0
+    for partition_name, detach_pending in expired_partitions(connection, deleted_before):
+        # DETACH ... CONCURRENTLY cannot run inside a transaction block. It works because the
+        # active rows are in a range partition, Postgres refuses it next to a DEFAULT partition
+        if detach_pending is not None:
+            connection.autocommit = True
+            try:
+                with connection.cursor() as cursor:
+                    detach_mode = "FINALIZE" if detach_pending else "CONCURRENTLY"
+                    cursor.execute(
+                        f"ALTER TABLE subscription_tracker_list DETACH PARTITION {partition_name} {detach_mode}"
+                    )
+            finally:
+                connection.autocommit = False
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(ARCHIVE_PARTITION_QUERY.format(partition=partition_name), {"archived_at": utc_now()})
+                archived += cursor.rowcount
+                cursor.execute(f"DROP TABLE {partition_name}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        print(f"Archived partition {partition_name}")
+
+    return archived
+
+
+def ensure_partitions(connection, months_ahead: int):
+    """
+    Attach the monthly partitions up to months_ahead months from now, returns how many were created
+    """
+    now = utc_now()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(ENSURE_PARTITIONS_QUERY, {
+                "months_from": now.date(),
+                "months_until": (now + timedelta(days=31 * months_ahead)).date()
+            })
+            created = cursor.fetchone()[0]
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    return created
+
+
+def archive_batches(connection,
+                    deleted_before: datetime,
+                    batch_size: int,
+                    pause_seconds: float,
+                    max_batches: int = None):
+    """
+    Move rows soft-deleted before deleted_before to the archive batch by batch,
+    one short transaction per batch with a pause in between. Returns the number
+    of rows archived and batches run
+    """
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(QUERIES["archive_deleted_subscriptions"].pyformat_text, {
+                    "deleted_before": deleted_before,
+                    "batch_size": batch_size,
+                    "archived_at": utc_now()
+                })
+                moved = cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+        archived += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        time.sleep(pause_seconds)
+
+    return archived, batches
+
+
+def vacuum(connection):
+    """
+    Make the space of the moved rows reusable and refresh the planner statistics
+    """
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM (ANALYZE) subscription_tracker_list")
+    finally:
+        connection.autocommit = False
+
+
+def table_sizes(connection):
+    """
+    Table bytes, index bytes and estimated rows of the live and the archive table,
+    summed over the partitions of a partitioned table
+    """
+    sizes = {}
+    with connection.cursor() as cursor:
+        for table in ARCHIVED_TABLES:
+            cursor.execute(TABLE_SIZE_QUERY, {"table": table})
+            table_bytes, index_bytes, estimated_rows = cursor.fetchone()
+            sizes[table] = {
+                "table_bytes": int(table_bytes),
+                "index_bytes": int(index_bytes),
+                "estimated_rows": int(estimated_rows)
+            }
+    connection.commit()
+
+    return sizes
+
+
+def archive_deleted_subscriptions(connection,
+                                  retention_days: int = ARCHIVE_RETENTION_DAYS,
+                                  batch_size: int = ARCHIVE_BATCH_SIZE,
+                                  pause_seconds: float = ARCHIVE_BATCH_PAUSE_MS / 1000,
+                                  max_batches: int = None,
+                                  run_vacuum: bool = True):
+    deleted_before = utc_now() - timedelta(days=retention_days)
+    result = {"deleted_before": deleted_before.isoformat(), "archived": 0, "batches": 0, "partitions_created": 0}
+
+    if is_partitioned(connection):
+        result["archived"] += archive_partitions(connection, deleted_before)
+        result["partitions_created"] = ensure_partitions(connection, ARCHIVE_PARTITION_MONTHS_AHEAD)
+
+    # Also picks up rows of a partitioned table that are not in an expired partition yet
+    archived, batches = archive_batches(connection, deleted_before, batch_size, pause_seconds, max_batches)
+    result["archived"] += archived
+    result["batches"] = batches
+
+    if run_vacuum and result["archived"]:
+        vacuum(connection)
+    result["sizes"] = table_sizes(connection)
+
+    return result
+
+
+def format_bytes(size: int):
+    for unit in ("B", "kB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} TB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, default=ARCHIVE_RETENTION_DAYS,
+                        help="archive rows soft-deleted longer ago than this")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--pause-ms", type=float, default=ARCHIVE_BATCH_PAUSE_MS, help="pause between batches")
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip the VACUUM (ANALYZE) afterwards")
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(**connect_kwargs())
+    try:
+        result = archive_deleted_subscriptions(
+            connection,
+            retention_days=args.retention_days,
+            batch_size=max(args.batch_size, 1),
+            pause_seconds=args.pause_ms / 1000,
+            max_batches=args.max_batches,
+            run_vacuum=not args.no_vacuum
+        )
+    finally:
+        connection.close()
+
+    print(f"Archived {result['archived']} rows deleted before {result['deleted_before']} "
+          f"in {result['batches']} batches, created {result['partitions_created']} partitions")
+    for table, sizes in result["sizes"].items():
+        print(f"{table}: ~{sizes['estimated_rows']} rows, table {format_bytes(sizes['table_bytes'])}, "
+              f"indexes {format_bytes(sizes['index_bytes'])}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
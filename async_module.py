@@ -0,0 +1,373 @@
+import asyncio
+from decimal import Decimal
+from datetime import datetime, timezone, timedelta
+from metrics import timed_db_operation, db_phase
+from async_database import (fetch,
+                            fetchrow,
+                            execute,
+                            stream,
+                            stream_copy,
+                            transaction,
+                            query_args,
+                            stick_to_primary)
+from subscription_cache import subscription_cache
+from renewal_scheduler import RENEWAL_SCHEDULER_HORIZON_DAYS, utc_now
+from subscription_io import (IMPORT_COLUMNS,
+                             SUBSCRIPTION_IMPORT_MAX_ERRORS,
+                             SUBSCRIPTION_IMPORT_TIMEOUT,
+                             ImportSpool,
+                             iter_record_chunks)
+from module import (subscription_row_to_dict,
+                    parse_subscription_price,
+                    calculate_subscription_end_date,
+                    page_query_params,
+                    build_subscription_page,
+                    build_subscription_analytics,
+                    prepare_bulk_subscriptions,
+                    prepare_bulk_deletions,
+                    resolve_bulk_deletions)
+
+# Async versions of the data functions in module.py, awaited directly by api.py.
+# The sync versions stay in module.py for scripts.
+
+
+@timed_db_operation
+async def insert_new_user(json_data):
+    """
+    Insert new user after signing up
+    """
+    values = {
+        "name": json_data["name"],
+        "email": json_data["email"],
+        "address": json_data["address"],
+        "phone_number": json_data["phone_number"],
+        "created_at": datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    }
+    await execute("insert_new_user", values)
+    await stick_to_primary(values["email"])
+
+
+@timed_db_operation
+async def insert_payment(payment_data: dict):
+    """
+    Insert payments
+    """
+    values = {
+        "user_id": payment_data["user_id"],
+        "user_email": payment_data["user_email"],
+        "amount": Decimal(str(payment_data["amount"])),
+        "total_balance": payment_data["total_balance"],
+        "balance_duration_days": payment_data["balance_duration_days"],
+        "plan": payment_data["plan"],
+        "payment_status": payment_data["payment_status"],
+        "payment_id": payment_data["payment_id"],
+        "created_at": datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+    }
+    await execute("insert_payment", values)
+    await stick_to_primary(values["user_email"])
+
+
+@timed_db_operation
+async def get_in_progress_payment(user_email: str):
+    row = await fetchrow("get_in_progress_payment", {"email": str(user_email)}, read_only=True, user_email=user_email)
+    payment_token = row["payment_id"] if row is not None else None
+
+    return payment_token
+
+
+@timed_db_operation
+async def supersede_and_insert_payment(payment_data: dict):
+    """
+    Fail the user's in progress payments and insert the new one in a single
+    transaction, returns the superseded payment ids
+    """
+    values = {
+        "user_id": payment_data["user_id"],
+        "user_email": payment_data["user_email"],
+        "amount": Decimal(str(payment_data["amount"])),
+        "total_balance": payment_data["total_balance"],
+        "balance_duration_days": payment_data["balance_duration_days"],
+        "plan": payment_data["plan"],
+        "payment_id": payment_data["payment_id"],
+        "created_at": datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+    }
+    async with transaction() as connection:
+        with db_phase("execute"):
+            # Serializes concurrent checkouts of the same email
+            await connection.execute(*query_args("lock_user_payments", {"user_email": values["user_email"]}))
+            row = await connection.fetchrow(*query_args("supersede_and_insert_payment", values))
+    await stick_to_primary(values["user_email"])
+
+    return list(row["superseded_payment_ids"])
+
+
+@timed_db_operation
+async def update_payment(payment_id: str,
+                         payment_status: str):
+    """
+    Move an in progress payment to its final status, replays leave a final
+    status as it is. Returns the status the payment ends up with
+    """
+    values = {
+        "payment_id": str(payment_id),
+        "payment_status": str(payment_status),
+        "updated_at": datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+    }
+    row = await fetchrow("update_payment", values)
+
+    return row["payment_status"] if row is not None else None
+
+
+@timed_db_operation
+async def get_user_data(email: str):
+    rows = await fetch("get_user_data", {"email": email}, read_only=True, user_email=email)
+
+    return [{"email": row["email"]} for row in rows]
+
+
+@timed_db_operation
+async def load_subs_data(user_email: str):
+    rows = await fetch("get_list_subscription", {"user_email": str(user_email)}, read_only=True, user_email=user_email)
+
+    subscription_data = {
+        "data": {
+            "user_email": user_email,
+            "list_data": [subscription_row_to_dict(row) for row in rows]
+        }
+    }
+
+    return subscription_data
+
+
+@timed_db_operation
+async def get_subscription_version(user_email: str):
+    """
+    Version of the user's subscription list, bumped by the database on every
+    write to it. Read it before the data it describes
+    """
+    row = await fetchrow("get_subscription_version", {"user_email": str(user_email)},
+                         read_only=True, user_email=user_email)
+
+    return row["version"]
+
+
+async def get_subs_data(user_email: str, version: int):
+    """
+    Subscription list of a user at version, served from the subscription cache
+    when it holds that version
+    """
+    return await subscription_cache.get_or_load(str(user_email), version, load_subs_data)
+
+
+@timed_db_operation
+async def get_subs_data_page(user_email: str,
+                             limit: int,
+                             page_cursor: str = None):
+    """
+    One keyset page of the user's subscriptions ordered by end date
+    """
+    params, limit = page_query_params(user_email, limit, page_cursor)
+    rows = await fetch("get_list_subscription_page", params, read_only=True, user_email=user_email)
+
+    return build_subscription_page(user_email, rows, limit)
+
+
+@timed_db_operation
+async def get_subscription_analytics(user_email: str, year: int = None):
+    """
+    Monthly and yearly spending served from the incrementally maintained summary
+    """
+    rows = await fetch(
+        "get_subscription_summary", {"user_email": str(user_email)}, read_only=True, user_email=user_email
+    )
+
+    return build_subscription_analytics(user_email, rows, year)
+
+
+@timed_db_operation
+async def get_upcoming_renewals(user_email: str, limit: int):
+    """
+    The user's subscriptions ending within the renewal scheduler horizon, earliest
+    first. Read from the database so every worker answers the same
+    """
+    now = utc_now()
+    rows = await fetch("get_upcoming_renewals", {
+        "user_email": str(user_email),
+        "from_end_date": now,
+        "horizon_end_date": now + timedelta(days=RENEWAL_SCHEDULER_HORIZON_DAYS),
+        "limit": limit
+    }, read_only=True, user_email=user_email)
+
+    return [
+        {
+            "subscription_name": subscription_name,
+            "subscription_period": subscription_period,
+            "subscription_end_date": subscription_end_date
+        }
+        for subscription_name, subscription_period, subscription_end_date in rows
+    ]
+
+
+async def iter_subs_data(user_email: str):
+    """
+    Yield the user's active subscriptions one at a time from a server-side cursor
+    """
+    rows = stream("get_list_subscription", {"user_email": str(user_email)}, read_only=True, user_email=user_email)
+    async for row in rows:
+        yield subscription_row_to_dict(row)
+
+
+@timed_db_operation
+async def insert_new_subscription_data(data: dict):
+    subs_end_date = calculate_subscription_end_date(data["subscription_start_date"], data["subscription_period"])
+    values = {
+       "user_email": data["user_email"],
+       "subscription_name": data["subscription_name"],
+       "subscription_period": data["subscription_period"],
+       "subscription_start_date": datetime.strptime(data["subscription_start_date"], "%Y-%m-%d"),
+       "subscription_end_date": subs_end_date,
+       "subscription_price": parse_subscription_price(data.get("subscription_price"))
+    }
+    await execute("insert_new_subscription", values)
+    await stick_to_primary(values["user_email"])
+    await subscription_cache.invalidate(str(data["user_email"]))
+
+
+@timed_db_operation
+async def delete_subscription_data(data: dict):
+    values = {
+        "user_email": str(data["email"]),
+        "subscription_name": str(data["deleted_subs_name"]),
+        "deleted_at": datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+    }
+    await execute("delete_subscription_data", values)
+    await stick_to_primary(values["user_email"])
+    await subscription_cache.invalidate(str(data["email"]))
+
+
+async def insert_subscriptions_rows(list_data: list):
+    """
+    Insert many subscriptions with one multi-row statement and one commit.
+    Returns the per-item results and the emails of the users written to,
+    whose post-commit side effects are left to the caller
+    """
+    columns, results = prepare_bulk_subscriptions(list_data)
+    if columns["user_emails"]:
+        await execute("insert_new_subscriptions_bulk", columns)
+
+    return results, set(columns["user_emails"])
+
+
+async def delete_subscriptions_rows(list_data: list):
+    """
+    Soft delete many subscriptions with one multi-row statement and one commit.
+    Returns the per-item results and the emails of the users written to
+    """
+    columns, results = prepare_bulk_deletions(list_data)
+    deleted_rows = []
+    if columns["user_emails"]:
+        values = {
+            **columns,
+            "deleted_at": datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+        }
+        deleted_rows = await fetch("delete_subscriptions_bulk", values)
+
+    return resolve_bulk_deletions(columns, results, deleted_rows), set(columns["user_emails"])
+
+
+async def after_subscription_writes(user_emails: set):
+    """
+    Side effects of committed subscription writes: read-your-writes and cache invalidation
+    """
+    for user_email in user_emails:
+        await stick_to_primary(user_email)
+        await subscription_cache.invalidate(user_email)
+
+
+@timed_db_operation
+async def insert_new_subscriptions_data(list_data: list):
+    """
+    Insert many subscriptions with one multi-row statement and one commit
+    """
+    results, user_emails = await insert_subscriptions_rows(list_data)
+    await after_subscription_writes(user_emails)
+
+    return results
+
+
+@timed_db_operation
+async def delete_subscriptions_data(list_data: list):
+    """
+    Soft delete many subscriptions with one multi-row statement and one commit
+    """
+    results, user_emails = await delete_subscriptions_rows(list_data)
+    await after_subscription_writes(user_emails)
+
+    return results
+
+
+async def spool_import_records(user_email: str, records, timeout: float = SUBSCRIPTION_IMPORT_TIMEOUT):
+    """
+    Read an async iterable of subscription records for one user, validate them
+    and give them end dates one chunk at a time, and spool the valid rows. No
+    connection is held meanwhile, so a slow upload only costs its own request.
+    Raises asyncio.TimeoutError when the whole upload takes longer than timeout
+    """
+    spool = ImportSpool()
+    result = {"imported": 0, "rejected": 0, "errors": []}
+
+    async def read_records():
+        row_offset = 0
+        async for chunk in iter_record_chunks(records):
+            columns, results = prepare_bulk_subscriptions([{**record, "user_email": user_email} for record in chunk])
+            for item_result in results:
+                if item_result["status"] == "error":
+                    result["rejected"] += 1
+                    if len(result["errors"]) < SUBSCRIPTION_IMPORT_MAX_ERRORS:
+                        result["errors"].append({**item_result, "index": row_offset + item_result["index"]})
+            row_offset += len(chunk)
+
+            if columns["user_emails"]:
+                column_names = [f"{column_name}s" for column_name in IMPORT_COLUMNS]
+                spool.write_chunk(list(zip(*(columns[column_name] for column_name in column_names))))
+
+    try:
+        await asyncio.wait_for(read_records(), timeout)
+    except BaseException:
+        spool.close()
+        raise
+    result["imported"] = spool.rows
+
+    return spool, result
+
+
+@timed_db_operation
+async def import_spooled_subscriptions(user_email: str, spool):
+    """
+    COPY the spooled rows into a temporary staging table and merge them in one
+    transaction, so an import is all or nothing for its valid rows
+    """
+    if not spool.rows:
+        return
+
+    async with transaction() as connection:
+        with db_phase("execute"):
+            await connection.execute(*query_args("create_subscription_import_staging"))
+            for rows in spool.iter_chunks():
+                await connection.copy_records_to_table(
+                    "subscription_import_staging",
+                    records=rows,
+                    columns=IMPORT_COLUMNS
+                )
+            await connection.execute(*query_args("merge_subscription_import"))
+
+    await stick_to_primary(user_email)
+    await subscription_cache.invalidate(user_email)
+
+
+async def export_subscriptions_csv(user_email: str):
+    """
+    Stream the user's active subscriptions as CSV straight from COPY TO STDOUT
+    """
+    async for chunk in stream_copy("export_subscriptions", {"user_email": str(user_email)}, format="csv", header=True):
+        yield chunk
@@ -0,0 +1,97 @@
+"""
+Throughput of /get-subscription-data with the native asyncpg path versus the old
+asyncio.to_thread + psycopg2 path, at high concurrency.
+
+The app runs in-process through httpx.ASGITransport. It needs the usual DB_*
+variables pointing at a Postgres that already has the subscription tables.
+
+    python benchmark/bench_async_endpoint.py --concurrency 500 --requests 5000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("BACKEND_API_SECRET_KEY", "benchmark-api-key")
+# Every request comes from the same benchmark user at a concurrency far above the
+# admission limits, both would shed most of the requests being measured
+os.environ.setdefault("USER_RATE_LIMIT_PER_SECOND", "0")
+os.environ.setdefault("ADMISSION_DB_CONCURRENCY", "0")
+
+import httpx
+import api
+import module
+import database
+import async_module
+
+BENCH_USER_EMAIL = "benchmark@example.com"
+
+
+async def to_thread_get_subs_data(user_email: str, version: int):
+    return await asyncio.to_thread(module.get_subs_data, user_email)
+
+
+async def native_get_subs_data(user_email: str, version: int):
+    return await async_module.load_subs_data(user_email)
+
+
+async def seed_subscriptions(row_count: int):
+    existing = await async_module.load_subs_data(BENCH_USER_EMAIL)
+    for index in range(len(existing["data"]["list_data"]), row_count):
+        await async_module.insert_new_subscription_data({
+            "user_email": BENCH_USER_EMAIL,
+            "subscription_name": f"benchmark-subscription-{index}",
+            "subscription_period": "1 month",
+            "subscription_start_date": "2024-01-01"
+        })
+
+
+async def run_load(client: httpx.AsyncClient, concurrency: int, total_requests: int):
+    headers = {"Authorization": f"Bearer {os.environ['BACKEND_API_SECRET_KEY']}"}
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one_request():
+        nonlocal failures
+        async with semaphore:
+            response = await client.get("/get-subscription-data", headers=headers)
+            if response.status_code != 200:
+                failures += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(total_requests)))
+    elapsed = time.perf_counter() - started_at
+
+    return total_requests / elapsed, failures
+
+
+async def main(concurrency: int, total_requests: int, rows: int):
+    cookies = {"cookie_session": module.create_jwt({"email": BENCH_USER_EMAIL, "name": "Benchmark"})}
+    transport = httpx.ASGITransport(app=api.app)
+
+    async with api.app.router.lifespan_context(api.app):
+        await seed_subscriptions(rows)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+            for label, data_function in (("asyncio.to_thread + psycopg2", to_thread_get_subs_data),
+                                         ("native asyncpg", native_get_subs_data)):
+                api.get_subs_data = data_function
+                await run_load(client, concurrency, min(total_requests, concurrency))
+                throughput, failures = await run_load(client, concurrency, total_requests)
+                print(f"{label:>30}: {throughput:8.1f} req/s ({failures} failed)")
+
+    database.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.concurrency, args.requests, args.rows))
@@ -0,0 +1,84 @@
+"""
+Latency of upstream calls made through a new httpx.AsyncClient per request versus the
+shared lifespan client, measured offline with httpx.MockTransport stand-ins.
+
+Each stand-in transport pays a simulated DNS + TCP + TLS handshake the first time it
+is used, which is what a fresh client pays against PayPal or Google on every request.
+
+    python benchmark/bench_http_clients.py --requests 200 --handshake-ms 60 --rtt-ms 20
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from http_clients import init_http_clients, close_http_clients, get_http_client, http_client_stats
+
+PAYPAL_ORDERS_URL = "https://api-m.sandbox.paypal.com/v2/checkout/orders/"
+
+
+class HandshakeMockTransport(httpx.MockTransport):
+    """
+    MockTransport that sleeps once for connection setup and then per request
+    """
+    def __init__(self, handshake_seconds: float, rtt_seconds: float):
+        self.handshake_seconds = handshake_seconds
+        self.rtt_seconds = rtt_seconds
+        self.connected = False
+        super().__init__(self.handle)
+
+    async def handle(self, request):
+        if not self.connected:
+            self.connected = True
+            await asyncio.sleep(self.handshake_seconds)
+        await asyncio.sleep(self.rtt_seconds)
+
+        return httpx.Response(201, json={"id": "ORDER-ID", "links": []})
+
+
+async def per_request_client(args):
+    transport = HandshakeMockTransport(args.handshake_ms / 1000, args.rtt_ms / 1000)
+    async with httpx.AsyncClient(transport=transport) as request_client:
+        await request_client.post(PAYPAL_ORDERS_URL, json={})
+
+
+async def shared_client(args):
+    await get_http_client("paypal").post(PAYPAL_ORDERS_URL, json={})
+
+
+async def measure(label: str, call, args):
+    latencies = []
+    for _ in range(args.requests):
+        started_at = time.perf_counter()
+        await call(args)
+        latencies.append(time.perf_counter() - started_at)
+
+    latencies.sort()
+    average = sum(latencies) / len(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:>20}: avg {average * 1000:7.2f} ms, p95 {p95 * 1000:7.2f} ms")
+
+
+async def main(args):
+    init_http_clients(transports={
+        "paypal": HandshakeMockTransport(args.handshake_ms / 1000, args.rtt_ms / 1000)
+    })
+
+    await measure("client per request", per_request_client, args)
+    await measure("shared client", shared_client, args)
+    print("shared client stats:", http_client_stats()["paypal"])
+
+    await close_http_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=60)
+    parser.add_argument("--rtt-ms", type=float, default=20)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""
+Compare the old pandas materialization of get_subs_data with the cursor row layer.
+
+Both paths read the same synthetic result set from an in-memory cursor, so the
+numbers only reflect result handling and not the database round trip.
+
+    python benchmark/bench_result_rows.py --rows 5000 --repeat 50
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import iter_rows
+from module import subscription_row_to_dict
+
+COLUMNS = (
+    "user_email",
+    "subscription_name",
+    "subscription_period",
+    "subscription_start_date",
+    "subscription_end_date"
+)
+
+
+class InMemoryCursor:
+    """
+    Minimal DB-API cursor over a list of rows
+    """
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.position = 0
+        self.description = [(column,) for column in COLUMNS]
+
+    def fetchall(self):
+        rows = self.rows[self.position:]
+        self.position = len(self.rows)
+        return rows
+
+    def fetchmany(self, size: int):
+        rows = self.rows[self.position:self.position + size]
+        self.position += len(rows)
+        return rows
+
+
+def build_rows(row_count: int):
+    start_date = datetime(2024, 1, 1)
+    return [
+        (
+            "user@example.com",
+            f"subscription-{index}",
+            "1 month",
+            start_date + timedelta(days=index % 365),
+            start_date + timedelta(days=index % 365 + 30)
+        )
+        for index in range(row_count)
+    ]
+
+
+def pandas_path(rows: list):
+    import pandas as pd
+
+    cursor = InMemoryCursor(rows)
+    df_user_data = pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+    if df_user_data.values.tolist():
+        df_user_data["subscription_start_date"] = pd.to_datetime(df_user_data["subscription_start_date"]).dt.strftime("%d %b %Y")
+        df_user_data["subscription_end_date"] = pd.to_datetime(df_user_data["subscription_end_date"]).dt.strftime("%d %b %Y")
+
+    return df_user_data.to_dict(orient="records")
+
+
+def row_layer_path(rows: list):
+    cursor = InMemoryCursor(rows)
+
+    return [subscription_row_to_dict(row) for row in iter_rows(cursor)]
+
+
+def measure(function, rows: list, repeat: int):
+    function(rows)
+
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        function(rows)
+    elapsed = (time.perf_counter() - started_at) / repeat
+
+    tracemalloc.start()
+    function(rows)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak_memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+
+    import_started_at = time.perf_counter()
+    import pandas  # noqa: F401
+    pandas_import_time = time.perf_counter() - import_started_at
+
+    print(f"pandas import time: {pandas_import_time * 1000:.1f} ms (paid once per worker)")
+    for label, function in (("pandas", pandas_path), ("row layer", row_layer_path)):
+        elapsed, peak_memory = measure(function, rows, args.repeat)
+        print(f"{label:>10}: {elapsed * 1000:8.2f} ms/call, peak memory {peak_memory / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
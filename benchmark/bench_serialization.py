@@ -0,0 +1,98 @@
+"""
+Encode time and payload size of a large subscription list.
+
+Compares the previous path (dates formatted per row, then FastAPI's
+jsonable_encoder and stdlib json) with the serializers of serialization.py:
+orjson formatting dates in its default hook and MessagePack, each also
+gzip- and brotli-compressed.
+
+    python benchmark/bench_serialization.py --rows 50000
+"""
+import os
+import sys
+import json
+import time
+import gzip
+import argparse
+from decimal import Decimal
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from database import format_date
+from serialization import (dumps_json,
+                           dumps_msgpack,
+                           orjson,
+                           msgpack,
+                           brotli,
+                           RESPONSE_GZIP_LEVEL,
+                           RESPONSE_BROTLI_QUALITY)
+
+
+def synthetic_subscription_data(count: int):
+    start = datetime(2025, 1, 1)
+    list_data = [
+        {
+            "user_email": "bench@example.com",
+            "subscription_name": f"subscription-{index}",
+            "subscription_period": "1 month",
+            "subscription_start_date": start + timedelta(days=index % 365),
+            "subscription_end_date": start + timedelta(days=index % 365 + 30),
+            "subscription_price": Decimal("9.99")
+        }
+        for index in range(count)
+    ]
+
+    return {"data": {"user_email": "bench@example.com", "list_data": list_data}}
+
+
+def stdlib_previous(subscription_data: dict):
+    list_data = [
+        {
+            **row,
+            "subscription_start_date": format_date(row["subscription_start_date"]),
+            "subscription_end_date": format_date(row["subscription_end_date"])
+        }
+        for row in subscription_data["data"]["list_data"]
+    ]
+    content = jsonable_encoder({"data": {**subscription_data["data"], "list_data": list_data}})
+
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def timed(function, repeat: int):
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+
+    return result, (time.perf_counter() - started_at) * 1000 / repeat
+
+
+def main(args):
+    subscription_data = synthetic_subscription_data(args.rows)
+    encoders = {"stdlib json + jsonable_encoder": stdlib_previous}
+    encoders["orjson" if orjson is not None else "json (orjson not installed)"] = dumps_json
+    if msgpack is not None:
+        encoders["msgpack"] = dumps_msgpack
+
+    print(f"{args.rows} subscriptions")
+    for label, encoder in encoders.items():
+        payload, encode_ms = timed(lambda: encoder(subscription_data), args.repeat)
+        gzip_payload, gzip_ms = timed(lambda: gzip.compress(payload, RESPONSE_GZIP_LEVEL), args.repeat)
+        line = (f"{label:>32}: encode {encode_ms:8.2f} ms  {len(payload) / 1024:9.1f} KiB  "
+                f"gzip {gzip_ms:7.2f} ms {len(gzip_payload) / 1024:8.1f} KiB")
+        if brotli is not None:
+            brotli_payload, brotli_ms = timed(
+                lambda: brotli.compress(payload, quality=RESPONSE_BROTLI_QUALITY), args.repeat
+            )
+            line += f"  br {brotli_ms:7.2f} ms {len(brotli_payload) / 1024:8.1f} KiB"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+
+    main(parser.parse_args())
@@ -0,0 +1,198 @@
+"""
+Cold start of an API worker: import time of api.py and time to first response.
+
+Every measurement runs in a fresh interpreter. The import run also lists the
+slowest direct imports of api.py (from python -X importtime) and which heavy
+optional modules got imported. The first response run starts uvicorn and polls
+/test-api until it answers, so it needs uvicorn and the usual DB_* variables
+pointing at a Postgres the lifespan can connect to (--skip-first-response
+measures imports only).
+
+    python benchmark/bench_startup.py --runs 10 --output startup_results.json
+    python benchmark/bench_startup.py --runs 10 --compare startup_results.json
+
+The results are written as JSON together with the git commit, and --compare
+prints the change against an earlier results file.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+ROOT_DIR_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_ENVIRONMENT = {
+    "BACKEND_API_SECRET_KEY": "benchmark-api-key",
+    "JWT_SECRET_KEY": "benchmark-secret",
+    "JWT_ALGORITHM": "HS256",
+    "RENEWAL_SCHEDULER_ENABLED": "False"
+}
+# Modules that should stay out of a worker until something actually needs them
+HEAVY_MODULES = ("pandas", "numpy", "pytz", "dateutil", "requests", "psycopg2", "redis")
+IMPORT_PROBE = """
+import sys, time, json
+started_at = time.perf_counter()
+import api
+elapsed = time.perf_counter() - started_at
+print(json.dumps({"seconds": elapsed, "heavy_modules": [name for name in %r if name in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def bench_environment():
+    environment = dict(os.environ)
+    for variable_name, value in BENCH_ENVIRONMENT.items():
+        environment.setdefault(variable_name, value)
+
+    return environment
+
+
+def measure_import(runs: int):
+    timings = []
+    heavy_modules = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT_DIR_PATH, env=bench_environment(), text=True
+        )
+        probe = json.loads(output.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        heavy_modules = probe["heavy_modules"]
+
+    return timings, heavy_modules
+
+
+def slowest_imports(top: int):
+    """
+    Direct imports of api.py by cumulative import time, from one -X importtime run
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api"],
+        cwd=ROOT_DIR_PATH, env=bench_environment(), capture_output=True, text=True, check=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # After the separating space, direct imports of the top level module are indented by two spaces
+        name = name[1:]
+        if name.startswith("   ") or not name.startswith("  "):
+            continue
+        try:
+            imports.append((name.strip(), int(cumulative) / 1000))
+        except ValueError:
+            continue
+
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(runs: int, timeout: float):
+    """
+    Seconds from spawning a uvicorn worker until /test-api answers
+    """
+    import httpx
+
+    timings = []
+    for _ in range(runs):
+        port = free_port()
+        started_at = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT_DIR_PATH, env=bench_environment()
+        )
+        try:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {server.returncode} before answering")
+                if time.perf_counter() - started_at > timeout:
+                    raise RuntimeError(f"No response within {timeout} seconds")
+                try:
+                    if httpx.get(f"http://127.0.0.1:{port}/test-api", timeout=1.0).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+            timings.append(time.perf_counter() - started_at)
+        finally:
+            server.terminate()
+            server.wait()
+
+    return timings
+
+
+def summarize(timings: list):
+    timings = sorted(timings)
+
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "min_ms": round(timings[0] * 1000, 1),
+        "max_ms": round(timings[-1] * 1000, 1)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR_PATH, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results: dict, previous_results: dict):
+    for measurement in ("import", "first_response"):
+        current = results.get(measurement)
+        previous = previous_results.get(measurement)
+        if not current or not previous or not previous["median_ms"]:
+            continue
+        change = (current["median_ms"] - previous["median_ms"]) / previous["median_ms"] * 100
+        print(f"{measurement:>15} vs {previous_results.get('commit')}: median {change:+.1f}%")
+
+
+def main(args):
+    import_timings, heavy_modules = measure_import(args.runs)
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "import": summarize(import_timings),
+        "heavy_modules": heavy_modules,
+        "slowest_imports": slowest_imports(args.top),
+        "first_response": None
+    }
+    print(f"{'import':>15}: median {results['import']['median_ms']:8.1f} ms  "
+          f"min {results['import']['min_ms']:8.1f} ms  max {results['import']['max_ms']:8.1f} ms")
+    print(f"{'heavy modules':>15}: {', '.join(heavy_modules) or 'none'}")
+    for name, cumulative_ms in results["slowest_imports"]:
+        print(f"{'':>15}  {cumulative_ms:8.1f} ms  {name}")
+
+    if not args.skip_first_response:
+        results["first_response"] = summarize(measure_first_response(args.runs, args.timeout))
+        print(f"{'first response':>15}: median {results['first_response']['median_ms']:8.1f} ms  "
+              f"min {results['first_response']['min_ms']:8.1f} ms  max {results['first_response']['max_ms']:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as openfile:
+            json.dump(results, openfile, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as openfile:
+            print_comparison(results, json.load(openfile))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports to list")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for the first response")
+    parser.add_argument("--skip-first-response", action="store_true", help="only measure import time")
+    parser.add_argument("--output", default="startup_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+
+    main(parser.parse_args())
@@ -0,0 +1,88 @@
+"""
+Spending analytics from the monthly summary against on-the-fly aggregation.
+
+On-the-fly aggregation scans the user's subscriptions and expands every period
+into months on each request. The summary lookup only shapes the user's already
+aggregated months. The full rebuild compares the row by row expansion with the
+vectorized NumPy one used by analytics.py.
+
+    python benchmark/bench_subscription_analytics.py --subscriptions 1000000 --users 50000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from decimal import Decimal
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from module import build_subscription_analytics
+from analytics import (aggregate_monthly_naive,
+                       expand_monthly_amounts,
+                       summary_arrays,
+                       month_from_index)
+
+PERIODS = ("1 month", "3 month", "6 month", "12 month")
+
+
+def synthetic_subscriptions(count: int, users: int):
+    random.seed(7)
+    return [
+        (f"user-{index % users}@example.com",
+         random.choice(PERIODS),
+         datetime(2023, 1, 1) + (datetime(2025, 1, 1) - datetime(2023, 1, 1)) * random.random(),
+         Decimal(random.randrange(100, 5000)) / 100)
+        for index in range(count)
+    ]
+
+
+def timed(label: str, function, repeat: int = 1):
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    print(f"{label:>50}: {(time.perf_counter() - started_at) * 1000 / repeat:10.3f} ms")
+
+    return result
+
+
+def main(args):
+    subscriptions = synthetic_subscriptions(args.subscriptions, args.users)
+    naive_summary = timed(f"rebuild: row by row, {len(subscriptions)} subscriptions",
+                          lambda: aggregate_monthly_naive(subscriptions))
+
+    def numpy_rebuild():
+        user_codes, start_months, months_per_period, prices, user_emails = summary_arrays(subscriptions)
+        return expand_monthly_amounts(user_codes, start_months, months_per_period, prices), user_emails
+
+    (summary, user_emails) = timed(f"rebuild: numpy, {len(subscriptions)} subscriptions", numpy_rebuild)
+    print(f"summary rows: naive={len(naive_summary)} numpy={len(summary[0])}")
+
+    # Per request: one user's analytics, on the fly vs from the summary rows
+    user_email = "user-0@example.com"
+    summary_rows = sorted(
+        (month_from_index(month), count, Decimal(str(round(total, 4))))
+        for (email, month), (count, total) in naive_summary.items() if email == user_email
+    )
+
+    def on_the_fly():
+        user_rows = [row for row in subscriptions if row[0] == user_email]
+        user_summary = aggregate_monthly_naive(user_rows)
+        rows = sorted(
+            (month_from_index(month), count, Decimal(str(round(total, 4))))
+            for (_, month), (count, total) in user_summary.items()
+        )
+        return build_subscription_analytics(user_email, rows)
+
+    timed("request: on-the-fly aggregation", on_the_fly, repeat=args.requests)
+    timed("request: summary lookup", lambda: build_subscription_analytics(user_email, summary_rows), repeat=args.requests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscriptions", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=10)
+
+    main(parser.parse_args())
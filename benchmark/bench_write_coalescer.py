@@ -0,0 +1,141 @@
+"""
+Commits per second and tail latency of single subscription writes, issued
+directly (one statement and one commit each) and through the group-commit
+write coalescer.
+
+Concurrent callers insert and then delete their own subscriptions against a
+throwaway Postgres reached through the usual DB_* variables, e.g.
+
+    DB_NAME=postgres DB_USERNAME=postgres DB_PASSWORD=bench DB_HOST=localhost DB_PORT=5432 \\
+        python benchmark/bench_write_coalescer.py --requests 5000 --concurrency 200 --window-ms 5 --batch-size 100
+
+Migrations are applied before the run.
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RENEWAL_SCHEDULER_ENABLED", "False")
+
+import psycopg2
+import migrate
+import database
+from async_database import init_pool, close_pool
+from write_coalescer import WriteCoalescer, WRITE_OPERATIONS, WRITE_COALESCER_MAX_QUEUE_SIZE
+
+BENCH_USER_EMAIL = "write-coalescer@example.com"
+
+
+def prepare_database():
+    connection = psycopg2.connect(**database.connect_kwargs())
+    try:
+        migrate.apply_migrations(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO subscription_tracker_user(name, email, address, phone_number, created_at) "
+                "SELECT 'Write Coalescer', %(email)s, '', '', CURRENT_DATE "
+                "WHERE NOT EXISTS (SELECT 1 FROM subscription_tracker_user WHERE email = %(email)s)",
+                {"email": BENCH_USER_EMAIL}
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def write_data(operation: str, run_id: str, index: int):
+    subscription_name = f"coalescer-{run_id}-{index}"
+    if operation == "insert":
+        return {
+            "user_email": BENCH_USER_EMAIL,
+            "subscription_name": subscription_name,
+            "subscription_period": "1 month",
+            "subscription_start_date": "2025-01-01"
+        }
+
+    return {"email": BENCH_USER_EMAIL, "deleted_subs_name": subscription_name}
+
+
+def percentile(sorted_values: list, fraction: float):
+    if not sorted_values:
+        return 0.0
+    position = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+
+    return sorted_values[position]
+
+
+async def run_writes(submit, operation: str, run_id: str, total_requests: int, concurrency: int):
+    """
+    total_requests writes from concurrency callers, each waiting for its own write
+    """
+    latencies = []
+    errors = 0
+
+    async def caller(indexes):
+        nonlocal errors
+        for index in indexes:
+            started_at = time.perf_counter()
+            try:
+                await submit(operation, write_data(operation, run_id, index))
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(caller(range(offset, total_requests, concurrency)) for offset in range(concurrency)))
+
+    return time.perf_counter() - started_at, sorted(latencies), errors
+
+
+def report(mode: str, operation: str, elapsed: float, latencies: list, errors: int, commits: int):
+    print(f"{mode:>10} {operation:<6}: {len(latencies) / elapsed:9.1f} writes/s  {commits / elapsed:9.1f} commits/s  "
+          f"p50 {percentile(latencies, 0.50) * 1000:8.2f} ms  p95 {percentile(latencies, 0.95) * 1000:8.2f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms  errors {errors}")
+
+
+async def direct_submit(operation: str, data: dict):
+    return await WRITE_OPERATIONS[operation][0](data)
+
+
+async def main(args):
+    prepare_database()
+    await init_pool()
+    try:
+        # The delete run removes what the insert run of the same mode added
+        run_id = uuid.uuid4().hex[:8]
+        for operation in ("insert", "delete"):
+            elapsed, latencies, errors = await run_writes(direct_submit, operation, run_id, args.requests, args.concurrency)
+            report("direct", operation, elapsed, latencies, errors, len(latencies))
+
+        coalescer = WriteCoalescer(
+            window_seconds=args.window_ms / 1000,
+            max_batch_size=args.batch_size,
+            max_queue_size=WRITE_COALESCER_MAX_QUEUE_SIZE
+        )
+        coalescer.start()
+        run_id = uuid.uuid4().hex[:8]
+        try:
+            for operation in ("insert", "delete"):
+                flushes = coalescer.flushes
+                elapsed, latencies, errors = await run_writes(
+                    coalescer.submit, operation, run_id, args.requests, args.concurrency
+                )
+                report("coalesced", operation, elapsed, latencies, errors, coalescer.flushes - flushes)
+        finally:
+            await coalescer.stop()
+        print(f"coalescer: {coalescer.stats()}")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="writes per operation and mode")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--batch-size", type=int, default=100)
+
+    asyncio.run(main(parser.parse_args()))
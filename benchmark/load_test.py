@@ -0,0 +1,290 @@
+"""
+Offline load test of every endpoint.
+
+The FastAPI app runs in-process behind httpx.ASGITransport. PayPal and Google OAuth
+are replaced with httpx.MockTransport stand-ins, so the only real dependency is a
+throwaway Postgres reached through the usual DB_* variables, e.g.
+
+    docker run --rm -d -p 5432:5432 -e POSTGRES_PASSWORD=bench postgres:16
+    DB_NAME=postgres DB_USERNAME=postgres DB_PASSWORD=bench DB_HOST=localhost DB_PORT=5432 \\
+        python benchmark/load_test.py --requests 2000 --concurrency 50 --output bench_results.json
+
+Migrations are applied before the run. The results (throughput and p50/p95/p99
+latency per endpoint) are written as JSON together with the git commit, and
+--compare prints the change against an earlier results file.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+ROOT_DIR_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR_PATH)
+
+BENCH_ENVIRONMENT = {
+    "BACKEND_API_SECRET_KEY": "benchmark-api-key",
+    "JWT_SECRET_KEY": "benchmark-secret",
+    "JWT_ALGORITHM": "HS256",
+    "WEBSITE_URL": "http://frontend.bench",
+    "ADMIN_ENDPOINT_BASE_URL": "http://backend.bench",
+    "PAYPAL_BASE_URL": "https://paypal.bench",
+    "PAYPAL_CLIENT_ID": "paypal-client",
+    "PAYPAL_CLIENT_SECRET": "paypal-secret",
+    "GOOGLE_OAUTH_CLIENT_ID": "google-client",
+    "GOOGLE_OAUTH_CLIENT_SECRET": "google-secret",
+    "RENEWAL_SCHEDULER_ENABLED": "False",
+    # Every request comes from the same benchmark user
+    "USER_RATE_LIMIT_PER_SECOND": "0"
+}
+for variable_name, value in BENCH_ENVIRONMENT.items():
+    os.environ.setdefault(variable_name, value)
+
+import jwt
+import httpx
+import psycopg2
+from cryptography.hazmat.primitives.asymmetric import rsa
+import api
+import module
+import migrate
+import database
+from http_clients import init_http_clients
+
+BENCH_USER_EMAIL = "load-test@example.com"
+ENDPOINTS = (
+    "get_subscription_data",
+    "poll_subscription_data",
+    "add_subscription",
+    "delete_subscription",
+    "create_paypal_payment",
+    "paypal_callback",
+    "google_callback"
+)
+
+
+def google_signing_key():
+    """
+    RSA key the mock Google signs id_tokens with, and its public JWKS
+    """
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update({"kid": "bench-key", "use": "sig", "alg": "RS256"})
+
+    return private_key, {"keys": [public_jwk]}
+
+
+def upstream_handlers(latency_seconds: float):
+    """
+    MockTransport handlers answering like PayPal and Google OAuth do
+    """
+    private_key, jwks = google_signing_key()
+
+    async def paypal_handler(request: httpx.Request):
+        await asyncio.sleep(latency_seconds)
+        if request.url.path == "/v1/oauth2/token":
+            return httpx.Response(200, json={"access_token": "mock-paypal-token", "expires_in": 32400})
+        if request.url.path.endswith("/capture"):
+            return httpx.Response(201, json={"status": "COMPLETED"})
+        order_id = uuid.uuid4().hex
+        return httpx.Response(201, json={
+            "id": order_id,
+            "links": [{"rel": "approve", "href": f"https://paypal.bench/checkoutnow?token={order_id}"}]
+        })
+
+    async def google_handler(request: httpx.Request):
+        await asyncio.sleep(latency_seconds)
+        if request.url.host == "oauth2.googleapis.com":
+            issued_at = int(time.time())
+            id_token = jwt.encode({
+                "iss": "https://accounts.google.com",
+                "aud": os.environ["GOOGLE_OAUTH_CLIENT_ID"],
+                "sub": "load-test",
+                "email": BENCH_USER_EMAIL,
+                "name": "Load Test",
+                "iat": issued_at,
+                "exp": issued_at + 3600
+            }, private_key, algorithm="RS256", headers={"kid": "bench-key"})
+            return httpx.Response(200, json={
+                "access_token": "mock-google-token",
+                "id_token": id_token,
+                "expires_in": 3599
+            })
+        return httpx.Response(200, json=jwks, headers={"Cache-Control": "public, max-age=21600"})
+
+    return {
+        "paypal": httpx.MockTransport(paypal_handler),
+        "google": httpx.MockTransport(google_handler)
+    }
+
+
+def prepare_database():
+    connection = psycopg2.connect(**database.connect_kwargs())
+    try:
+        migrate.apply_migrations(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO subscription_tracker_user(name, email, address, phone_number, created_at) "
+                "SELECT 'Load Test', %(email)s, '', '', CURRENT_DATE "
+                "WHERE NOT EXISTS (SELECT 1 FROM subscription_tracker_user WHERE email = %(email)s)",
+                {"email": BENCH_USER_EMAIL}
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def endpoint_requests(total_requests: int, etags: dict):
+    """
+    Request factories per endpoint, the delete run removes what the add run inserted.
+    poll_subscription_data sends the ETag of the get_subscription_data run like a polling frontend
+    """
+    run_id = uuid.uuid4().hex[:8]
+    headers = {"Authorization": f"Bearer {os.environ['BACKEND_API_SECRET_KEY']}"}
+
+    def subscription_name(index: int):
+        return f"load-test-{run_id}-{index}"
+
+    return {
+        "get_subscription_data": lambda index: ("GET", "/get-subscription-data", {"headers": headers}),
+        "poll_subscription_data": lambda index: ("GET", "/get-subscription-data", {"headers": {
+            **headers,
+            "If-None-Match": etags.get("get_subscription_data", "")
+        }}),
+        "add_subscription": lambda index: ("POST", "/add-subscription", {"headers": headers, "json": {
+            "user_email": BENCH_USER_EMAIL,
+            "subscription_name": subscription_name(index),
+            "subscription_period": "1 month",
+            "subscription_start_date": "2025-01-01"
+        }}),
+        "delete_subscription": lambda index: ("POST", "/delete-subscription", {"headers": headers, "json": {
+            "email": BENCH_USER_EMAIL,
+            "deleted_subs_name": subscription_name(index)
+        }}),
+        "create_paypal_payment": lambda index: ("POST", "/create-paypal-payment", {"headers": headers, "json": {
+            "user_id": None,
+            "user_email": BENCH_USER_EMAIL,
+            "amount": 9.99,
+            "total_balance": 100,
+            "balance_duration_days": 30,
+            "plan": "basic"
+        }}),
+        "paypal_callback": lambda index: ("GET", "/paypal-callback", {"params": {"token": f"ORDER-{run_id}-{index}"}}),
+        "google_callback": lambda index: ("GET", "/auth/google/callback", {"params": {"code": f"code-{index}"}})
+    }
+
+
+def percentile(sorted_values: list, fraction: float):
+    if not sorted_values:
+        return 0.0
+    position = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+
+    return sorted_values[position]
+
+
+async def run_endpoint(client: httpx.AsyncClient, request_factory, total_requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one_request(index: int):
+        nonlocal errors
+        method, url, request_kwargs = request_factory(index)
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(method, url, **request_kwargs)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(one_request(index) for index in range(total_requests)))
+    elapsed = time.perf_counter() - started_at
+    latencies.sort()
+
+    return {
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(total_requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR_PATH, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results: dict, previous_results: dict):
+    for endpoint, endpoint_result in results["endpoints"].items():
+        previous = previous_results.get("endpoints", {}).get(endpoint)
+        if previous is None:
+            continue
+        changes = []
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if previous[metric]:
+                change = (endpoint_result[metric] - previous[metric]) / previous[metric] * 100
+                changes.append(f"{metric} {change:+.1f}%")
+        print(f"{endpoint:>24} vs {previous_results.get('commit')}: {', '.join(changes)}")
+
+
+async def main(args):
+    prepare_database()
+    init_http_clients(transports=upstream_handlers(args.upstream_latency_ms / 1000))
+
+    selected_endpoints = args.endpoints or list(ENDPOINTS)
+    etags = {}
+    request_factories = endpoint_requests(args.requests, etags)
+    cookies = {"cookie_session": module.create_jwt({"email": BENCH_USER_EMAIL, "name": "Load Test"})}
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "endpoints": {}
+    }
+
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend.bench", cookies=cookies) as client:
+            etags["get_subscription_data"] = (
+                await client.get("/get-subscription-data", headers=request_factories["get_subscription_data"](0)[2]["headers"])
+            ).headers.get("etag", "")
+            for endpoint in ENDPOINTS:
+                if endpoint not in selected_endpoints:
+                    continue
+                endpoint_result = await run_endpoint(client, request_factories[endpoint], args.requests, args.concurrency)
+                results["endpoints"][endpoint] = endpoint_result
+                print(f"{endpoint:>24}: {endpoint_result['throughput_rps']:9.1f} req/s  "
+                      f"p50 {endpoint_result['p50_ms']:8.2f} ms  p95 {endpoint_result['p95_ms']:8.2f} ms  "
+                      f"p99 {endpoint_result['p99_ms']:8.2f} ms  errors {endpoint_result['errors']}")
+
+    database.close_pool()
+
+    if args.output:
+        with open(args.output, "w") as openfile:
+            json.dump(results, openfile, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as openfile:
+            print_comparison(results, json.load(openfile))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--upstream-latency-ms", type=float, default=0, help="simulated PayPal/Google latency")
+    parser.add_argument("--endpoints", nargs="*", choices=ENDPOINTS)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,408 @@
+import os
+import re
+import time
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from metrics import db_phase
+
+# Define global variables from environment
+DB_POOL_MIN_SIZE=int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE=int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT=float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_HEALTH_CHECK=True if str(os.getenv("DB_POOL_HEALTH_CHECK", "True")) == "True" else False
+DB_PREPARE_STATEMENTS=True if str(os.getenv("DB_PREPARE_STATEMENTS", "True")) == "True" else False
+QUERY_DIR_PATH=os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries")
+PLACEHOLDER_PATTERN=re.compile(r"@([A-Z][A-Z0-9_]*)")
+FETCH_BATCH_SIZE=int(os.getenv("DB_FETCH_BATCH_SIZE", "500"))
+DATE_FORMAT="%d %b %Y"
+
+
+class QueryParameterError(Exception):
+    """
+    Raised when a registry query runs without a value for one of its @NAME placeholders
+    """
+
+
+class Query:
+    """
+    SQL statement loaded from the queries directory, the @NAME placeholders are
+    turned into bind parameters for psycopg2 (%(name)s) and for server-side
+    prepared statements ($1, $2, ...)
+    """
+    __slots__ = ("name", "text", "param_names", "pyformat_text", "positional_text")
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+
+        param_names = []
+        for placeholder in PLACEHOLDER_PATTERN.findall(text):
+            param_name = placeholder.lower()
+            if param_name not in param_names:
+                param_names.append(param_name)
+        self.param_names = tuple(param_names)
+
+        self.pyformat_text = PLACEHOLDER_PATTERN.sub(
+            lambda match: f"%({match.group(1).lower()})s",
+            text.replace("%", "%%")
+        )
+        self.positional_text = PLACEHOLDER_PATTERN.sub(
+            lambda match: f"${self.param_names.index(match.group(1).lower()) + 1}",
+            text
+        )
+
+    def values(self, params: dict):
+        """
+        Order the given parameters the way the positional statement expects them
+        """
+        try:
+            return tuple(params[param_name] for param_name in self.param_names)
+        except KeyError as error:
+            raise QueryParameterError(f"Query {self.name} is missing the parameter @{error.args[0].upper()}") from None
+
+    def named_values(self, params: dict):
+        """
+        The given parameters the pyformat statement expects, checked like values()
+        """
+        return dict(zip(self.param_names, self.values(params)))
+
+
+def load_queries(query_dir_path: str = QUERY_DIR_PATH):
+    """
+    Read every .sql file in the queries directory once
+    """
+    queries = {}
+    for file_name in sorted(os.listdir(query_dir_path)):
+        if not file_name.endswith(".sql"):
+            continue
+        with open(os.path.join(query_dir_path, file_name), "r") as openfile:
+            name = file_name[:-len(".sql")]
+            queries[name] = Query(name, openfile.read().strip())
+
+    return queries
+
+
+QUERIES = load_queries()
+
+
+class PoolTimeoutError(Exception):
+    """
+    Raised when no connection becomes available before the checkout timeout
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def pooled_connection_class():
+    """
+    psycopg2 connection class that remembers which statements it has prepared.
+    Built on first use, psycopg2 is only imported by processes using the sync pool
+    """
+    import psycopg2.extensions
+
+    class PooledConnection(psycopg2.extensions.connection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.prepared_statements = set()
+
+    return PooledConnection
+
+
+def execute_query(cursor, name: str, params: dict = None):
+    """
+    Execute a registry query, as a server-side prepared statement when the
+    connection supports it so Postgres only plans it once per connection
+    """
+    query = QUERIES[name]
+    params = params or {}
+    prepared_statements = getattr(cursor.connection, "prepared_statements", None)
+
+    with db_phase("execute"):
+        if not DB_PREPARE_STATEMENTS or prepared_statements is None:
+            cursor.execute(query.pyformat_text, query.named_values(params))
+            return
+
+        if name not in prepared_statements:
+            cursor.execute(f"PREPARE {name} AS {query.positional_text}")
+            prepared_statements.add(name)
+
+        if query.param_names:
+            placeholders = ", ".join(["%s"] * len(query.param_names))
+            cursor.execute(f"EXECUTE {name}({placeholders})", query.values(params))
+        else:
+            cursor.execute(f"EXECUTE {name}")
+
+
+def iter_rows(cursor, batch_size: int = FETCH_BATCH_SIZE):
+    """
+    Yield result rows as plain tuples straight from the cursor, fetching them
+    in batches instead of materializing the whole result set
+    """
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def iter_query(connection, name: str, params: dict = None, batch_size: int = FETCH_BATCH_SIZE):
+    """
+    Stream a registry query through a server-side (named) cursor so only one
+    batch of rows is held in memory at a time
+    """
+    with connection.cursor(name=f"{name}_stream") as cursor:
+        cursor.itersize = batch_size
+        query = QUERIES[name]
+        cursor.execute(query.pyformat_text, query.named_values(params or {}))
+        yield from iter_rows(cursor, batch_size)
+
+
+def format_date(value):
+    """
+    Format a date or timestamp column the way the frontend displays it
+    """
+    if value is None:
+        return None
+
+    return value.strftime(DATE_FORMAT)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections shared by every module function
+    """
+    def __init__(self,
+                 min_size: int,
+                 max_size: int,
+                 timeout: float,
+                 health_check: bool,
+                 **connect_kwargs):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.health_check = health_check
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = deque()
+        self._in_use = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        # Counters exposed through stats()
+        self._waits = 0
+        self._timeouts = 0
+        self._connections_created = 0
+        self._connections_discarded = 0
+
+    def _connect(self):
+        import psycopg2
+
+        connection = psycopg2.connect(connection_factory=pooled_connection_class(), **self.connect_kwargs)
+        with self._condition:
+            self._connections_created += 1
+
+        return connection
+
+    def _discard(self, connection):
+        with self._condition:
+            self._connections_discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, connection):
+        import psycopg2
+
+        if connection.closed:
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def open(self):
+        """
+        Open the minimum number of connections up front
+        """
+        connections = [self._connect() for _ in range(self.min_size)]
+        with self._condition:
+            self._closed = False
+            self._idle.extend(connections)
+
+    def getconn(self):
+        """
+        Check out a healthy connection, waiting up to the pool timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        connection = None
+
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed")
+                if self._idle:
+                    connection = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use + len(self._idle) < self.max_size:
+                    # Reserve a slot and open the connection outside the lock
+                    self._in_use += 1
+                    break
+
+                if not waited:
+                    self._waits += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.timeout} seconds"
+                    )
+                self._condition.wait(remaining)
+
+        try:
+            if connection is not None and not self._is_healthy(connection):
+                self._discard(connection)
+                connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+
+        return connection
+
+    def putconn(self, connection):
+        """
+        Return a connection to the pool, dropping it when it is broken
+        """
+        import psycopg2.extensions
+
+        reusable = not connection.closed and not self._closed
+        if reusable and connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                reusable = False
+
+        if not reusable:
+            self._discard(connection)
+
+        with self._condition:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append(connection)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a with block
+        """
+        with db_phase("connect"):
+            connection = self.getconn()
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+    def close(self):
+        """
+        Close idle connections; borrowed ones are closed when they are returned
+        """
+        with self._condition:
+            self._closed = True
+            idle_connections = list(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+
+        for connection in idle_connections:
+            connection.close()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "connections_created": self._connections_created,
+                "connections_discarded": self._connections_discarded
+            }
+
+
+def connect_kwargs():
+    """
+    Connection settings of the postgresql database from environment
+    """
+    return {
+        "database": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USERNAME"),
+        "password": os.getenv("DB_PASSWORD"),
+        "host": os.getenv("DB_HOST"),
+        "port": os.getenv("DB_PORT")
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool():
+    """
+    Create the shared connection pool, called once from the application lifespan
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                health_check=DB_POOL_HEALTH_CHECK,
+                **connect_kwargs()
+            )
+            pool.open()
+            _pool = pool
+
+    return _pool
+
+
+def close_pool():
+    """
+    Close the shared connection pool on application shutdown
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def get_pool():
+    """
+    Return the shared pool, creating it lazily for scripts running outside the app
+    """
+    if _pool is None:
+        return init_pool()
+
+    return _pool
+
+
+def pool_stats():
+    if _pool is None:
+        return None
+
+    return _pool.stats()
@@ -0,0 +1,143 @@
+import os
+import re
+import jwt
+import time
+import asyncio
+import traceback
+from http_clients import get_http_client
+from single_flight import SingleFlight
+
+# Define global variables from environment
+GOOGLE_JWKS_URL=os.getenv("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+GOOGLE_JWKS_DEFAULT_MAX_AGE=float(os.getenv("GOOGLE_JWKS_DEFAULT_MAX_AGE", "3600"))
+GOOGLE_JWKS_REFRESH_MARGIN=float(os.getenv("GOOGLE_JWKS_REFRESH_MARGIN", "300"))
+GOOGLE_JWKS_MIN_REFRESH_INTERVAL=float(os.getenv("GOOGLE_JWKS_MIN_REFRESH_INTERVAL", "30"))
+GOOGLE_ISSUERS=("accounts.google.com", "https://accounts.google.com")
+MAX_AGE_PATTERN=re.compile(r"max-age=(\d+)")
+
+
+def cache_max_age(cache_control: str, default: float):
+    """
+    max-age of a Cache-Control header in seconds
+    """
+    match = MAX_AGE_PATTERN.search(cache_control or "")
+
+    return float(match.group(1)) if match else default
+
+
+class GoogleJWKSCache:
+    """
+    Process-wide cache of Google's id_token signing keys. The key set is kept for
+    the max-age Google sends in Cache-Control and refreshed by a background task
+    shortly before it expires. An unknown kid (key rotation) triggers an immediate
+    refresh, at most once per min_refresh_interval, shared by concurrent callers
+    """
+    def __init__(self, url: str, default_max_age: float, refresh_margin: float, min_refresh_interval: float):
+        self.url = url
+        self.default_max_age = default_max_age
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._expires_at = 0.0
+        self._refreshed_at = None
+        self._refresh = SingleFlight(self._fetch_keys)
+        self._task = None
+
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    async def _fetch_keys(self):
+        try:
+            requested_at = time.monotonic()
+            self._refreshed_at = requested_at
+            response = await get_http_client("google").get(self.url)
+            response.raise_for_status()
+
+            key_set = jwt.PyJWKSet.from_dict(response.json())
+            self._keys = {signing_key.key_id: signing_key for signing_key in key_set.keys}
+            self._expires_at = requested_at + cache_max_age(
+                response.headers.get("cache-control"), self.default_max_age
+            )
+            self.refreshes += 1
+        except Exception:
+            self.refresh_failures += 1
+            raise
+
+    async def refresh(self):
+        await self._refresh()
+
+    async def get_signing_key(self, key_id: str):
+        """
+        Signing key for the kid of an id_token, raises jwt.PyJWKError when Google does not know it
+        """
+        now = time.monotonic()
+        signing_key = self._keys.get(key_id)
+        recently_refreshed = self._refreshed_at is not None and now - self._refreshed_at < self.min_refresh_interval
+        if now >= self._expires_at or (signing_key is None and not recently_refreshed):
+            await self.refresh()
+            signing_key = self._keys.get(key_id)
+
+        if signing_key is None:
+            raise jwt.PyJWKError(f"Unknown Google signing key {key_id}")
+
+        return signing_key
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+                delay = self._expires_at - self.refresh_margin - time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                traceback.print_exc()
+                delay = self.min_refresh_interval
+            await asyncio.sleep(max(delay, self.min_refresh_interval))
+
+    def stats(self):
+        return {
+            "keys": len(self._keys),
+            "expires_in_seconds": round(max(self._expires_at - time.monotonic(), 0.0), 1),
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures
+        }
+
+
+google_jwks_cache = GoogleJWKSCache(
+    url=GOOGLE_JWKS_URL,
+    default_max_age=GOOGLE_JWKS_DEFAULT_MAX_AGE,
+    refresh_margin=GOOGLE_JWKS_REFRESH_MARGIN,
+    min_refresh_interval=GOOGLE_JWKS_MIN_REFRESH_INTERVAL
+)
+
+
+async def verify_google_id_token(id_token: str, client_id: str):
+    """
+    Verify the signature, audience, issuer and expiry of a Google id_token
+    locally and return its claims
+    """
+    header = jwt.get_unverified_header(id_token)
+    signing_key = await google_jwks_cache.get_signing_key(header.get("kid"))
+    claims = jwt.decode(
+        id_token,
+        key=signing_key.key,
+        algorithms=["RS256"],
+        audience=client_id
+    )
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise jwt.InvalidIssuerError("Invalid issuer")
+
+    return claims
@@ -0,0 +1,140 @@
+import os
+import time
+import httpx
+import importlib.util
+from metrics import METRICS_ENABLED, UPSTREAM_REQUEST_DURATION
+
+# Define global variables from environment
+HTTP_MAX_CONNECTIONS=int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED=True if str(os.getenv("HTTP2_ENABLED", "False")) == "True" else False
+
+# Per-upstream timeouts in seconds
+UPSTREAM_TIMEOUTS = {
+    "paypal": httpx.Timeout(float(os.getenv("PAYPAL_HTTP_TIMEOUT", "15")), connect=5.0),
+    "google": httpx.Timeout(float(os.getenv("GOOGLE_HTTP_TIMEOUT", "10")), connect=5.0),
+    "webhook": httpx.Timeout(float(os.getenv("WEBHOOK_HTTP_TIMEOUT", "5")), connect=2.0)
+}
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Wrap an upstream transport to count requests, failures, in-flight calls and
+    total latency, and to read connection pool usage from it
+    """
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        status = "error"
+        started_at = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.in_flight -= 1
+            self.total_seconds += elapsed
+            if METRICS_ENABLED:
+                UPSTREAM_REQUEST_DURATION.observe(elapsed, self.upstream, status)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+    def stats(self):
+        stats = {
+            "requests": self.requests,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "average_latency_ms": round(self.total_seconds / self.requests * 1000, 3) if self.requests else 0.0
+        }
+
+        # httpcore does not expose pool metrics publicly, read them when available
+        connection_pool = getattr(self.transport, "_pool", None)
+        connections = getattr(connection_pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for connection in connections if connection.is_idle())
+
+        return stats
+
+
+_clients = {}
+_transports = {}
+
+
+def http2_available():
+    return HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def create_http_client(upstream: str, transport: httpx.AsyncBaseTransport = None):
+    """
+    Create the keep-alive client of one upstream, a custom transport (e.g. an
+    httpx.MockTransport stand-in) replaces the network transport
+    """
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            http2=http2_available()
+        )
+
+    instrumented_transport = _transports[upstream] = InstrumentedTransport(upstream, transport)
+
+    return httpx.AsyncClient(
+        transport=instrumented_transport,
+        timeout=UPSTREAM_TIMEOUTS[upstream]
+    )
+
+
+def init_http_clients(transports: dict = None):
+    """
+    Create one shared client per upstream, called once from the application lifespan
+    """
+    transports = transports or {}
+    for upstream in UPSTREAM_TIMEOUTS:
+        if upstream not in _clients:
+            _clients[upstream] = create_http_client(upstream, transports.get(upstream))
+
+
+async def close_http_clients():
+    """
+    Close the shared clients and their pooled connections on application shutdown
+    """
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def get_http_client(upstream: str):
+    """
+    Return the shared client of an upstream, creating it lazily outside the app
+    """
+    client = _clients.get(upstream)
+    if client is None:
+        client = _clients[upstream] = create_http_client(upstream)
+
+    return client
+
+
+def http_client_stats():
+    return {
+        upstream: _transports[upstream].stats()
+        for upstream in _clients
+    }
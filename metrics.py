@@ -0,0 +1,248 @@
+import os
+import time
+import asyncio
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Define global variables from environment
+METRICS_ENABLED=True if str(os.getenv("METRICS_ENABLED", "True")) == "True" else False
+METRICS_PREFIX="subscription_tracker"
+DEFAULT_BUCKETS=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(label_names: tuple, label_values: tuple, extra: str = ""):
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """
+    Prometheus histogram with cumulative buckets per label combination
+    """
+    def __init__(self, name: str, documentation: str, label_names: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        bucket_counts = series[0]
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                bucket_counts[index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (bucket_counts, total, count) in self._series.items():
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative_count += bucket_count
+                labels = format_labels(self.label_names, label_values, f'le="{upper_bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative_count}")
+            labels = format_labels(self.label_names, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: tuple):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.label_names = label_names
+        self._series = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in self._series.items():
+            lines.append(f"{self.name}{format_labels(self.label_names, label_values)} {value}")
+
+        return lines
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Latency of API requests per route", ("method", "route", "status")
+)
+DB_OPERATION_DURATION = Histogram(
+    "db_operation_duration_seconds", "Time of data functions split into connect, execute and materialize",
+    ("operation", "phase")
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Latency of calls to PayPal, Google and webhooks", ("upstream", "status")
+)
+FUNCTION_DURATION = Histogram(
+    "function_duration_seconds", "Latency of instrumented helper functions such as JWT decoding", ("function",)
+)
+
+REGISTRY = [HTTP_REQUEST_DURATION, DB_OPERATION_DURATION, UPSTREAM_REQUEST_DURATION, FUNCTION_DURATION]
+COLLECTORS = []
+
+
+def register_metric(metric):
+    REGISTRY.append(metric)
+
+    return metric
+
+
+def register_collector(collector):
+    """
+    Register a callable returning (name, documentation, {labels}, value) gauge samples at scrape time
+    """
+    COLLECTORS.append(collector)
+
+
+def render_metrics():
+    """
+    Every metric in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+
+    gauges = {}
+    for collector in COLLECTORS:
+        for name, documentation, labels, value in collector():
+            gauges.setdefault(f"{METRICS_PREFIX}_{name}", (documentation, []))[1].append((labels, value))
+    for name, (documentation, samples) in gauges.items():
+        lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge"])
+        for labels, value in samples:
+            lines.append(f"{name}{format_labels(tuple(labels), tuple(labels.values()))} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+_db_phases = contextvars.ContextVar("db_phases", default=None)
+
+
+@contextmanager
+def db_phase(phase: str):
+    """
+    Add the time of the with block to the connect or execute phase of the
+    data function that is currently running
+    """
+    phases = _db_phases.get()
+    if phases is None:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[phase] += time.perf_counter() - started_at
+
+
+def _record_db_operation(operation: str, phases: dict, total: float):
+    DB_OPERATION_DURATION.observe(phases["connect"], operation, "connect")
+    DB_OPERATION_DURATION.observe(phases["execute"], operation, "execute")
+    DB_OPERATION_DURATION.observe(max(total - phases["connect"] - phases["execute"], 0.0), operation, "materialize")
+
+
+def timed_db_operation(function):
+    """
+    Time a data function, whatever is not spent connecting or executing counts as materialize
+    """
+    if not METRICS_ENABLED:
+        return function
+
+    operation = function.__name__
+    if asyncio.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            phases = {"connect": 0.0, "execute": 0.0}
+            token = _db_phases.set(phases)
+            started_at = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                _db_phases.reset(token)
+                _record_db_operation(operation, phases, time.perf_counter() - started_at)
+
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        phases = {"connect": 0.0, "execute": 0.0}
+        token = _db_phases.set(phases)
+        started_at = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _db_phases.reset(token)
+            _record_db_operation(operation, phases, time.perf_counter() - started_at)
+
+    return wrapper
+
+
+def timed_function(function):
+    """
+    Record the latency of a plain (sync) helper function
+    """
+    if not METRICS_ENABLED:
+        return function
+
+    function_name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            FUNCTION_DURATION.observe(time.perf_counter() - started_at, function_name)
+
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every request per route template
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started_at,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code)
+            )
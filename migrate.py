@@ -0,0 +1,339 @@
+"""
+Versioned schema migrations and query plan checks.
+
+    python migrate.py                                  # apply pending migrations
+    python migrate.py --check-plans --seed-rows 200000 # EXPLAIN the hot queries
+
+Migrations are the NNNN_name.sql files in ./migrations, applied in order and
+recorded in schema_migrations. A file whose first line is
+"-- migrate: no-transaction" runs statement by statement in autocommit mode,
+which CREATE INDEX CONCURRENTLY requires. An index left INVALID by a failed
+concurrent build is dropped and built again on the next run.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import psycopg2
+from datetime import datetime
+from database import QUERIES, connect_kwargs
+
+# Define global variables
+MIGRATION_DIR_PATH=os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE_PATTERN=re.compile(r"^(\d{4})_(\w+)\.sql$")
+NO_TRANSACTION_MARKER="-- migrate: no-transaction"
+INDEX_SCAN_NODES={"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+CONCURRENT_INDEX_PATTERN=re.compile(
+    r"^CREATE\s+(?P<unique>UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(?P<name>\w+)\s+"
+    r"ON\s+(?P<table>\w+)\s*\((?P<columns>[^)]*)\)\s*(?P<where>WHERE\s+.*)?$",
+    re.IGNORECASE | re.DOTALL
+)
+DUPLICATES_SHOWN=10
+
+# Hot queries and the sample parameters their plans are checked with
+HOT_QUERY_PARAMS = {
+    "get_user_data": {"email": "seed-user-1@example.com"},
+    "get_list_subscription": {"user_email": "seed-user-1@example.com"},
+    "get_subscription_version": {"user_email": "seed-user-1@example.com"},
+    "get_list_subscription_page": {
+        "user_email": "seed-user-1@example.com",
+        "cursor_end_date": datetime.min,
+        "cursor_id": 0,
+        "limit": 51
+    },
+    "delete_subscription_data": {
+        "user_email": "seed-user-1@example.com",
+        "subscription_name": "seed-subscription-1",
+        "deleted_at": datetime(2025, 1, 1)
+    },
+    "get_upcoming_subscriptions": {
+        "cursor_end_date": datetime(2025, 1, 1),
+        "cursor_id": 0,
+        "horizon_end_date": datetime(2025, 1, 8),
+        "limit": 1000
+    },
+    "get_upcoming_renewals": {
+        "user_email": "seed-user-1@example.com",
+        "from_end_date": datetime(2025, 1, 1),
+        "horizon_end_date": datetime(2025, 1, 31),
+        "limit": 20
+    },
+    "get_subscription_summary": {"user_email": "seed-user-1@example.com"},
+    "archive_deleted_subscriptions": {
+        "deleted_before": datetime(2024, 7, 1),
+        "batch_size": 1000,
+        "archived_at": datetime(2025, 1, 1)
+    },
+    "get_in_progress_payment": {"email": "seed-user-1@example.com"},
+    "supersede_and_insert_payment": {
+        "user_id": None,
+        "user_email": "seed-user-1@example.com",
+        "amount": 10,
+        "total_balance": 10,
+        "balance_duration_days": 30,
+        "plan": "basic",
+        "payment_id": "SEED-PAYMENT-NEW",
+        "created_at": datetime(2025, 1, 1)
+    },
+    "update_payment": {
+        "payment_id": "SEED-PAYMENT-1",
+        "payment_status": "Failed",
+        "updated_at": datetime(2025, 1, 1)
+    }
+}
+
+INDEX_VALID_QUERY = """
+    SELECT pg_index.indisvalid
+    FROM pg_index
+    JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+    WHERE pg_class.relname = %(name)s AND pg_class.relnamespace = 'public'::regnamespace
+"""
+
+SEED_QUERIES = (
+    """
+    INSERT INTO subscription_tracker_user(name, email, address, phone_number, created_at)
+    SELECT 'Seed user', 'seed-user-' || n || '@example.com', '', '', DATE '2024-01-01'
+    FROM generate_series(1, %(users)s) n
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO subscription_tracker_list(
+        user_email, subscription_name, subscription_period,
+        subscription_start_date, subscription_end_date, deleted_at
+    )
+    SELECT
+        'seed-user-' || (n %% %(users)s + 1) || '@example.com',
+        'seed-subscription-' || n,
+        '1 month',
+        TIMESTAMP '2024-01-01' + (n %% 365) * INTERVAL '1 day',
+        TIMESTAMP '2024-02-01' + (n %% 365) * INTERVAL '1 day',
+        CASE WHEN n %% 3 = 0 THEN TIMESTAMP '2024-06-01' END
+    FROM generate_series(1, %(rows)s) n
+    """,
+    """
+    INSERT INTO subscription_monthly_summary(user_email, month, subscription_count, total_amount)
+    SELECT lst.user_email, amounts.month, count(*), sum(amounts.amount)
+    FROM subscription_tracker_list lst
+    CROSS JOIN LATERAL subscription_monthly_amounts(
+        lst.subscription_start_date, lst.subscription_period, lst.subscription_price
+    ) AS amounts
+    WHERE lst.deleted_at IS NULL
+    GROUP BY lst.user_email, amounts.month
+    ON CONFLICT (user_email, month) DO NOTHING
+    """,
+    """
+    INSERT INTO subscription_tracker_payment(
+        user_email, amount, total_balance, balance_duration_days, plan,
+        payment_status, payment_id, created_at
+    )
+    SELECT
+        'seed-user-' || (n %% %(users)s + 1) || '@example.com',
+        10, 10, 30, 'basic',
+        CASE WHEN n %% 20 = 0 THEN 'In Progress' ELSE 'Paid' END,
+        'SEED-PAYMENT-' || n,
+        TIMESTAMP '2024-01-01' + (n %% 365) * INTERVAL '1 day'
+    FROM generate_series(1, %(rows)s) n
+    """,
+    "ANALYZE subscription_tracker_user",
+    "ANALYZE subscription_tracker_list",
+    "ANALYZE subscription_tracker_payment",
+    "ANALYZE subscription_monthly_summary"
+)
+
+
+def list_migrations(migration_dir_path: str = MIGRATION_DIR_PATH):
+    migrations = []
+    for file_name in sorted(os.listdir(migration_dir_path)):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(migration_dir_path, file_name)))
+
+    return migrations
+
+
+def split_statements(sql: str):
+    """
+    Split a migration file into statements, migrations keep one statement per
+    semicolon-terminated block and no semicolons inside literals
+    """
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+class MigrationError(Exception):
+    pass
+
+
+def index_is_valid(cursor, index_name: str):
+    """
+    True or False for an existing index, None when there is no index of that name
+    """
+    cursor.execute(INDEX_VALID_QUERY, {"name": index_name})
+    row = cursor.fetchone()
+
+    return None if row is None else row[0]
+
+
+def check_unique_index_duplicates(cursor, index: dict):
+    """
+    Fail with the duplicated keys before a unique index is built on them,
+    Postgres would only report the first one after a full build
+    """
+    where = index["where"] or ""
+    cursor.execute(
+        f"SELECT {index['columns']}, count(*) FROM {index['table']} {where} "
+        f"GROUP BY {index['columns']} HAVING count(*) > 1 ORDER BY count(*) DESC LIMIT {DUPLICATES_SHOWN + 1}"
+    )
+    duplicates = cursor.fetchall()
+    if duplicates:
+        shown = ", ".join(
+            f"{' / '.join(str(value) for value in row[:-1])} ({row[-1]} rows)" for row in duplicates[:DUPLICATES_SHOWN]
+        )
+        more = " and more" if len(duplicates) > DUPLICATES_SHOWN else ""
+        raise MigrationError(
+            f"Cannot create unique index {index['name']}: duplicate ({index['columns']}) "
+            f"in {index['table']}: {shown}{more}. Resolve them and run the migration again"
+        )
+
+
+def create_index_concurrently(cursor, statement: str):
+    """
+    Run a CREATE INDEX CONCURRENTLY IF NOT EXISTS statement so a re-run repairs an
+    earlier failed build: a failed concurrent build leaves an INVALID index behind,
+    which IF NOT EXISTS would skip, so it is dropped and built again. The index
+    has to be valid afterwards
+    """
+    match = CONCURRENT_INDEX_PATTERN.match(statement)
+    if match is None:
+        cursor.execute(statement)
+        return
+
+    index = match.groupdict()
+    if index_is_valid(cursor, index["name"]) is False:
+        print(f"Rebuilding invalid index {index['name']}")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index['name']}")
+    if index["unique"]:
+        check_unique_index_duplicates(cursor, index)
+
+    cursor.execute(statement)
+    if not index_is_valid(cursor, index["name"]):
+        raise MigrationError(f"Index {index['name']} is not valid after CREATE INDEX CONCURRENTLY")
+
+
+def apply_migrations(connection):
+    """
+    Apply every migration that is not recorded in schema_migrations yet
+    """
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT now())"
+        )
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied_versions = {version for (version,) in cursor.fetchall()}
+
+    applied = []
+    for version, name, path in list_migrations():
+        if version in applied_versions:
+            continue
+        with open(path, "r") as openfile:
+            sql = openfile.read()
+
+        if sql.lstrip().startswith(NO_TRANSACTION_MARKER):
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                for statement in split_statements(sql):
+                    create_index_concurrently(cursor, statement)
+                cursor.execute("INSERT INTO schema_migrations(version, name) VALUES (%s, %s)", (version, name))
+        else:
+            connection.autocommit = False
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_migrations(version, name) VALUES (%s, %s)", (version, name))
+            connection.commit()
+
+        applied.append(f"{version:04d}_{name}")
+        print(f"Applied migration {version:04d}_{name}")
+
+    connection.autocommit = False
+
+    return applied
+
+
+def plan_scan_nodes(plan: dict):
+    """
+    (node type, relation) of every scan node in an EXPLAIN (FORMAT JSON) plan
+    """
+    nodes = []
+    if "Scan" in plan["Node Type"]:
+        nodes.append((plan["Node Type"], plan.get("Relation Name") or plan.get("Index Name")))
+    for child_plan in plan.get("Plans", []):
+        nodes.extend(plan_scan_nodes(child_plan))
+
+    return nodes
+
+
+def check_query_plans(connection, seed_rows: int = 0):
+    """
+    EXPLAIN every hot query and report whether it reads through an index. With
+    seed_rows the tables are filled with synthetic rows and analyzed first, inside
+    a transaction that is rolled back afterwards
+    """
+    results = {}
+    connection.autocommit = False
+    try:
+        with connection.cursor() as cursor:
+            if seed_rows:
+                seed_params = {"rows": seed_rows, "users": max(seed_rows // 20, 1)}
+                for seed_query in SEED_QUERIES:
+                    cursor.execute(seed_query, seed_params)
+
+            for name, params in HOT_QUERY_PARAMS.items():
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {QUERIES[name].pyformat_text}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scan_nodes = plan_scan_nodes(plan[0]["Plan"])
+                results[name] = {
+                    "uses_index": any(node_type in INDEX_SCAN_NODES for node_type, _ in scan_nodes),
+                    "sequential_scans": [relation for node_type, relation in scan_nodes if node_type == "Seq Scan"],
+                    "scan_nodes": scan_nodes
+                }
+    finally:
+        connection.rollback()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check-plans", action="store_true", help="EXPLAIN the hot queries after migrating")
+    parser.add_argument("--seed-rows", type=int, default=0, help="synthetic rows to plan against (rolled back)")
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(**connect_kwargs())
+    try:
+        try:
+            apply_migrations(connection)
+        except MigrationError as error:
+            print(f"Migration failed: {error}")
+            return 1
+        if not args.check_plans:
+            return 0
+
+        failed = False
+        for name, result in check_query_plans(connection, args.seed_rows).items():
+            ok = result["uses_index"] and not result["sequential_scans"]
+            failed = failed or not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {name}: {result['scan_nodes']}")
+
+        return 1 if failed else 0
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
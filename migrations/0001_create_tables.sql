@@ -0,0 +1,34 @@
+-- Tables used by module.py, created only when they do not exist yet
+CREATE TABLE IF NOT EXISTS subscription_tracker_user(
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    email TEXT NOT NULL,
+    address TEXT,
+    phone_number TEXT,
+    created_at DATE
+);
+
+CREATE TABLE IF NOT EXISTS subscription_tracker_list(
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES subscription_tracker_user(id),
+    user_email TEXT NOT NULL,
+    subscription_name TEXT NOT NULL,
+    subscription_period TEXT NOT NULL,
+    subscription_start_date TIMESTAMP NOT NULL,
+    subscription_end_date TIMESTAMP NOT NULL,
+    deleted_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS subscription_tracker_payment(
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER,
+    user_email TEXT NOT NULL,
+    amount NUMERIC(12, 2),
+    total_balance INTEGER,
+    balance_duration_days INTEGER,
+    plan TEXT,
+    payment_status TEXT NOT NULL,
+    payment_id TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP
+);
@@ -0,0 +1,30 @@
+-- migrate: no-transaction
+-- Indexes for the predicates of the hot queries, built concurrently so existing tables stay writable
+
+-- get_user_data.sql and the user_id subquery of the subscription inserts
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_user_email_key
+    ON subscription_tracker_user (email);
+
+-- get_list_subscription.sql and the keyset pages of get_list_subscription_page.sql
+CREATE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_list_active_user_idx
+    ON subscription_tracker_list (user_email, subscription_end_date, id)
+    WHERE deleted_at IS NULL;
+
+-- delete_subscription_data.sql and delete_subscriptions_bulk.sql
+CREATE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_list_active_name_idx
+    ON subscription_tracker_list (user_email, subscription_name)
+    WHERE deleted_at IS NULL;
+
+-- get_upcoming_subscriptions.sql used by the renewal scheduler
+CREATE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_list_active_end_date_idx
+    ON subscription_tracker_list (subscription_end_date, id)
+    WHERE deleted_at IS NULL;
+
+-- update_payment.sql
+CREATE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_payment_payment_id_idx
+    ON subscription_tracker_payment (payment_id);
+
+-- get_in_progress_payment.sql
+CREATE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_payment_in_progress_idx
+    ON subscription_tracker_payment (user_email, created_at DESC)
+    WHERE payment_status = 'In Progress';
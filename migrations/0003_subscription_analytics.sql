@@ -0,0 +1,36 @@
+-- Optional price per subscription period and the per-user, per-month spending summary
+ALTER TABLE subscription_tracker_list ADD COLUMN IF NOT EXISTS subscription_price NUMERIC(12, 2);
+
+CREATE TABLE IF NOT EXISTS subscription_monthly_summary(
+    user_email TEXT NOT NULL,
+    month DATE NOT NULL,
+    subscription_count INTEGER NOT NULL DEFAULT 0,
+    total_amount NUMERIC(16, 4) NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_email, month)
+);
+
+-- Months covered by one subscription period and the share of its price per month,
+-- e.g. "3 month" at 30.00 starting 2025-01-15 gives 10.0000 for January to March
+CREATE OR REPLACE FUNCTION subscription_monthly_amounts(
+    subscription_start_date TIMESTAMP,
+    subscription_period TEXT,
+    subscription_price NUMERIC
+)
+RETURNS TABLE(month DATE, amount NUMERIC)
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT
+        (date_trunc('month', subscription_start_date) + month_offset * INTERVAL '1 month')::date,
+        COALESCE(round(subscription_price / period.months, 4), 0)
+    FROM (SELECT GREATEST(substring(subscription_period FROM '\d+')::int, 1) AS months) period
+    CROSS JOIN generate_series(0, period.months - 1) month_offset
+$$;
+
+INSERT INTO subscription_monthly_summary(user_email, month, subscription_count, total_amount)
+SELECT lst.user_email, amounts.month, count(*), sum(amounts.amount)
+FROM subscription_tracker_list lst
+CROSS JOIN LATERAL subscription_monthly_amounts(
+    lst.subscription_start_date, lst.subscription_period, lst.subscription_price
+) AS amounts
+WHERE lst.deleted_at IS NULL
+GROUP BY lst.user_email, amounts.month
+ON CONFLICT (user_email, month) DO NOTHING;
@@ -0,0 +1,23 @@
+-- migrate: no-transaction
+-- Archive of soft-deleted subscriptions moved out of subscription_tracker_list by archival.py
+
+CREATE TABLE IF NOT EXISTS subscription_tracker_list_archive(
+    id BIGINT PRIMARY KEY,
+    user_id INTEGER,
+    user_email TEXT NOT NULL,
+    subscription_name TEXT NOT NULL,
+    subscription_period TEXT NOT NULL,
+    subscription_start_date TIMESTAMP NOT NULL,
+    subscription_end_date TIMESTAMP NOT NULL,
+    subscription_price NUMERIC(12, 2),
+    deleted_at TIMESTAMP NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS subscription_tracker_list_archive_user_idx
+    ON subscription_tracker_list_archive (user_email, deleted_at);
+
+-- archive_deleted_subscriptions.sql picks the oldest soft-deleted rows without touching live ones
+CREATE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_list_deleted_at_idx
+    ON subscription_tracker_list (deleted_at)
+    WHERE deleted_at IS NOT NULL;
@@ -0,0 +1,43 @@
+-- Subscription changes the renewal scheduler has to follow, sent with NOTIFY on commit so the
+-- one worker running the scheduler sees the writes of every worker and script
+
+CREATE OR REPLACE FUNCTION notify_subscription_renewal()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    subscription RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        subscription := OLD;
+    ELSE
+        subscription := NEW;
+    END IF;
+    -- Past end dates and updates of rows that were already deleted are of no interest to the scheduler
+    IF subscription.subscription_end_date < (now() AT TIME ZONE 'UTC')
+        OR (TG_OP = 'UPDATE' AND OLD.deleted_at IS NOT NULL AND NEW.deleted_at IS NOT NULL) THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('subscription_renewals', json_build_object(
+        'user_email', subscription.user_email,
+        'subscription_name', subscription.subscription_name,
+        'subscription_period', subscription.subscription_period,
+        'subscription_end_date', subscription.subscription_end_date,
+        'deleted', TG_OP = 'DELETE' OR subscription.deleted_at IS NOT NULL
+    )::text);
+
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS subscription_tracker_list_renewal_notify ON subscription_tracker_list;
+CREATE TRIGGER subscription_tracker_list_renewal_notify
+    AFTER INSERT OR UPDATE OF subscription_end_date, subscription_period, deleted_at
+    ON subscription_tracker_list
+    FOR EACH ROW EXECUTE FUNCTION notify_subscription_renewal();
+
+-- Hard deletes of rows that were never soft deleted, archived rows are skipped
+DROP TRIGGER IF EXISTS subscription_tracker_list_renewal_notify_delete ON subscription_tracker_list;
+CREATE TRIGGER subscription_tracker_list_renewal_notify_delete
+    AFTER DELETE ON subscription_tracker_list
+    FOR EACH ROW WHEN (OLD.deleted_at IS NULL) EXECUTE FUNCTION notify_subscription_renewal();
@@ -0,0 +1,50 @@
+-- Per-user version of the subscription list, the ETag of conditional GETs. Statement triggers
+-- bump it on every change to subscription_tracker_list, whichever worker, script or query
+-- made it, in the same transaction as the change. Versions come from one sequence so a
+-- version is never handed out twice, not even after a user's row is removed
+
+CREATE SEQUENCE IF NOT EXISTS subscription_list_version_seq;
+
+CREATE TABLE IF NOT EXISTS subscription_list_version(
+    user_email TEXT PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION bump_subscription_list_versions()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Deleting rows that were already soft deleted (archiving) changes nothing users see.
+    -- Sorted so statements touching several users lock their version rows in the same order
+    INSERT INTO subscription_list_version AS current(user_email, version)
+    SELECT changed.user_email, nextval('subscription_list_version_seq')
+    FROM (
+        SELECT DISTINCT user_email
+        FROM changed_rows
+        WHERE TG_OP <> 'DELETE' OR deleted_at IS NULL
+        ORDER BY user_email
+    ) changed
+    ON CONFLICT (user_email) DO UPDATE SET version = excluded.version;
+
+    RETURN NULL;
+END
+$$;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS subscription_tracker_list_version_insert ON subscription_tracker_list;
+CREATE TRIGGER subscription_tracker_list_version_insert
+    AFTER INSERT ON subscription_tracker_list
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_subscription_list_versions();
+
+DROP TRIGGER IF EXISTS subscription_tracker_list_version_update ON subscription_tracker_list;
+CREATE TRIGGER subscription_tracker_list_version_update
+    AFTER UPDATE ON subscription_tracker_list
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_subscription_list_versions();
+
+DROP TRIGGER IF EXISTS subscription_tracker_list_version_delete ON subscription_tracker_list;
+CREATE TRIGGER subscription_tracker_list_version_delete
+    AFTER DELETE ON subscription_tracker_list
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_subscription_list_versions();
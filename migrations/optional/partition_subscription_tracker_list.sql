@@ -0,0 +1,141 @@
+-- Optional, not applied by migrate.py: range-partition subscription_tracker_list by deleted_at
+-- so archival.py archives whole months with DETACH PARTITION instead of batched deletes.
+--
+--     psql -v ON_ERROR_STOP=1 -f migrations/optional/partition_subscription_tracker_list.sql
+--
+-- Run it once in a maintenance window after migrations up to 0006, it rewrites the table
+-- under an ACCESS EXCLUSIVE lock. The partition key is COALESCE(deleted_at, 'infinity'), so
+-- active rows (deleted_at IS NULL) live in the real range partition subscription_tracker_list_active
+-- rather than a DEFAULT partition, and a soft delete moves the row into the monthly partition
+-- subscription_tracker_list_pYYYYMM of its deleted_at. With no DEFAULT partition archival.py can
+-- DETACH PARTITION CONCURRENTLY (PostgreSQL 14) and attaching a new month never scans or locks
+-- the active rows.
+--
+-- Lock costs afterwards: attaching a month takes SHARE UPDATE EXCLUSIVE on the parent for the
+-- length of a catalog update, detaching one concurrently takes the same lock and waits for the
+-- queries already using the partition, neither blocks reads or writes. Queries filtering on
+-- deleted_at IS NULL are not pruned to the active partition, they probe the (empty) partial
+-- indexes of the monthly partitions too.
+--
+-- A soft delete fails when the partition of its month is missing, archival.py creates
+-- ARCHIVE_PARTITION_MONTHS_AHEAD months ahead on every run, so run it at least monthly.
+-- A partitioned table cannot have a primary key without the partition key, id stays unique
+-- through its sequence and is indexed in every partition.
+
+BEGIN;
+
+LOCK TABLE subscription_tracker_list IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE subscription_tracker_list RENAME TO subscription_tracker_list_unpartitioned;
+ALTER SEQUENCE subscription_tracker_list_id_seq OWNED BY NONE;
+ALTER INDEX subscription_tracker_list_active_user_idx RENAME TO subscription_tracker_list_unpartitioned_active_user_idx;
+ALTER INDEX subscription_tracker_list_active_name_idx RENAME TO subscription_tracker_list_unpartitioned_active_name_idx;
+ALTER INDEX subscription_tracker_list_active_end_date_idx
+    RENAME TO subscription_tracker_list_unpartitioned_active_end_date_idx;
+ALTER INDEX subscription_tracker_list_deleted_at_idx RENAME TO subscription_tracker_list_unpartitioned_deleted_at_idx;
+
+CREATE TABLE subscription_tracker_list(
+    id BIGINT NOT NULL DEFAULT nextval('subscription_tracker_list_id_seq'),
+    user_id INTEGER REFERENCES subscription_tracker_user(id),
+    user_email TEXT NOT NULL,
+    subscription_name TEXT NOT NULL,
+    subscription_period TEXT NOT NULL,
+    subscription_start_date TIMESTAMP NOT NULL,
+    subscription_end_date TIMESTAMP NOT NULL,
+    deleted_at TIMESTAMP,
+    subscription_price NUMERIC(12, 2)
+) PARTITION BY RANGE ((COALESCE(deleted_at, 'infinity'::timestamp)));
+
+ALTER SEQUENCE subscription_tracker_list_id_seq OWNED BY subscription_tracker_list.id;
+
+CREATE TABLE subscription_tracker_list_active PARTITION OF subscription_tracker_list
+    FOR VALUES FROM ('infinity') TO (MAXVALUE);
+
+-- Monthly partitions for every month from months_from to months_until, archival.py keeps a few
+-- months ahead. Each one is created as a plain table and then attached: ATTACH PARTITION only
+-- takes SHARE UPDATE EXCLUSIVE on the parent where CREATE TABLE ... PARTITION OF would take
+-- ACCESS EXCLUSIVE, and validating the bound of the new, empty table is instant
+CREATE OR REPLACE FUNCTION ensure_subscription_list_partitions(months_from DATE, months_until DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    partition_month DATE;
+    partition_name TEXT;
+    month_start TIMESTAMP;
+    month_end TIMESTAMP;
+    created INTEGER := 0;
+BEGIN
+    FOR partition_month IN
+        SELECT generate_series(date_trunc('month', months_from), date_trunc('month', months_until), INTERVAL '1 month')::date
+    LOOP
+        partition_name := format('subscription_tracker_list_p%s', to_char(partition_month, 'YYYYMM'));
+        month_start := partition_month;
+        month_end := partition_month + INTERVAL '1 month';
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE subscription_tracker_list INCLUDING DEFAULTS)', partition_name);
+            EXECUTE format(
+                'ALTER TABLE subscription_tracker_list ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+            created := created + 1;
+        END IF;
+    END LOOP;
+
+    RETURN created;
+END
+$$;
+
+SELECT ensure_subscription_list_partitions(COALESCE(min(deleted_at), now())::date, (now() + INTERVAL '3 months')::date)
+FROM subscription_tracker_list_unpartitioned;
+
+INSERT INTO subscription_tracker_list(
+    id, user_id, user_email, subscription_name, subscription_period,
+    subscription_start_date, subscription_end_date, deleted_at, subscription_price
+)
+SELECT
+    id, user_id, user_email, subscription_name, subscription_period,
+    subscription_start_date, subscription_end_date, deleted_at, subscription_price
+FROM subscription_tracker_list_unpartitioned;
+
+CREATE INDEX subscription_tracker_list_id_idx ON subscription_tracker_list (id);
+CREATE INDEX subscription_tracker_list_active_user_idx
+    ON subscription_tracker_list (user_email, subscription_end_date, id)
+    WHERE deleted_at IS NULL;
+CREATE INDEX subscription_tracker_list_active_name_idx
+    ON subscription_tracker_list (user_email, subscription_name)
+    WHERE deleted_at IS NULL;
+CREATE INDEX subscription_tracker_list_active_end_date_idx
+    ON subscription_tracker_list (subscription_end_date, id)
+    WHERE deleted_at IS NULL;
+CREATE INDEX subscription_tracker_list_deleted_at_idx
+    ON subscription_tracker_list (deleted_at)
+    WHERE deleted_at IS NOT NULL;
+
+-- The renewal notifications of 0005 went away with the old table
+CREATE TRIGGER subscription_tracker_list_renewal_notify
+    AFTER INSERT OR UPDATE OF subscription_end_date, subscription_period, deleted_at
+    ON subscription_tracker_list
+    FOR EACH ROW EXECUTE FUNCTION notify_subscription_renewal();
+CREATE TRIGGER subscription_tracker_list_renewal_notify_delete
+    AFTER DELETE ON subscription_tracker_list
+    FOR EACH ROW WHEN (OLD.deleted_at IS NULL) EXECUTE FUNCTION notify_subscription_renewal();
+
+-- So did the subscription list versions of 0006
+CREATE TRIGGER subscription_tracker_list_version_insert
+    AFTER INSERT ON subscription_tracker_list
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_subscription_list_versions();
+CREATE TRIGGER subscription_tracker_list_version_update
+    AFTER UPDATE ON subscription_tracker_list
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_subscription_list_versions();
+CREATE TRIGGER subscription_tracker_list_version_delete
+    AFTER DELETE ON subscription_tracker_list
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_subscription_list_versions();
+
+DROP TABLE subscription_tracker_list_unpartitioned;
+
+ANALYZE subscription_tracker_list;
+
+COMMIT;
@@ -1,51 +1,118 @@
 import os
 import re
 import jwt
-import pytz
-import psycopg2
-import requests
+import base64
+import calendar
+import time
+import hashlib
+import threading
 import warnings
-import pandas as pd
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from metrics import timed_db_operation, timed_function
+from settings import settings
+from database import get_pool, execute_query, iter_query, iter_rows
 from datetime import datetime, timedelta, timezone
-from dateutil.relativedelta import relativedelta
 
 # Define global variables
-QUERY_DIR_PATH="./queries"
-JWT_SECRET_KEY=os.getenv("JWT_SECRET_KEY")
-JWT_ALGORITHM=os.getenv("JWT_ALGORITHM")
+JWT_CACHE_SIZE=int(os.getenv("JWT_CACHE_SIZE", "10000"))
+SUBSCRIPTION_PAGE_MAX_LIMIT=int(os.getenv("SUBSCRIPTION_PAGE_MAX_LIMIT", "1000"))
+# Precision and scale of the subscription_price NUMERIC(12, 2) column
+SUBSCRIPTION_PRICE_PRECISION=12
+SUBSCRIPTION_PRICE_SCALE=2
 
 
 def postgresql_connect():
     """
-    Connect to postgresql database
+    Borrow a connection from the shared postgresql connection pool,
+    it is given back to the pool when the with block exits
     """
-    database_client = psycopg2.connect(
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USERNAME"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT")
-    )
-
-    return database_client
+    return get_pool().connection()
 
 
+@timed_function
 def create_jwt(data: dict):
     """
     Create JWT token for cookie session
     """
     data["exp"] = datetime.utcnow() + timedelta(hours=4)
-    token = jwt.encode(data, JWT_SECRET_KEY, JWT_ALGORITHM)
+    token = jwt.encode(data, settings.jwt_secret_key, settings.jwt_algorithm)
 
     return token
 
 
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified JWT claims keyed by the token hash. An entry
+    expires at the token's exp claim, and only successfully verified tokens are
+    ever stored
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() >= entry[0]:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return dict(entry[1])
+
+    def set(self, token: str, claims: dict):
+        expires_at = claims.get("exp")
+        if self.max_size <= 0 or not isinstance(expires_at, (int, float)):
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(claims))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+jwt_cache = VerifiedTokenCache(max_size=JWT_CACHE_SIZE)
+
+
+@timed_function
 def decode_jwt(token: str):
     """
-    Decode JWT token which is retrieved from client
+    Decode JWT token which is retrieved from client, verified claims are cached
+    until the token expires so repeated requests skip the signature check
     """
+    if isinstance(token, str):
+        payload = jwt_cache.get(token)
+        if payload is not None:
+            return payload
+
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        jwt_cache.set(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         return {"error": "Token expired"}
@@ -53,105 +120,119 @@ def decode_jwt(token: str):
         return {"error": "Invalid token"}
     
 
+@timed_db_operation
 def insert_new_user(json_data):
     """
     Insert new user after signing up
     """
-    connection = postgresql_connect()
-    cursor = connection.cursor()
-
-    created_at = datetime.now(pytz.timezone("UTC")).strftime("%Y-%m-%d")
-
-    with open("./queries/insert_new_user.sql", "r") as openfile:
-        query_file = openfile.read()
-
-    values = (
-        json_data["name"],
-        json_data["email"],
-        json_data["address"],
-        json_data["phone_number"],
-        created_at
-    )
-    cursor.execute(query_file, values)
-    connection.commit()
-
-    cursor.close()
-    connection.close()
+    created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    values = {
+        "name": json_data["name"],
+        "email": json_data["email"],
+        "address": json_data["address"],
+        "phone_number": json_data["phone_number"],
+        "created_at": created_at
+    }
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "insert_new_user", values)
+        connection.commit()
 
 
+@timed_db_operation
 def insert_payment(payment_data: dict):
     """
     Insert payments
     """
-    connection = postgresql_connect()
-    cursor = connection.cursor()
-
-    with open(f"{QUERY_DIR_PATH}/insert_payment.sql", "r") as openfile:
-        query_file = openfile.read()
-
-    values = (
-        payment_data["user_id"],
-        payment_data["user_email"],
-        payment_data["amount"],
-        payment_data["total_balance"],
-        payment_data["balance_duration_days"],
-        payment_data["plan"],
-        payment_data["payment_status"],
-        payment_data["payment_id"],
-        datetime.now(pytz.timezone("UTC")).strftime("%Y-%m-%d %H:%M:%S")
-    )
-    cursor.execute(query_file, values)
-    connection.commit()
-
-    cursor.close()
-    connection.close()
+    values = {
+        "user_id": payment_data["user_id"],
+        "user_email": payment_data["user_email"],
+        "amount": payment_data["amount"],
+        "total_balance": payment_data["total_balance"],
+        "balance_duration_days": payment_data["balance_duration_days"],
+        "plan": payment_data["plan"],
+        "payment_status": payment_data["payment_status"],
+        "payment_id": payment_data["payment_id"],
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "insert_payment", values)
+        connection.commit()
 
     print("Successfully inserted payment data !")
 
 
+@timed_db_operation
 def get_in_progress_payment(user_email: str):
-    warnings.filterwarnings("ignore")
-    connection = postgresql_connect()
-    with open(f"{QUERY_DIR_PATH}/get_in_progress_payment.sql", "r") as openfile:
-        query_file = openfile.read()
-        query_file = query_file.replace("@EMAIL", str(user_email))
-    
-    df = pd.read_sql_query(query_file, connection)
-    if df.values.tolist():
-        payment_token = df["payment_id"].values[0]
-    else:
-        payment_token = None
-
-    connection.close()
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "get_in_progress_payment", {"email": str(user_email)})
+            row = cursor.fetchone()
+    payment_token = row[0] if row is not None else None
 
     return payment_token
 
 
 
+@timed_db_operation
+def supersede_and_insert_payment(payment_data: dict):
+    """
+    Fail the user's in progress payments and insert the new one in a single
+    transaction, returns the superseded payment ids
+    """
+    values = {
+        "user_id": payment_data["user_id"],
+        "user_email": payment_data["user_email"],
+        "amount": payment_data["amount"],
+        "total_balance": payment_data["total_balance"],
+        "balance_duration_days": payment_data["balance_duration_days"],
+        "plan": payment_data["plan"],
+        "payment_id": payment_data["payment_id"],
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            # Serializes concurrent checkouts of the same email
+            execute_query(cursor, "lock_user_payments", {"user_email": values["user_email"]})
+            execute_query(cursor, "supersede_and_insert_payment", values)
+            _, superseded_payment_ids = cursor.fetchone()
+        connection.commit()
+
+    return list(superseded_payment_ids)
+
+
+@timed_db_operation
 def update_payment(payment_id: str,
                    payment_status: str):
-    connection = postgresql_connect()
-    cursor = connection.cursor()
-
-    with open(f"{QUERY_DIR_PATH}/update_payment.sql", "r") as openfile:
-        query_file = openfile.read()
-        query_file = query_file.replace("@PAYMENT_ID", str(payment_id))
-        query_file = query_file.replace("@PAYMENT_STATUS", str(payment_status))
-        query_file = query_file.replace("@UPDATED_AT", datetime.now(pytz.timezone('UTC')).strftime("%Y-%m-%d %H:%M:%S"))
-    
-    cursor.execute(query_file, connection)
-    connection.commit()
+    """
+    Move an in progress payment to its final status, replays leave a final
+    status as it is. Returns the status the payment ends up with
+    """
+    values = {
+        "payment_id": str(payment_id),
+        "payment_status": str(payment_status),
+        "updated_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "update_payment", values)
+            row = cursor.fetchone()
+        connection.commit()
 
-    cursor.close()
-    connection.close()
+    return row[0] if row is not None else None
 
 
 def get_paypal_access_token():
+    # Only scripts use the sync version, the API goes through paypal_auth
+    import requests
+
     warnings.filterwarnings("ignore")
     response = requests.post(
-        url=f"{os.getenv('PAYPAL_BASE_URL')}/v1/oauth2/token",
+        url=f"{settings.paypal_base_url}/v1/oauth2/token",
         data={"grant_type": "client_credentials"},
-        auth=(os.getenv("PAYPAL_CLIENT_ID"), os.getenv("PAYPAL_CLIENT_SECRET"))
+        auth=(settings.paypal_client_id, settings.paypal_client_secret)
     )
     if response.status_code == 200:
         access_token = response.json()["access_token"]
@@ -161,87 +242,369 @@ def get_paypal_access_token():
     return access_token
 
 
+@timed_db_operation
 def get_user_data(email: str):
-    warnings.filterwarnings("ignore")
-    connection = postgresql_connect()
-    with open(f"{QUERY_DIR_PATH}/get_user_data.sql", "r") as openfile:
-        query_file = openfile.read()
-        query_file = query_file.replace("@EMAIL", email)
-    
-    df_user = pd.read_sql_query(query_file, connection)
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "get_user_data", {"email": email})
+            list_user_data = [{"email": user_email} for (user_email,) in iter_rows(cursor)]
 
-    data = df_user.to_json(orient="records")
+    return list_user_data
 
-    connection.close()
 
-    return data
+def subscription_row_to_dict(row: tuple):
+    """
+    Turn a get_list_subscription row into the dictionary sent to the frontend, the
+    dates stay datetimes and are formatted by the response serializer
+    """
+    return {
+        "user_email": row[0],
+        "subscription_name": row[1],
+        "subscription_period": row[2],
+        "subscription_start_date": row[3],
+        "subscription_end_date": row[4]
+    }
 
 
-def get_subs_data(user_email: str):
-    warnings.filterwarnings("ignore")
-    connection = postgresql_connect()
-    with open(f"{QUERY_DIR_PATH}/get_list_subscription.sql", "r") as openfile:
-        query_file = openfile.read()
-        query_file = query_file.replace("@USER_EMAIL", str(user_email))
+def encode_page_cursor(subscription_end_date: datetime, subscription_id: int):
+    """
+    Opaque keyset cursor pointing after the given (subscription_end_date, id)
+    """
+    raw_cursor = f"{subscription_end_date.isoformat()}|{subscription_id}"
 
-    df_user_data = pd.read_sql_query(query_file, connection)
-    if df_user_data.values.tolist():
-        df_user_data["subscription_start_date"] = df_user_data["subscription_start_date"].dt.strftime("%d %b %Y")
-        df_user_data["subscription_end_date"] = df_user_data["subscription_end_date"].dt.strftime("%d %b %Y")
-    list_subscription_data = df_user_data.to_dict(orient="records")
+    return base64.urlsafe_b64encode(raw_cursor.encode()).decode()
+
+
+def decode_page_cursor(page_cursor: str = None):
+    """
+    Keyset position of a cursor, the first page starts before every row
+    """
+    if not page_cursor:
+        return {"cursor_end_date": datetime.min, "cursor_id": 0}
+
+    try:
+        raw_cursor = base64.urlsafe_b64decode(page_cursor.encode()).decode()
+        end_date_str, id_str = raw_cursor.split("|")
+        cursor_end_date = datetime.fromisoformat(end_date_str)
+        cursor_id = int(id_str)
+        # Anything encode_page_cursor cannot produce would only fail later as a database error
+        if cursor_end_date.tzinfo is not None or not 0 <= cursor_id < 2 ** 63:
+            raise ValueError("cursor position out of range")
+        return {"cursor_end_date": cursor_end_date, "cursor_id": cursor_id}
+    except ValueError as error:
+        raise ValueError(f"Invalid page cursor: {page_cursor}") from error
+
+
+def page_query_params(user_email: str, limit: int, page_cursor: str = None):
+    """
+    Parameters of get_list_subscription_page, one extra row is requested to tell
+    whether another page exists
+    """
+    limit = max(1, min(int(limit), SUBSCRIPTION_PAGE_MAX_LIMIT))
+    params = {"user_email": str(user_email), "limit": limit + 1, **decode_page_cursor(page_cursor)}
+
+    return params, limit
+
+
+def build_subscription_page(user_email: str, rows: list, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_page_cursor(rows[-1][4], rows[-1][5])
 
     subscription_data = {
         "data": {
             "user_email": user_email,
-            "list_data": list_subscription_data
+            "list_data": [subscription_row_to_dict(row) for row in rows],
+            "next_cursor": next_cursor
         }
     }
 
-    connection.close()
+    return subscription_data
+
+
+def iter_subs_data(user_email: str):
+    """
+    Lazily yield the user's active subscriptions from a server-side cursor, the
+    pooled connection is held until the generator is exhausted or closed
+    """
+    with postgresql_connect() as connection:
+        for row in iter_query(connection, "get_list_subscription", {"user_email": str(user_email)}):
+            yield subscription_row_to_dict(row)
+
+
+@timed_db_operation
+def get_subs_data(user_email: str):
+    list_subscription_data = list(iter_subs_data(user_email))
+
+    subscription_data = {
+        "data": {
+            "user_email": user_email,
+            "list_data": list_subscription_data
+        }
+    }
 
     return subscription_data
 
 
-def insert_new_subscription_data(data: dict):
-    connection = postgresql_connect()
-    cursor = connection.cursor()
-    
-    with open(f"{QUERY_DIR_PATH}/insert_new_subscription.sql", "r") as openfile:
-        query_file = openfile.read()
+def build_subscription_analytics(user_email: str, rows: list, year: int = None):
+    """
+    Monthly and yearly spending from get_subscription_summary rows, optionally of one year
+    """
+    list_monthly_data = []
+    yearly_totals = {}
+    for month, subscription_count, total_amount in rows:
+        if year is not None and month.year != year:
+            continue
+        list_monthly_data.append({
+            "month": month.strftime("%Y-%m"),
+            "subscription_count": subscription_count,
+            "total_amount": float(round(total_amount, 2))
+        })
+        yearly_totals[month.year] = yearly_totals.get(month.year, Decimal(0)) + total_amount
+
+    subscription_analytics = {
+        "data": {
+            "user_email": user_email,
+            "monthly": list_monthly_data,
+            "yearly": [
+                {"year": summary_year, "total_amount": float(round(total_amount, 2))}
+                for summary_year, total_amount in sorted(yearly_totals.items())
+            ]
+        }
+    }
+
+    return subscription_analytics
+
+
+@timed_db_operation
+def get_subscription_analytics(user_email: str, year: int = None):
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "get_subscription_summary", {"user_email": str(user_email)})
+            rows = cursor.fetchall()
+
+    return build_subscription_analytics(user_email, rows, year)
+
+
+def parse_subscription_period(subscription_period: str):
+    """
+    Number of months in a subscription period such as "3 month"
+    """
+    return int(re.sub(r"\smonth", "", subscription_period))
+
+
+def parse_subscription_price(subscription_price):
+    """
+    Price of one subscription period as a Decimal rounded to the column scale the
+    way Postgres rounds it, None when it is not given. A price that does not fit
+    the column raises ValueError here instead of failing the whole statement
+    """
+    if subscription_price is None or subscription_price == "":
+        return None
+    try:
+        price = Decimal(str(subscription_price))
+    except InvalidOperation:
+        raise ValueError(f"invalid subscription price {subscription_price!r}")
+    if not price.is_finite() or price < 0:
+        raise ValueError(f"invalid subscription price {subscription_price!r}")
+
+    price = price.quantize(Decimal(1).scaleb(-SUBSCRIPTION_PRICE_SCALE), rounding=ROUND_HALF_UP)
+    if price.adjusted() >= SUBSCRIPTION_PRICE_PRECISION - SUBSCRIPTION_PRICE_SCALE:
+        raise ValueError(
+            f"subscription price {subscription_price!r} has more than "
+            f"{SUBSCRIPTION_PRICE_PRECISION - SUBSCRIPTION_PRICE_SCALE} digits before the decimal point"
+        )
+
+    return price
+
+
+def add_months(date_value: datetime, months: int):
+    """
+    Shift a date by whole months, clamping the day to the end of the target month
+    """
+    month_index = date_value.month - 1 + months
+    year = date_value.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(date_value.day, calendar.monthrange(year, month)[1])
+
+    return date_value.replace(year=year, month=month, day=day)
+
+
+@timed_db_operation
+def get_subs_data_page(user_email: str,
+                       limit: int,
+                       page_cursor: str = None):
+    """
+    One keyset page of the user's subscriptions ordered by end date
+    """
+    params, limit = page_query_params(user_email, limit, page_cursor)
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "get_list_subscription_page", params)
+            rows = cursor.fetchall()
+
+    return build_subscription_page(user_email, rows, limit)
+
+
+def calculate_subscription_end_date(subscription_start_date: str,
+                                    subscription_period: str):
+    """
+    End date of a subscription from its start date (YYYY-MM-DD) and period (e.g. "3 month")
+    """
+    subs_start_date = datetime.strptime(subscription_start_date, "%Y-%m-%d")
+
+    return add_months(subs_start_date, parse_subscription_period(subscription_period))
 
+
+def prepare_bulk_subscriptions(list_data: list):
+    """
+    Validate a list of new subscriptions and compute every end date in one pass.
+    Returns the column arrays of the valid rows for the bulk insert and one result
+    per item, invalid items are reported instead of inserted
+    """
+    columns = {
+        "user_emails": [],
+        "subscription_names": [],
+        "subscription_periods": [],
+        "subscription_start_dates": [],
+        "subscription_end_dates": [],
+        "subscription_prices": []
+    }
+    results = []
+    period_months = {}
+
+    for index, data in enumerate(list_data):
+        try:
+            subscription_period = data["subscription_period"]
+            if subscription_period not in period_months:
+                period_months[subscription_period] = parse_subscription_period(subscription_period)
+            subs_start_date = datetime.strptime(data["subscription_start_date"], "%Y-%m-%d")
+            subs_end_date = add_months(subs_start_date, period_months[subscription_period])
+            user_email = str(data["user_email"])
+            subscription_name = str(data["subscription_name"])
+            subscription_price = parse_subscription_price(data.get("subscription_price"))
+        except (KeyError, TypeError, ValueError) as error:
+            results.append({"index": index, "status": "error", "detail": f"Invalid subscription data: {error}"})
+            continue
+
+        columns["user_emails"].append(user_email)
+        columns["subscription_names"].append(subscription_name)
+        columns["subscription_periods"].append(subscription_period)
+        columns["subscription_start_dates"].append(subs_start_date)
+        columns["subscription_end_dates"].append(subs_end_date)
+        columns["subscription_prices"].append(subscription_price)
+        results.append({"index": index, "subscription_name": subscription_name, "status": "inserted"})
+
+    return columns, results
+
+
+def prepare_bulk_deletions(list_data: list):
+    """
+    Validate a list of deletions, returns the column arrays of the valid rows and
+    one result per item
+    """
+    columns = {
+        "user_emails": [],
+        "subscription_names": []
+    }
+    results = []
+
+    for index, data in enumerate(list_data):
+        try:
+            user_email = str(data["email"])
+            subscription_name = str(data["deleted_subs_name"])
+        except (KeyError, TypeError) as error:
+            results.append({"index": index, "status": "error", "detail": f"Invalid deletion data: {error}"})
+            continue
+
+        columns["user_emails"].append(user_email)
+        columns["subscription_names"].append(subscription_name)
+        results.append({"index": index, "subscription_name": subscription_name, "status": "pending"})
+
+    return columns, results
+
+
+def resolve_bulk_deletions(columns: dict, results: list, deleted_rows):
+    """
+    Mark each pending deletion as deleted or not_found from the rows the UPDATE returned
+    """
+    deleted_keys = {(user_email, subscription_name) for user_email, subscription_name in deleted_rows}
+    pending_keys = iter(zip(columns["user_emails"], columns["subscription_names"]))
+    for result in results:
+        if result["status"] == "pending":
+            result["status"] = "deleted" if next(pending_keys) in deleted_keys else "not_found"
+
+    return results
+
+
+@timed_db_operation
+def insert_new_subscription_data(data: dict):
     # Set subscription end date
-    subs_period_int = int(re.sub(r"\smonth", "", data["subscription_period"]))
-    subs_end_date = datetime.strptime(data["subscription_start_date"], "%Y-%m-%d") + relativedelta(months=subs_period_int)
+    subs_end_date = calculate_subscription_end_date(data["subscription_start_date"], data["subscription_period"])
     subs_end_date_str = subs_end_date.strftime("%Y-%m-%d %H:%M:%S")
 
-    values = (
-       data["user_email"],
-       data["user_email"],
-       data["subscription_name"],
-       data["subscription_period"],
-       data["subscription_start_date"],
-       subs_end_date_str
-    )
-
-    cursor.execute(query_file, values)
-    connection.commit()
+    values = {
+       "user_email": data["user_email"],
+       "subscription_name": data["subscription_name"],
+       "subscription_period": data["subscription_period"],
+       "subscription_start_date": data["subscription_start_date"],
+       "subscription_end_date": subs_end_date_str,
+       "subscription_price": parse_subscription_price(data.get("subscription_price"))
+    }
 
-    cursor.close()
-    connection.close()
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "insert_new_subscription", values)
+        connection.commit()
 
 
+@timed_db_operation
 def delete_subscription_data(data: dict):
     current_timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-    connection = postgresql_connect()
-    cursor = connection.cursor()
-    with open(f"{QUERY_DIR_PATH}/delete_subscription_data.sql", "r") as openfile:
-        query_file = openfile.read()
-        query_file = query_file.replace("@USER_EMAIL", str(data["email"]))
-        query_file = query_file.replace("@SUBSCRIPTION_NAME", str(data["deleted_subs_name"]))
-        query_file = query_file.replace("@DELETED_AT", str(current_timestamp))
-
-    cursor.execute(query_file)
-    connection.commit()
-
-    cursor.close()
-    connection.close()
+    values = {
+        "user_email": str(data["email"]),
+        "subscription_name": str(data["deleted_subs_name"]),
+        "deleted_at": str(current_timestamp)
+    }
+
+    with postgresql_connect() as connection:
+        with connection.cursor() as cursor:
+            execute_query(cursor, "delete_subscription_data", values)
+        connection.commit()
+
+
+@timed_db_operation
+def insert_new_subscriptions_data(list_data: list):
+    """
+    Insert many subscriptions with one multi-row statement and one commit
+    """
+    columns, results = prepare_bulk_subscriptions(list_data)
+    if columns["user_emails"]:
+        with postgresql_connect() as connection:
+            with connection.cursor() as cursor:
+                execute_query(cursor, "insert_new_subscriptions_bulk", columns)
+            connection.commit()
+
+    return results
+
+
+@timed_db_operation
+def delete_subscriptions_data(list_data: list):
+    """
+    Soft delete many subscriptions with one multi-row statement and one commit
+    """
+    columns, results = prepare_bulk_deletions(list_data)
+    deleted_rows = []
+    if columns["user_emails"]:
+        values = {
+            **columns,
+            "deleted_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        }
+        with postgresql_connect() as connection:
+            with connection.cursor() as cursor:
+                execute_query(cursor, "delete_subscriptions_bulk", values)
+                deleted_rows = cursor.fetchall()
+            connection.commit()
+
+    return resolve_bulk_deletions(columns, results, deleted_rows)
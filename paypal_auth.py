@@ -0,0 +1,68 @@
+import os
+import time
+from settings import settings
+from http_clients import get_http_client
+from single_flight import SingleFlight
+
+# Define global variables from environment
+PAYPAL_TOKEN_REFRESH_MARGIN=float(os.getenv("PAYPAL_TOKEN_REFRESH_MARGIN", "300"))
+
+
+class PayPalTokenCache:
+    """
+    Process-wide cache of the PayPal OAuth access token. The token is reused until
+    shortly before its expires_in runs out, and concurrent refreshes share a single
+    in-flight request to /v1/oauth2/token
+    """
+    def __init__(self, refresh_margin: float):
+        self.refresh_margin = refresh_margin
+        self._access_token = None
+        self._expires_at = 0.0
+        self._refresh = SingleFlight(self._request_and_store_token)
+
+    def _is_fresh(self):
+        return self._access_token is not None and time.monotonic() < self._expires_at - self.refresh_margin
+
+    async def _request_token(self):
+        response = await get_http_client("paypal").post(
+            url=f"{settings.paypal_base_url}/v1/oauth2/token",
+            data={"grant_type": "client_credentials"},
+            auth=(settings.paypal_client_id, settings.paypal_client_secret)
+        )
+
+        return response
+
+    async def _request_and_store_token(self):
+        requested_at = time.monotonic()
+        response = await self._request_token()
+        if response.status_code != 200:
+            return None
+
+        token_data = response.json()
+        self._access_token = token_data["access_token"]
+        self._expires_at = requested_at + float(token_data.get("expires_in", 0))
+
+        return self._access_token
+
+    async def get_token(self):
+        """
+        Return a valid access token, or None when PayPal refuses to issue one
+        """
+        if self._is_fresh():
+            return self._access_token
+
+        return await self._refresh()
+
+    def invalidate(self):
+        """
+        Drop the cached token, e.g. after PayPal answered 401
+        """
+        self._access_token = None
+        self._expires_at = 0.0
+
+
+paypal_token_cache = PayPalTokenCache(refresh_margin=PAYPAL_TOKEN_REFRESH_MARGIN)
+
+
+async def get_paypal_access_token():
+    return await paypal_token_cache.get_token()
@@ -0,0 +1,33 @@
+WITH batch AS (
+    SELECT id
+    FROM subscription_tracker_list
+    WHERE deleted_at < @DELETED_BEFORE
+    ORDER BY deleted_at
+    LIMIT @BATCH_SIZE
+    FOR UPDATE SKIP LOCKED
+), moved AS (
+    DELETE FROM subscription_tracker_list lst
+    USING batch
+    WHERE lst.id = batch.id
+    RETURNING lst.id, lst.user_id, lst.user_email, lst.subscription_name, lst.subscription_period,
+        lst.subscription_start_date, lst.subscription_end_date, lst.subscription_price, lst.deleted_at
+)
+INSERT INTO subscription_tracker_list_archive(
+    id, user_id, user_email, subscription_name, subscription_period,
+    subscription_start_date, subscription_end_date, subscription_price, deleted_at, archived_at
+)
+SELECT
+    id, user_id, user_email, subscription_name, subscription_period,
+    subscription_start_date, subscription_end_date, subscription_price, deleted_at, @ARCHIVED_AT
+FROM moved
+-- Every deleted row has to land in the archive, an id archived before gets the newer copy
+ON CONFLICT (id) DO UPDATE
+SET user_id = excluded.user_id,
+    user_email = excluded.user_email,
+    subscription_name = excluded.subscription_name,
+    subscription_period = excluded.subscription_period,
+    subscription_start_date = excluded.subscription_start_date,
+    subscription_end_date = excluded.subscription_end_date,
+    subscription_price = excluded.subscription_price,
+    deleted_at = excluded.deleted_at,
+    archived_at = excluded.archived_at
@@ -0,0 +1,8 @@
+INSERT INTO subscription_list_version AS current(user_email, version)
+SELECT changed.user_email, nextval('subscription_list_version_seq')
+FROM (
+    SELECT DISTINCT user_email
+    FROM unnest(@USER_EMAILS::text[]) AS changed_users(user_email)
+    ORDER BY user_email
+) changed
+ON CONFLICT (user_email) DO UPDATE SET version = excluded.version
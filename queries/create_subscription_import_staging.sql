@@ -0,0 +1,8 @@
+CREATE TEMP TABLE IF NOT EXISTS subscription_import_staging(
+    user_email TEXT NOT NULL,
+    subscription_name TEXT NOT NULL,
+    subscription_period TEXT NOT NULL,
+    subscription_start_date TIMESTAMP NOT NULL,
+    subscription_end_date TIMESTAMP NOT NULL,
+    subscription_price NUMERIC(12, 2)
+) ON COMMIT DROP
@@ -1,5 +1,18 @@
-UPDATE subscription_tracker_list
-SET deleted_at = '@DELETED_AT'
-WHERE user_email = '@USER_EMAIL'
-    AND subscription_name = '@SUBSCRIPTION_NAME'
-    AND deleted_at IS NULL
\ No newline at end of file
+WITH deleted AS (
+    UPDATE subscription_tracker_list
+    SET deleted_at = @DELETED_AT
+    WHERE user_email = @USER_EMAIL
+        AND subscription_name = @SUBSCRIPTION_NAME
+        AND deleted_at IS NULL
+    RETURNING user_email, subscription_period, subscription_start_date, subscription_price
+)
+INSERT INTO subscription_monthly_summary AS summary(user_email, month, subscription_count, total_amount)
+SELECT deleted.user_email, amounts.month, -count(*), -sum(amounts.amount)
+FROM deleted
+CROSS JOIN LATERAL subscription_monthly_amounts(
+    deleted.subscription_start_date, deleted.subscription_period, deleted.subscription_price
+) AS amounts
+GROUP BY deleted.user_email, amounts.month
+ON CONFLICT (user_email, month) DO UPDATE
+SET subscription_count = summary.subscription_count + excluded.subscription_count,
+    total_amount = summary.total_amount + excluded.total_amount
@@ -0,0 +1,25 @@
+WITH deleted AS (
+    UPDATE subscription_tracker_list lst
+    SET deleted_at = @DELETED_AT
+    FROM unnest(
+        @USER_EMAILS::text[],
+        @SUBSCRIPTION_NAMES::text[]
+    ) AS deleted_rows(user_email, subscription_name)
+    WHERE lst.user_email = deleted_rows.user_email
+        AND lst.subscription_name = deleted_rows.subscription_name
+        AND lst.deleted_at IS NULL
+    RETURNING lst.user_email, lst.subscription_name, lst.subscription_period,
+        lst.subscription_start_date, lst.subscription_price
+), summary_update AS (
+    INSERT INTO subscription_monthly_summary AS summary(user_email, month, subscription_count, total_amount)
+    SELECT deleted.user_email, amounts.month, -count(*), -sum(amounts.amount)
+    FROM deleted
+    CROSS JOIN LATERAL subscription_monthly_amounts(
+        deleted.subscription_start_date, deleted.subscription_period, deleted.subscription_price
+    ) AS amounts
+    GROUP BY deleted.user_email, amounts.month
+    ON CONFLICT (user_email, month) DO UPDATE
+    SET subscription_count = summary.subscription_count + excluded.subscription_count,
+        total_amount = summary.total_amount + excluded.total_amount
+)
+SELECT user_email, subscription_name FROM deleted
@@ -0,0 +1,10 @@
+SELECT
+    subscription_name,
+    subscription_period,
+    subscription_start_date::date AS subscription_start_date,
+    subscription_end_date::date AS subscription_end_date,
+    subscription_price
+FROM subscription_tracker_list
+WHERE user_email = @USER_EMAIL
+    AND deleted_at IS NULL
+ORDER BY subscription_end_date, id
@@ -0,0 +1,7 @@
+SELECT
+    payment_id
+FROM subscription_tracker_payment
+WHERE user_email = @EMAIL
+    AND payment_status = 'In Progress'
+ORDER BY created_at DESC
+LIMIT 1
@@ -5,5 +5,5 @@ SELECT
     subscription_start_date,
     subscription_end_date
 FROM subscription_tracker_list
-WHERE user_email = '@USER_EMAIL'
-    AND deleted_at IS NULL
\ No newline at end of file
+WHERE user_email = @USER_EMAIL
+    AND deleted_at IS NULL
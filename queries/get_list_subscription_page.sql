@@ -0,0 +1,13 @@
+SELECT
+    user_email,
+    subscription_name,
+    subscription_period,
+    subscription_start_date,
+    subscription_end_date,
+    id
+FROM subscription_tracker_list
+WHERE user_email = @USER_EMAIL
+    AND deleted_at IS NULL
+    AND (subscription_end_date, id) > (@CURSOR_END_DATE, @CURSOR_ID)
+ORDER BY subscription_end_date, id
+LIMIT @LIMIT
@@ -0,0 +1,8 @@
+SELECT
+    month,
+    subscription_count,
+    total_amount
+FROM subscription_monthly_summary
+WHERE user_email = @USER_EMAIL
+    AND subscription_count > 0
+ORDER BY month
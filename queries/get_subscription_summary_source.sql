@@ -0,0 +1,8 @@
+SELECT
+    user_email,
+    subscription_period,
+    subscription_start_date,
+    subscription_price
+FROM subscription_tracker_list
+WHERE deleted_at IS NULL
+    AND (@USER_EMAIL::text IS NULL OR user_email = @USER_EMAIL)
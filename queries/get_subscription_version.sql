@@ -0,0 +1,3 @@
+SELECT COALESCE(max(version), 0) AS version
+FROM subscription_list_version
+WHERE user_email = @USER_EMAIL
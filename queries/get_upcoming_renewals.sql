@@ -0,0 +1,11 @@
+SELECT
+    subscription_name,
+    subscription_period,
+    subscription_end_date
+FROM subscription_tracker_list
+WHERE user_email = @USER_EMAIL
+    AND deleted_at IS NULL
+    AND subscription_end_date >= @FROM_END_DATE
+    AND subscription_end_date < @HORIZON_END_DATE
+ORDER BY subscription_end_date, id
+LIMIT @LIMIT
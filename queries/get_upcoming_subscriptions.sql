@@ -0,0 +1,12 @@
+SELECT
+    user_email,
+    subscription_name,
+    subscription_period,
+    subscription_end_date,
+    id
+FROM subscription_tracker_list
+WHERE deleted_at IS NULL
+    AND (subscription_end_date, id) > (@CURSOR_END_DATE, @CURSOR_ID)
+    AND subscription_end_date < @HORIZON_END_DATE
+ORDER BY subscription_end_date, id
+LIMIT @LIMIT
@@ -1,4 +1,4 @@
 SELECT
     email
 FROM subscription_tracker_user
-WHERE email = '@EMAIL'
\ No newline at end of file
+WHERE email = @EMAIL
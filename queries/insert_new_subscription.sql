@@ -1,16 +1,31 @@
-INSERT INTO subscription_tracker_list(
-    user_id,
-    user_email,
-    subscription_name,
-    subscription_period,
-    subscription_start_date,
-    subscription_end_date
+WITH inserted AS (
+    INSERT INTO subscription_tracker_list(
+        user_id,
+        user_email,
+        subscription_name,
+        subscription_period,
+        subscription_start_date,
+        subscription_end_date,
+        subscription_price
+    )
+    VALUES(
+        (SELECT id FROM subscription_tracker_user usr WHERE usr.email = @USER_EMAIL),
+        @USER_EMAIL,
+        @SUBSCRIPTION_NAME,
+        @SUBSCRIPTION_PERIOD,
+        @SUBSCRIPTION_START_DATE,
+        @SUBSCRIPTION_END_DATE,
+        @SUBSCRIPTION_PRICE
+    )
+    RETURNING user_email, subscription_period, subscription_start_date, subscription_price
 )
-VALUES(
-    (SELECT id FROM subscription_tracker_user usr WHERE usr.email = %s),
-    %s,
-    %s,
-    %s,
-    %s,
-    %s
-)
\ No newline at end of file
+INSERT INTO subscription_monthly_summary AS summary(user_email, month, subscription_count, total_amount)
+SELECT inserted.user_email, amounts.month, count(*), sum(amounts.amount)
+FROM inserted
+CROSS JOIN LATERAL subscription_monthly_amounts(
+    inserted.subscription_start_date, inserted.subscription_period, inserted.subscription_price
+) AS amounts
+GROUP BY inserted.user_email, amounts.month
+ON CONFLICT (user_email, month) DO UPDATE
+SET subscription_count = summary.subscription_count + excluded.subscription_count,
+    total_amount = summary.total_amount + excluded.total_amount
@@ -0,0 +1,41 @@
+WITH inserted AS (
+    INSERT INTO subscription_tracker_list(
+        user_id,
+        user_email,
+        subscription_name,
+        subscription_period,
+        subscription_start_date,
+        subscription_end_date,
+        subscription_price
+    )
+    SELECT
+        (SELECT id FROM subscription_tracker_user usr WHERE usr.email = new_rows.user_email),
+        new_rows.user_email,
+        new_rows.subscription_name,
+        new_rows.subscription_period,
+        new_rows.subscription_start_date,
+        new_rows.subscription_end_date,
+        new_rows.subscription_price
+    FROM unnest(
+        @USER_EMAILS::text[],
+        @SUBSCRIPTION_NAMES::text[],
+        @SUBSCRIPTION_PERIODS::text[],
+        @SUBSCRIPTION_START_DATES::timestamp[],
+        @SUBSCRIPTION_END_DATES::timestamp[],
+        @SUBSCRIPTION_PRICES::numeric[]
+    ) AS new_rows(
+        user_email, subscription_name, subscription_period,
+        subscription_start_date, subscription_end_date, subscription_price
+    )
+    RETURNING user_email, subscription_period, subscription_start_date, subscription_price
+)
+INSERT INTO subscription_monthly_summary AS summary(user_email, month, subscription_count, total_amount)
+SELECT inserted.user_email, amounts.month, count(*), sum(amounts.amount)
+FROM inserted
+CROSS JOIN LATERAL subscription_monthly_amounts(
+    inserted.subscription_start_date, inserted.subscription_period, inserted.subscription_price
+) AS amounts
+GROUP BY inserted.user_email, amounts.month
+ON CONFLICT (user_email, month) DO UPDATE
+SET subscription_count = summary.subscription_count + excluded.subscription_count,
+    total_amount = summary.total_amount + excluded.total_amount
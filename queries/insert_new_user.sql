@@ -0,0 +1,14 @@
+INSERT INTO subscription_tracker_user(
+    name,
+    email,
+    address,
+    phone_number,
+    created_at
+)
+VALUES(
+    @NAME,
+    @EMAIL,
+    @ADDRESS,
+    @PHONE_NUMBER,
+    @CREATED_AT
+)
@@ -0,0 +1,22 @@
+INSERT INTO subscription_tracker_payment(
+    user_id,
+    user_email,
+    amount,
+    total_balance,
+    balance_duration_days,
+    plan,
+    payment_status,
+    payment_id,
+    created_at
+)
+VALUES(
+    @USER_ID,
+    @USER_EMAIL,
+    @AMOUNT,
+    @TOTAL_BALANCE,
+    @BALANCE_DURATION_DAYS,
+    @PLAN,
+    @PAYMENT_STATUS,
+    @PAYMENT_ID,
+    @CREATED_AT
+)
@@ -0,0 +1,34 @@
+WITH inserted AS (
+    INSERT INTO subscription_tracker_list(
+        user_id,
+        user_email,
+        subscription_name,
+        subscription_period,
+        subscription_start_date,
+        subscription_end_date,
+        subscription_price
+    )
+    SELECT
+        (SELECT id FROM subscription_tracker_user usr WHERE usr.email = staged.user_email),
+        staged.user_email,
+        staged.subscription_name,
+        staged.subscription_period,
+        staged.subscription_start_date,
+        staged.subscription_end_date,
+        staged.subscription_price
+    FROM subscription_import_staging staged
+    RETURNING user_email, subscription_name, subscription_period,
+        subscription_start_date, subscription_end_date, subscription_price
+), summary_update AS (
+    INSERT INTO subscription_monthly_summary AS summary(user_email, month, subscription_count, total_amount)
+    SELECT inserted.user_email, amounts.month, count(*), sum(amounts.amount)
+    FROM inserted
+    CROSS JOIN LATERAL subscription_monthly_amounts(
+        inserted.subscription_start_date, inserted.subscription_period, inserted.subscription_price
+    ) AS amounts
+    GROUP BY inserted.user_email, amounts.month
+    ON CONFLICT (user_email, month) DO UPDATE
+    SET subscription_count = summary.subscription_count + excluded.subscription_count,
+        total_amount = summary.total_amount + excluded.total_amount
+)
+SELECT count(*) FROM inserted
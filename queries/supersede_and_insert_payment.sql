@@ -0,0 +1,35 @@
+WITH superseded AS (
+    UPDATE subscription_tracker_payment
+    SET payment_status = 'Failed',
+        updated_at = @CREATED_AT
+    WHERE user_email = @USER_EMAIL
+        AND payment_status = 'In Progress'
+    RETURNING payment_id
+), inserted AS (
+    INSERT INTO subscription_tracker_payment(
+        user_id,
+        user_email,
+        amount,
+        total_balance,
+        balance_duration_days,
+        plan,
+        payment_status,
+        payment_id,
+        created_at
+    )
+    VALUES(
+        @USER_ID,
+        @USER_EMAIL,
+        @AMOUNT,
+        @TOTAL_BALANCE,
+        @BALANCE_DURATION_DAYS,
+        @PLAN,
+        'In Progress',
+        @PAYMENT_ID,
+        @CREATED_AT
+    )
+    RETURNING payment_id
+)
+SELECT
+    (SELECT payment_id FROM inserted) AS payment_id,
+    ARRAY(SELECT payment_id FROM superseded) AS superseded_payment_ids
@@ -0,0 +1,15 @@
+WITH updated AS (
+    UPDATE subscription_tracker_payment
+    SET payment_status = @PAYMENT_STATUS,
+        updated_at = @UPDATED_AT
+    WHERE payment_id = @PAYMENT_ID
+        AND payment_status = 'In Progress'
+    RETURNING payment_status
+)
+SELECT payment_status FROM updated
+UNION ALL
+SELECT payment_status
+FROM subscription_tracker_payment
+WHERE payment_id = @PAYMENT_ID
+    AND NOT EXISTS (SELECT 1 FROM updated)
+LIMIT 1
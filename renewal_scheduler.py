@@ -0,0 +1,346 @@
+import os
+import json
+import heapq
+import asyncio
+import traceback
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from async_database import fetch, connect
+from http_clients import get_http_client
+
+# Define global variables from environment
+RENEWAL_SCHEDULER_ENABLED=True if str(os.getenv("RENEWAL_SCHEDULER_ENABLED", "True")) == "True" else False
+RENEWAL_SCHEDULER_HORIZON_DAYS=int(os.getenv("RENEWAL_SCHEDULER_HORIZON_DAYS", "30"))
+RENEWAL_SCHEDULER_RELOAD_SECONDS=float(os.getenv("RENEWAL_SCHEDULER_RELOAD_SECONDS", "3600"))
+RENEWAL_SCHEDULER_LOAD_BATCH_SIZE=int(os.getenv("RENEWAL_SCHEDULER_LOAD_BATCH_SIZE", "1000"))
+RENEWAL_SCHEDULER_LOCK_KEY=int(os.getenv("RENEWAL_SCHEDULER_LOCK_KEY", "7310411"))
+RENEWAL_SCHEDULER_LEADER_RETRY_SECONDS=float(os.getenv("RENEWAL_SCHEDULER_LEADER_RETRY_SECONDS", "30"))
+RENEWAL_WEBHOOK_URL=os.getenv("RENEWAL_WEBHOOK_URL")
+RENEWAL_NOTIFY_CHANNEL="subscription_renewals"
+
+
+def utc_now():
+    # Subscription dates are stored as naive UTC timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class RenewalHeap:
+    """
+    Min-heap of subscription end dates keyed by (user_email, subscription_name).
+    Push is O(log n); remove and reschedule only drop the key from the live index
+    and the stale heap item is skipped when it reaches the top
+    """
+    def __init__(self):
+        self._heap = []
+        self._live = {}
+        self._sequence = 0
+
+    def __len__(self):
+        return len(self._live)
+
+    def push(self, user_email: str, subscription_name: str, subscription_period: str, due_at: datetime):
+        key = (user_email, subscription_name)
+        self._sequence += 1
+        self._live[key] = (due_at, self._sequence, subscription_period)
+        heapq.heappush(self._heap, (due_at, self._sequence, key))
+        self._compact_if_needed()
+
+    def remove(self, user_email: str, subscription_name: str):
+        if self._live.pop((user_email, subscription_name), None) is None:
+            return False
+        self._compact_if_needed()
+
+        return True
+
+    def _is_live(self, heap_item: tuple):
+        live_entry = self._live.get(heap_item[2])
+        return live_entry is not None and live_entry[1] == heap_item[1]
+
+    def _drop_stale_top(self):
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def _compact_if_needed(self):
+        # Rebuild once stale items outnumber live ones so memory stays O(live)
+        if len(self._heap) > 1024 and len(self._heap) > 2 * len(self._live):
+            self._heap = [heap_item for heap_item in self._heap if self._is_live(heap_item)]
+            heapq.heapify(self._heap)
+
+    def next_due_at(self):
+        self._drop_stale_top()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime):
+        """
+        Remove and return every entry due at or before now, earliest first
+        """
+        due_entries = []
+        while True:
+            self._drop_stale_top()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            due_at, _, key = heapq.heappop(self._heap)
+            subscription_period = self._live[key][2]
+            self.remove(*key)
+            due_entries.append({
+                "user_email": key[0],
+                "subscription_name": key[1],
+                "subscription_period": subscription_period,
+                "subscription_end_date": due_at
+            })
+
+        return due_entries
+
+
+class LocalEventSink:
+    """
+    Keep the most recent renewal events in memory and log them
+    """
+    def __init__(self, max_events: int = 1000):
+        self.events = deque(maxlen=max_events)
+
+    async def emit(self, event: dict):
+        self.events.append(event)
+        print(f"Renewal event: {event['event']} {event['user_email']} {event['subscription_name']}")
+
+
+class WebhookEventSink:
+    """
+    POST every renewal event as JSON to a webhook
+    """
+    def __init__(self, url: str):
+        self.url = url
+
+    async def emit(self, event: dict):
+        payload = {**event, "subscription_end_date": event["subscription_end_date"].isoformat()}
+        response = await get_http_client("webhook").post(self.url, json=payload)
+        response.raise_for_status()
+
+
+class RenewalScheduler:
+    """
+    Background task that loads upcoming end dates from the database in keyset
+    windows of horizon_days, keeps them in a RenewalHeap and fires an event to
+    the sink when each one comes due.
+
+    Every API worker starts one, but only the worker holding the
+    RENEWAL_SCHEDULER_LOCK_KEY advisory lock leads: it loads the windows and fires
+    the events, the others retry for the lock every leader_retry_seconds. The
+    leader follows subscription changes from every worker through the
+    subscription_renewals notifications of migration 0005
+    """
+    def __init__(self,
+                 sink,
+                 horizon_days: int,
+                 reload_seconds: float,
+                 load_batch_size: int,
+                 lock_key: int = RENEWAL_SCHEDULER_LOCK_KEY,
+                 leader_retry_seconds: float = RENEWAL_SCHEDULER_LEADER_RETRY_SECONDS):
+        self.sink = sink
+        self.horizon = timedelta(days=horizon_days)
+        self.reload_seconds = reload_seconds
+        self.load_batch_size = load_batch_size
+        self.lock_key = lock_key
+        self.leader_retry_seconds = leader_retry_seconds
+        self.heap = RenewalHeap()
+
+        self.events_fired = 0
+        self.event_failures = 0
+        self.rows_loaded = 0
+        self.notifications = 0
+        self._loaded_until = None
+        self._load_cursor = None
+        self._loading = False
+        self._pending_notifications = []
+        self._leader_connection = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def is_leader(self):
+        return self._leader_connection is not None and not self._leader_connection.is_closed()
+
+    def _is_loaded(self, due_at: datetime):
+        return self._loaded_until is not None and due_at < self._loaded_until
+
+    def schedule(self, user_email: str, subscription_name: str, subscription_period: str, due_at: datetime):
+        """
+        Track a new or renewed subscription. Past end dates are dropped and end dates
+        beyond the loaded window are left to the window loader
+        """
+        if not self._is_loaded(due_at) or due_at < utc_now():
+            self.heap.remove(user_email, subscription_name)
+            return
+
+        current_next_due_at = self.heap.next_due_at()
+        self.heap.push(user_email, subscription_name, subscription_period, due_at)
+        if current_next_due_at is None or due_at < current_next_due_at:
+            self._wakeup.set()
+
+    def unschedule(self, user_email: str, subscription_name: str):
+        self.heap.remove(user_email, subscription_name)
+
+    def _apply_notification(self, change: dict):
+        if change["deleted"]:
+            self.unschedule(change["user_email"], change["subscription_name"])
+        else:
+            self.schedule(
+                change["user_email"],
+                change["subscription_name"],
+                change["subscription_period"],
+                datetime.fromisoformat(change["subscription_end_date"])
+            )
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.notifications += 1
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            traceback.print_exc()
+            return
+        # Changes committed while a window loads are applied once it is loaded, so a
+        # row missing from the window's snapshot is not lost and a deleted one not revived
+        if self._loading:
+            self._pending_notifications.append(change)
+        else:
+            self._apply_notification(change)
+
+    async def _load_window(self, horizon_end_date: datetime):
+        if self._load_cursor is None:
+            self._load_cursor = {"cursor_end_date": utc_now(), "cursor_id": 0}
+
+        self._loading = True
+        try:
+            while True:
+                rows = await fetch("get_upcoming_subscriptions", {
+                    **self._load_cursor,
+                    "horizon_end_date": horizon_end_date,
+                    "limit": self.load_batch_size
+                })
+                for user_email, subscription_name, subscription_period, subscription_end_date, _ in rows:
+                    self.heap.push(user_email, subscription_name, subscription_period, subscription_end_date)
+                self.rows_loaded += len(rows)
+
+                if rows:
+                    self._load_cursor = {"cursor_end_date": rows[-1][3], "cursor_id": rows[-1][4]}
+                if len(rows) < self.load_batch_size:
+                    break
+
+            self._loaded_until = horizon_end_date
+        finally:
+            self._loading = False
+            pending_notifications, self._pending_notifications = self._pending_notifications, []
+            for change in pending_notifications:
+                self._apply_notification(change)
+
+    async def _fire(self, due_entries: list):
+        for due_entry in due_entries:
+            try:
+                await self.sink.emit({"event": "renewal_due", **due_entry})
+                self.events_fired += 1
+            except Exception:
+                self.event_failures += 1
+                traceback.print_exc()
+
+    async def _acquire_leadership(self):
+        """
+        Take the advisory lock on a dedicated connection and LISTEN on it, the lock
+        and the subscription goes away with the connection. Returns False when
+        another worker leads
+        """
+        connection = await connect()
+        try:
+            if not await connection.fetchval("SELECT pg_try_advisory_lock($1)", self.lock_key):
+                await connection.close()
+                return False
+            await connection.add_listener(RENEWAL_NOTIFY_CHANNEL, self._on_notification)
+            connection.add_termination_listener(lambda _: self._wakeup.set())
+        except BaseException:
+            await connection.close()
+            raise
+
+        self._leader_connection = connection
+        return True
+
+    async def _release_leadership(self):
+        connection, self._leader_connection = self._leader_connection, None
+        self.heap = RenewalHeap()
+        self._loaded_until = None
+        self._load_cursor = None
+        self._pending_notifications = []
+        if connection is not None and not connection.is_closed():
+            await connection.close()
+
+    async def _lead(self):
+        while True:
+            # Fails once the leader connection is gone, another worker may hold the lock by then
+            await self._leader_connection.execute("SELECT 1")
+
+            now = utc_now()
+            if self._loaded_until is None or self._loaded_until - now < self.horizon / 2:
+                await self._load_window(now + self.horizon)
+
+            await self._fire(self.heap.pop_due(now))
+
+            timeout = min(self.reload_seconds, self.leader_retry_seconds)
+            next_due_at = self.heap.next_due_at()
+            if next_due_at is not None:
+                timeout = min(timeout, max((next_due_at - utc_now()).total_seconds(), 0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _run(self):
+        try:
+            while True:
+                try:
+                    if await self._acquire_leadership():
+                        await self._lead()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    traceback.print_exc()
+                await self._release_leadership()
+                await asyncio.sleep(self.leader_retry_seconds)
+        finally:
+            await self._release_leadership()
+
+    def stats(self):
+        return {
+            "leader": self.is_leader(),
+            "scheduled": len(self.heap),
+            "loaded_until": self._loaded_until.isoformat() if self._loaded_until else None,
+            "rows_loaded": self.rows_loaded,
+            "notifications": self.notifications,
+            "events_fired": self.events_fired,
+            "event_failures": self.event_failures
+        }
+
+
+def create_event_sink():
+    if RENEWAL_WEBHOOK_URL:
+        return WebhookEventSink(RENEWAL_WEBHOOK_URL)
+
+    return LocalEventSink()
+
+
+renewal_scheduler = RenewalScheduler(
+    sink=create_event_sink(),
+    horizon_days=RENEWAL_SCHEDULER_HORIZON_DAYS,
+    reload_seconds=RENEWAL_SCHEDULER_RELOAD_SECONDS,
+    load_batch_size=RENEWAL_SCHEDULER_LOAD_BATCH_SIZE
+)
@@ -0,0 +1,212 @@
+import os
+import json
+import zlib
+import importlib
+import importlib.util
+import functools
+import contextvars
+from decimal import Decimal
+from datetime import date, datetime
+from starlette.datastructures import Headers, MutableHeaders
+from fastapi.responses import JSONResponse
+from database import format_date
+
+# Define global variables from environment
+RESPONSE_COMPRESSION_MINIMUM_SIZE=int(os.getenv("RESPONSE_COMPRESSION_MINIMUM_SIZE", "1024"))
+RESPONSE_GZIP_LEVEL=int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY=int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+MSGPACK_MEDIA_TYPE="application/msgpack"
+
+
+def optional_module(name: str):
+    """
+    Import an optional dependency, None when it is not installed
+    """
+    if importlib.util.find_spec(name) is None:
+        return None
+
+    return importlib.import_module(name)
+
+
+orjson = optional_module("orjson")
+msgpack = optional_module("msgpack")
+brotli = optional_module("brotli")
+
+
+# Subscription lists repeat the same few dates, strftime is the costly part of encoding them
+cached_format_date = functools.lru_cache(maxsize=4096)(format_date)
+
+
+def default(value):
+    """
+    Encode the values the serializers do not know natively, dates are formatted
+    here the way the frontend displays them
+    """
+    if isinstance(value, (datetime, date)):
+        return cached_format_date(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps_json(content):
+    if orjson is not None:
+        return orjson.dumps(content, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+    return json.dumps(content, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(content):
+    return msgpack.packb(content, default=default, datetime=False)
+
+
+_accept = contextvars.ContextVar("accept", default="")
+
+
+def wants_msgpack(accept: str):
+    return msgpack is not None and MSGPACK_MEDIA_TYPE in accept
+
+
+def negotiated_media_type(accept: str):
+    """
+    Media type APIResponse encodes with for this Accept header
+    """
+    return MSGPACK_MEDIA_TYPE if wants_msgpack(accept) else "application/json"
+
+
+class APIResponse(JSONResponse):
+    """
+    Default response class. Encodes with orjson (stdlib json when it is not
+    installed), or with MessagePack when the request's Accept header asks for it
+    """
+    def render(self, content):
+        if wants_msgpack(_accept.get()):
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return dumps_msgpack(content)
+
+        return dumps_json(content)
+
+
+class ContentNegotiationMiddleware:
+    """
+    ASGI middleware that hands the Accept header of the request to APIResponse
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _accept.set(Headers(scope=scope).get("accept", ""))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _accept.reset(token)
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = {item.split(";")[0].strip().lower() for item in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+
+    return None
+
+
+class GzipCompressor:
+    def __init__(self):
+        self._compressor = zlib.compressobj(RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=RESPONSE_BROTLI_QUALITY)
+
+    def compress(self, data: bytes):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+COMPRESSORS = {"gzip": GzipCompressor, "br": BrotliCompressor}
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies of at least minimum_size bytes
+    with brotli or gzip, whichever the client accepts (brotli only when it is
+    installed). Streamed bodies are compressed chunk by chunk and flushed so
+    each chunk still reaches the client right away. A strong ETag becomes weak
+    for clients that accept a coding, the bytes then differ per coding while
+    200 and 304 responses of one client still carry the same tag
+    """
+    def __init__(self, app, minimum_size: int = RESPONSE_COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if etag is not None and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                skip = "content-encoding" in headers or (not more_body and len(body) < self.minimum_size)
+                if skip:
+                    await send(start_message)
+                    await send(message)
+                    start_message = None
+                    return
+
+                compressor = COMPRESSORS[encoding]()
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start_message)
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+            body = compressor.compress(body)
+            if not more_body:
+                body += compressor.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
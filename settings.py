@@ -0,0 +1,47 @@
+import os
+from typing import Optional
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Application configuration, read from the environment once when the worker
+    starts instead of on every request
+    """
+    backend_api_secret_key: Optional[str]
+    website_url: Optional[str]
+    admin_endpoint_base_url: Optional[str]
+    cookie_secure_state: bool
+    cookie_samesite: str
+    google_oauth_client_id: Optional[str]
+    google_oauth_client_secret: Optional[str]
+    paypal_base_url: Optional[str]
+    paypal_client_id: Optional[str]
+    paypal_client_secret: Optional[str]
+    jwt_secret_key: Optional[str]
+    jwt_algorithm: Optional[str]
+
+    @property
+    def google_redirect_uri(self):
+        return f"{self.admin_endpoint_base_url}/auth/google/callback"
+
+    @classmethod
+    def from_environment(cls):
+        return cls(
+            backend_api_secret_key=os.getenv("BACKEND_API_SECRET_KEY"),
+            website_url=os.getenv("WEBSITE_URL"),
+            admin_endpoint_base_url=os.getenv("ADMIN_ENDPOINT_BASE_URL"),
+            cookie_secure_state=str(os.getenv("COOKIE_SECURE_STATE")) == "True",
+            cookie_samesite=str(os.getenv("COOKIE_SAMESITE")),
+            google_oauth_client_id=os.getenv("GOOGLE_OAUTH_CLIENT_ID"),
+            google_oauth_client_secret=os.getenv("GOOGLE_OAUTH_CLIENT_SECRET"),
+            paypal_base_url=os.getenv("PAYPAL_BASE_URL"),
+            paypal_client_id=os.getenv("PAYPAL_CLIENT_ID"),
+            paypal_client_secret=os.getenv("PAYPAL_CLIENT_SECRET"),
+            jwt_secret_key=os.getenv("JWT_SECRET_KEY"),
+            jwt_algorithm=os.getenv("JWT_ALGORITHM")
+        )
+
+
+settings = Settings.from_environment()
@@ -0,0 +1,25 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Run at most one call of a coroutine function at a time, callers arriving
+    while it is in flight await that same call and share its result or error.
+    Each caller awaits it through asyncio.shield, so a cancelled caller stops
+    waiting without cancelling the call for the others
+    """
+    def __init__(self, function):
+        self.function = function
+        self._task = None
+
+    async def _run(self):
+        try:
+            return await self.function()
+        finally:
+            self._task = None
+
+    async def __call__(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+        return await asyncio.shield(self._task)
@@ -0,0 +1,196 @@
+import os
+import time
+import pickle
+from collections import OrderedDict
+
+# Define global variables from environment
+SUBSCRIPTION_CACHE_BACKEND=os.getenv("SUBSCRIPTION_CACHE_BACKEND", "memory")
+SUBSCRIPTION_CACHE_TTL=float(os.getenv("SUBSCRIPTION_CACHE_TTL", "60"))
+SUBSCRIPTION_CACHE_SIZE=int(os.getenv("SUBSCRIPTION_CACHE_SIZE", "10000"))
+SUBSCRIPTION_CACHE_REDIS_URL=os.getenv("SUBSCRIPTION_CACHE_REDIS_URL", "redis://localhost:6379/0")
+SUBSCRIPTION_RECENT_WRITE_CACHE_SIZE=int(os.getenv("SUBSCRIPTION_RECENT_WRITE_CACHE_SIZE", "100000"))
+
+
+class InMemoryCacheBackend:
+    """
+    Per-process LRU cache with a TTL on every entry
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, stored_at, value = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+
+        return stored_at, value
+
+    async def set(self, key: str, value, ttl: float):
+        stored_at = time.time()
+        self._entries[key] = (stored_at + ttl, stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def close(self):
+        self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """
+    Cache shared by every worker through Redis, eviction is left to the Redis
+    maxmemory policy and every key carries the TTL
+    """
+    def __init__(self, url: str):
+        import redis.asyncio
+
+        self._client = redis.asyncio.from_url(url)
+
+    async def get(self, key: str):
+        payload = await self._client.get(key)
+        if payload is None:
+            return None
+
+        return pickle.loads(payload)
+
+    async def set(self, key: str, value, ttl: float):
+        await self._client.set(key, pickle.dumps((time.time(), value)), px=int(ttl * 1000))
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+    async def close(self):
+        await self._client.aclose()
+
+    def size(self):
+        return None
+
+
+class SubscriptionCache:
+    """
+    Read-through cache of subscription lists keyed by user email. Every entry
+    carries the database version of the list it was loaded at and only serves
+    lookups made at that same version, so a write from any worker or script,
+    which bumps the version in the database, stops the old entry being served.
+    Recent-write markers live in their own backend so evicting lists never
+    evicts them
+    """
+    def __init__(self, backend, ttl: float, marker_backend=None):
+        self.backend = backend
+        self.marker_backend = marker_backend or backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.total_staleness = 0.0
+        self.max_staleness = 0.0
+
+    @staticmethod
+    def _key(user_email: str):
+        return f"subscriptions:{user_email}"
+
+    @staticmethod
+    def _recent_write_key(user_email: str):
+        return f"recent-write:{user_email}"
+
+    async def mark_recent_write(self, user_email: str, seconds: float):
+        """
+        Remember for seconds that the user wrote, in the backend every worker shares
+        when it is Redis
+        """
+        await self.marker_backend.set(self._recent_write_key(user_email), True, seconds)
+
+    async def wrote_recently(self, user_email: str):
+        return await self.marker_backend.get(self._recent_write_key(user_email)) is not None
+
+    async def get_or_load(self, user_email: str, version: int, loader):
+        """
+        The user's list at version, the current database version read before
+        calling. A cached list loaded at another version is reloaded
+        """
+        key = self._key(user_email)
+        entry = await self.backend.get(key)
+        if entry is not None:
+            stored_at, (stored_version, value) = entry
+            if stored_version == version:
+                staleness = max(time.time() - stored_at, 0.0)
+                self.hits += 1
+                self.total_staleness += staleness
+                self.max_staleness = max(self.max_staleness, staleness)
+                return value
+
+        self.misses += 1
+        value = await loader(user_email)
+        await self.backend.set(key, (version, value), self.ttl)
+
+        return value
+
+    async def invalidate(self, user_email: str):
+        """
+        Drop the user's list from this cache right away instead of leaving it
+        to the version check
+        """
+        self.invalidations += 1
+        await self.backend.delete(self._key(user_email))
+
+    async def close(self):
+        await self.backend.close()
+        if self.marker_backend is not self.backend:
+            await self.marker_backend.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "size": self.backend.size(),
+            "recent_writes": self.marker_backend.size() if self.marker_backend is not self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "average_staleness_seconds": round(self.total_staleness / self.hits, 3) if self.hits else 0.0,
+            "max_staleness_seconds": round(self.max_staleness, 3)
+        }
+
+
+def create_cache_backend(backend_name: str = SUBSCRIPTION_CACHE_BACKEND, max_size: int = SUBSCRIPTION_CACHE_SIZE):
+    if backend_name == "redis":
+        return RedisCacheBackend(SUBSCRIPTION_CACHE_REDIS_URL)
+    if backend_name == "memory":
+        return InMemoryCacheBackend(max_size)
+    raise ValueError(f"Unknown subscription cache backend: {backend_name}")
+
+
+def create_subscription_cache(backend_name: str = SUBSCRIPTION_CACHE_BACKEND):
+    """
+    In memory the recent-write markers get their own LRU, Redis keeps both in one
+    keyspace where every key expires on its own TTL
+    """
+    backend = create_cache_backend(backend_name)
+    marker_backend = backend
+    if backend_name == "memory":
+        marker_backend = create_cache_backend(backend_name, SUBSCRIPTION_RECENT_WRITE_CACHE_SIZE)
+
+    return SubscriptionCache(
+        backend=backend,
+        ttl=SUBSCRIPTION_CACHE_TTL,
+        marker_backend=marker_backend
+    )
+
+
+subscription_cache = create_subscription_cache()
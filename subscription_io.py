@@ -0,0 +1,152 @@
+import os
+import csv
+import json
+import codecs
+import pickle
+import tempfile
+
+# Define global variables from environment
+SUBSCRIPTION_IMPORT_CHUNK_SIZE=int(os.getenv("SUBSCRIPTION_IMPORT_CHUNK_SIZE", "1000"))
+SUBSCRIPTION_IMPORT_MAX_ERRORS=int(os.getenv("SUBSCRIPTION_IMPORT_MAX_ERRORS", "100"))
+SUBSCRIPTION_IMPORT_MAX_LINE_LENGTH=int(os.getenv("SUBSCRIPTION_IMPORT_MAX_LINE_LENGTH", "65536"))
+# Seconds the whole upload may take to arrive and be validated
+SUBSCRIPTION_IMPORT_TIMEOUT=float(os.getenv("SUBSCRIPTION_IMPORT_TIMEOUT", "120"))
+# Validated rows stay in memory up to this size, the rest of the spool goes to a temporary file
+SUBSCRIPTION_IMPORT_SPOOL_MEMORY_BYTES=int(os.getenv("SUBSCRIPTION_IMPORT_SPOOL_MEMORY_BYTES", str(8 * 1024 * 1024)))
+IMPORT_COLUMNS=(
+    "user_email",
+    "subscription_name",
+    "subscription_period",
+    "subscription_start_date",
+    "subscription_end_date",
+    "subscription_price"
+)
+
+# Incremental parsing of uploaded subscription files, only the current line and
+# one chunk of records are held in memory whatever the size of the upload
+
+
+def check_line_length(line: str, max_line_length: int):
+    if len(line) > max_line_length:
+        raise ValueError(f"Line longer than {max_line_length} characters")
+
+
+async def iter_text_lines(chunks, max_line_length: int = SUBSCRIPTION_IMPORT_MAX_LINE_LENGTH):
+    """
+    Decode an async iterable of UTF-8 byte chunks into lines without their line
+    endings. A line longer than max_line_length raises ValueError as soon as it
+    is seen, before the rest of it is buffered
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        check_line_length(pending, max_line_length)
+        for line in lines:
+            check_line_length(line, max_line_length)
+            yield line.rstrip("\r")
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_records(chunks, max_line_length: int = SUBSCRIPTION_IMPORT_MAX_LINE_LENGTH):
+    """
+    Yield one dictionary per CSV row keyed by the header row, quoted fields may
+    span lines as long as the whole row stays within max_line_length
+    """
+    header = None
+    record_lines = []
+    record_length = 0
+    quote_count = 0
+    async for line in iter_text_lines(chunks, max_line_length):
+        record_lines.append(line)
+        record_length += len(line) + 1
+        if record_length > max_line_length:
+            raise ValueError(f"CSV row longer than {max_line_length} characters")
+        quote_count += line.count('"')
+        # An odd number of quotes means a quoted field continues on the next line
+        if quote_count % 2:
+            continue
+
+        values = next(csv.reader(["\n".join(record_lines)]), [])
+        record_lines = []
+        record_length = 0
+        quote_count = 0
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        yield dict(zip(header, values))
+
+    if record_lines:
+        raise ValueError("Unterminated quoted field at the end of the CSV file")
+
+
+async def iter_ndjson_records(chunks, max_line_length: int = SUBSCRIPTION_IMPORT_MAX_LINE_LENGTH):
+    """
+    Yield one dictionary per non-empty NDJSON line
+    """
+    line_number = 0
+    async for line in iter_text_lines(chunks, max_line_length):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON on line {line_number}")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {line_number} is not a JSON object")
+        yield record
+
+
+async def iter_record_chunks(records, chunk_size: int = SUBSCRIPTION_IMPORT_CHUNK_SIZE):
+    chunk = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+class ImportSpool:
+    """
+    Validated import rows written one chunk at a time to a temporary file, held
+    in memory up to max_memory_bytes. Lets an import read and check the whole
+    upload before it borrows a database connection
+    """
+    def __init__(self, max_memory_bytes: int = SUBSCRIPTION_IMPORT_SPOOL_MEMORY_BYTES):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+        self.rows = 0
+
+    def write_chunk(self, rows: list):
+        pickle.dump(rows, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.rows += len(rows)
+
+    def iter_chunks(self):
+        self._file.seek(0)
+        while True:
+            try:
+                yield pickle.load(self._file)
+            except EOFError:
+                return
+
+    def close(self):
+        self._file.close()
+
+
+def iter_import_records(chunks, file_format: str):
+    if file_format == "csv":
+        return iter_csv_records(chunks)
+    if file_format == "ndjson":
+        return iter_ndjson_records(chunks)
+
+    raise ValueError(f"Unsupported import format {file_format!r}")
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests import the application modules from the repository root, without a database
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BACKEND_API_SECRET_KEY", "test-api-key")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-of-at-least-thirty-two-bytes")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("RENEWAL_SCHEDULER_ENABLED", "False")
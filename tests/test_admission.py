@@ -0,0 +1,92 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI, Depends
+from admission import ConcurrencyLimiter, UserRateLimiter
+from module import create_jwt
+from settings import settings
+
+
+def make_app(limiter):
+    app = FastAPI()
+
+    @app.get("/resource", dependencies=[Depends(limiter)])
+    async def resource():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    return app
+
+
+def get_many(app, count: int, headers: dict, cookies: dict = None):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", cookies=cookies) as client:
+            return await asyncio.gather(*(client.get("/resource", headers=headers) for _ in range(count)))
+
+    return [response.status_code for response in asyncio.run(run())]
+
+
+def test_token_bucket_refills_at_the_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("admission.time.monotonic", lambda: now[0])
+    limiter = UserRateLimiter(rate=2, burst=3, max_users=10)
+
+    assert [limiter.allow("a@example.com") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.allow("a@example.com") == pytest.approx(0.5)
+    now[0] += 0.5
+    assert limiter.allow("a@example.com") == 0.0
+    assert limiter.allow("b@example.com") == 0.0
+
+
+def test_least_recently_seen_users_are_dropped():
+    limiter = UserRateLimiter(rate=1, burst=1, max_users=2)
+    for user_email in ("a@example.com", "b@example.com", "c@example.com"):
+        limiter.allow(user_email)
+
+    assert limiter.stats()["tracked_users"] == 2
+
+
+def test_rate_limit_answers_429():
+    limiter = UserRateLimiter(rate=0.001, burst=2, max_users=10)
+    cookies = {"cookie_session": create_jwt({"email": "a@example.com"})}
+    headers = {"Authorization": f"Bearer {settings.backend_api_secret_key}"}
+
+    assert sorted(get_many(make_app(limiter), 4, headers, cookies)) == [200, 200, 429, 429]
+
+
+def test_requests_without_the_api_key_do_not_use_tokens():
+    limiter = UserRateLimiter(rate=0.001, burst=2, max_users=10)
+    app = make_app(limiter)
+    cookies = {"cookie_session": create_jwt({"email": "a@example.com"})}
+
+    get_many(app, 5, {"Authorization": "Bearer wrong-key"}, cookies)
+    assert limiter.stats()["tracked_users"] == 0
+
+    headers = {"Authorization": f"Bearer {settings.backend_api_secret_key}"}
+    assert get_many(app, 2, headers, cookies) == [200, 200]
+
+
+def test_concurrency_limiter_sheds_beyond_the_queue():
+    limiter = ConcurrencyLimiter("db", limit=2, max_queue_size=2, queue_timeout=1)
+    statuses = get_many(make_app(limiter), 8, {})
+
+    assert statuses.count(200) == 4
+    assert statuses.count(503) == 4
+    assert limiter.stats()["in_flight"] == 0 and limiter.stats()["queued"] == 0
+
+
+def test_concurrency_limiter_times_out_queued_requests():
+    limiter = ConcurrencyLimiter("db", limit=1, max_queue_size=10, queue_timeout=0.001)
+    statuses = get_many(make_app(limiter), 3, {})
+
+    assert statuses.count(200) == 1 and statuses.count(503) == 2
+
+
+@pytest.mark.parametrize("path", ["/paypal-callback", "/auth/google/callback"])
+def test_callbacks_writing_to_the_database_are_admitted_to_it(path):
+    import api
+
+    route = next(route for route in api.app.routes if getattr(route, "path", None) == path)
+
+    assert api.db_admission in [dependency.dependency for dependency in route.dependencies]
@@ -0,0 +1,86 @@
+from datetime import datetime
+import archival
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        query = " ".join(query.split())
+        self.connection.statements.append((query, self.connection.autocommit))
+        self.rowcount = self.connection.rowcounts.pop(0) if query.startswith("INSERT") else 0
+
+    def fetchall(self):
+        return self.connection.partitions
+
+
+class FakeConnection:
+    def __init__(self, partitions, rowcounts=()):
+        self.partitions = partitions
+        self.rowcounts = list(rowcounts)
+        self.statements = []
+        self.autocommit = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_only_whole_months_before_the_cutoff_expire_oldest_first():
+    connection = FakeConnection([
+        ("subscription_tracker_list_p202403", False),
+        ("subscription_tracker_list_p202401", False),
+        ("subscription_tracker_list_p202412", None),
+        ("subscription_tracker_list_p202402", True),
+        ("subscription_tracker_list_active", False)
+    ])
+
+    assert archival.expired_partitions(connection, datetime(2024, 3, 15)) == [
+        ("subscription_tracker_list_p202401", False),
+        ("subscription_tracker_list_p202402", True)
+    ]
+
+
+def test_december_partition_ends_in_january():
+    connection = FakeConnection([("subscription_tracker_list_p202412", False)])
+
+    assert archival.expired_partitions(connection, datetime(2024, 12, 31)) == []
+    assert archival.expired_partitions(connection, datetime(2025, 1, 1)) == [("subscription_tracker_list_p202412", False)]
+
+
+def test_partitions_are_detached_concurrently_or_finished_then_archived():
+    connection = FakeConnection([
+        ("subscription_tracker_list_p202401", False),
+        ("subscription_tracker_list_p202402", True),
+        ("subscription_tracker_list_p202403", None)
+    ], rowcounts=[3, 2, 1])
+
+    assert archival.archive_partitions(connection, datetime(2024, 6, 1)) == 6
+
+    detaches = [(query, autocommit) for query, autocommit in connection.statements if "DETACH" in query]
+    assert detaches == [
+        ("ALTER TABLE subscription_tracker_list DETACH PARTITION subscription_tracker_list_p202401 CONCURRENTLY", True),
+        ("ALTER TABLE subscription_tracker_list DETACH PARTITION subscription_tracker_list_p202402 FINALIZE", True)
+    ]
+    drops = [query for query, _ in connection.statements if query.startswith("DROP")]
+    assert len(drops) == 3
+    assert connection.autocommit is False
+
+
+def test_archive_copies_never_drop_a_conflicting_row():
+    for query in (archival.ARCHIVE_PARTITION_QUERY, archival.QUERIES["archive_deleted_subscriptions"].pyformat_text):
+        assert "DO NOTHING" not in query
+        assert "ON CONFLICT (id) DO UPDATE" in query
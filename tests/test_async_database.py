@@ -0,0 +1,216 @@
+import asyncio
+import asyncpg
+import pytest
+import async_database
+from async_database import Replica
+from subscription_cache import SubscriptionCache, InMemoryCacheBackend
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def fetch(self, query, *args):
+        if self.pool.query_error is not None:
+            raise self.pool.query_error
+        self.pool.reads += 1
+        return [(self.pool.name,)]
+
+    async def fetchval(self, query, *args):
+        if self.pool.query_error is not None:
+            raise self.pool.query_error
+        return self.pool.lag_seconds
+
+
+class FakePool:
+    """
+    Stand-in asyncpg pool answering every fetch with its own name
+    """
+    def __init__(self, name: str, lag_seconds: float = 0.0):
+        self.name = name
+        self.lag_seconds = lag_seconds
+        self.acquire_error = None
+        self.query_error = None
+        self.reads = 0
+
+    def get_idle_size(self):
+        return 1
+
+    def get_size(self):
+        return 1
+
+    def get_max_size(self):
+        return 1
+
+    def acquire(self, timeout=None):
+        pool = self
+
+        class Acquire:
+            def __await__(self):
+                async def acquire():
+                    if pool.acquire_error is not None:
+                        raise pool.acquire_error
+                    return FakeConnection(pool)
+                return acquire().__await__()
+
+            async def __aenter__(self):
+                return await self
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+        return Acquire()
+
+    async def release(self, connection):
+        pass
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    primary = FakePool("primary")
+    replica_list = []
+    for index in range(2):
+        replica = Replica(f"postgresql://reader@replica-{index}:5432/subscriptions")
+        replica.pool = FakePool(replica.name)
+        replica.healthy = True
+        replica_list.append(replica)
+
+    cache = SubscriptionCache(InMemoryCacheBackend(100), ttl=60, marker_backend=InMemoryCacheBackend(100))
+    monkeypatch.setattr(async_database, "_pool", primary)
+    monkeypatch.setattr(async_database, "_replicas", replica_list)
+    monkeypatch.setattr(async_database, "subscription_cache", cache)
+
+    return primary, replica_list
+
+
+def fetch_source(user_email=None):
+    rows = asyncio.run(async_database.fetch("get_user_data", {"email": "a@example.com"},
+                                            read_only=True, user_email=user_email))
+    return rows[0][0]
+
+
+def test_reads_rotate_over_healthy_replicas(replicas):
+    _, replica_list = replicas
+    sources = {fetch_source() for _ in range(4)}
+
+    assert sources == {replica.name for replica in replica_list}
+
+
+def test_reads_of_a_user_stay_on_one_replica(replicas):
+    # The subscription version and the data read after it come from the same replica
+    sources = {fetch_source("a@example.com") for _ in range(4)}
+
+    assert len(sources) == 1 and sources != {"primary"}
+
+
+def test_writes_go_to_the_primary(replicas):
+    primary, replica_list = replicas
+    asyncio.run(async_database.fetch("get_user_data", {"email": "a@example.com"}))
+
+    assert primary.reads == 1
+    assert all(replica.pool.reads == 0 for replica in replica_list)
+
+
+def test_unreachable_replica_is_ejected_and_the_read_falls_back(replicas):
+    _, replica_list = replicas
+    for replica in replica_list:
+        replica.pool.acquire_error = ConnectionRefusedError("replica down")
+
+    assert fetch_source() == "primary"
+    ejected = [replica for replica in replica_list if not replica.healthy]
+    assert len(ejected) == 1 and ejected[0].counters["ejections"] == 1
+
+
+def test_replica_out_of_connections_is_not_ejected(replicas):
+    _, replica_list = replicas
+    for replica in replica_list:
+        replica.pool.acquire_error = asyncio.TimeoutError()
+
+    assert fetch_source() == "primary"
+    assert all(replica.healthy for replica in replica_list)
+    assert sum(replica.counters["fallbacks"] for replica in replica_list) == 1
+    assert sum(replica.counters["ejections"] for replica in replica_list) == 0
+
+
+def test_conflict_with_recovery_falls_back_without_ejecting(replicas):
+    _, replica_list = replicas
+    for replica in replica_list:
+        replica.pool.query_error = asyncpg.SerializationError("canceling statement due to conflict with recovery")
+
+    assert fetch_source() == "primary"
+    assert all(replica.healthy for replica in replica_list)
+
+
+def test_no_healthy_replica_reads_the_primary(replicas):
+    _, replica_list = replicas
+    for replica in replica_list:
+        replica.healthy = False
+
+    assert fetch_source() == "primary"
+
+
+def test_user_reads_own_writes_from_the_primary(replicas):
+    asyncio.run(async_database.stick_to_primary("a@example.com"))
+
+    assert fetch_source("a@example.com") == "primary"
+    assert fetch_source("b@example.com") != "primary"
+
+
+def test_recent_write_is_seen_by_every_worker_sharing_the_backend(replicas, monkeypatch):
+    # A second worker has its own process state but the same cache backend
+    shared_backend = InMemoryCacheBackend(100)
+    writer_cache = SubscriptionCache(InMemoryCacheBackend(10), 60, marker_backend=shared_backend)
+    reader_cache = SubscriptionCache(InMemoryCacheBackend(10), 60, marker_backend=shared_backend)
+
+    monkeypatch.setattr(async_database, "subscription_cache", writer_cache)
+    asyncio.run(async_database.stick_to_primary("a@example.com"))
+    monkeypatch.setattr(async_database, "subscription_cache", reader_cache)
+
+    assert fetch_source("a@example.com") == "primary"
+
+
+def test_health_check_ejects_lagging_and_readmits_caught_up_replicas(replicas):
+    _, replica_list = replicas
+    replica = replica_list[0]
+
+    replica.pool.lag_seconds = async_database.DB_REPLICA_MAX_LAG_SECONDS + 1
+    asyncio.run(replica.check())
+    assert not replica.healthy
+
+    replica.pool.lag_seconds = 0.5
+    asyncio.run(replica.check())
+    assert replica.healthy and replica.lag_seconds == 0.5
+
+
+@pytest.mark.parametrize("error", [
+    asyncpg.InvalidPasswordError("password authentication failed for user \"reader\""),
+    asyncpg.InterfaceError("cannot perform operation: another operation is in progress")
+])
+def test_replica_rejecting_the_connection_is_ejected_without_failing_startup(replicas, monkeypatch, error):
+    primary, _ = replicas
+
+    async def create_pool(**database_settings):
+        if "dsn" in database_settings:
+            raise error
+        return primary
+
+    monkeypatch.setattr(async_database, "_pool", None)
+    monkeypatch.setattr(async_database, "_replicas", [])
+    monkeypatch.setattr(async_database, "DB_REPLICA_DSNS", ["postgresql://reader@replica-0:5432/subscriptions"])
+    monkeypatch.setattr(async_database, "create_pool", create_pool)
+
+    async def run():
+        pool = await async_database.init_pool()
+        replica_list = list(async_database._replicas)
+        source = (await async_database.fetch("get_user_data", {"email": "a@example.com"}, read_only=True))[0][0]
+        await async_database.close_pool()
+        return pool, replica_list, source
+
+    pool, replica_list, source = asyncio.run(run())
+
+    assert pool is primary
+    assert [replica.healthy for replica in replica_list] == [False]
+    assert source == "primary"
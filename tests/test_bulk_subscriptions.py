@@ -0,0 +1,87 @@
+from decimal import Decimal
+from datetime import datetime
+from module import prepare_bulk_subscriptions, prepare_bulk_deletions, resolve_bulk_deletions
+
+
+def subscription(name: str, **fields):
+    return {
+        "user_email": "a@example.com",
+        "subscription_name": name,
+        "subscription_period": "3 month",
+        "subscription_start_date": "2025-01-31",
+        **fields
+    }
+
+
+def test_mixed_batch_inserts_the_valid_items_and_reports_the_others():
+    columns, results = prepare_bulk_subscriptions([
+        subscription("music", subscription_price="9.99"),
+        subscription("video", subscription_start_date="31-01-2025"),
+        {"user_email": "a@example.com", "subscription_name": "cloud"},
+        subscription("news", subscription_period="monthly"),
+        subscription("games", subscription_price="-1"),
+        subscription("books", subscription_price=None),
+        "not an object"
+    ])
+
+    assert [result["status"] for result in results] == [
+        "inserted", "error", "error", "error", "error", "inserted", "error"
+    ]
+    assert [result["index"] for result in results] == list(range(7))
+    assert columns["subscription_names"] == ["music", "books"]
+    assert columns["subscription_end_dates"] == [datetime(2025, 4, 30), datetime(2025, 4, 30)]
+    assert columns["subscription_prices"] == [Decimal("9.99"), None]
+
+
+def test_price_overflowing_the_column_is_a_per_item_error():
+    columns, results = prepare_bulk_subscriptions([
+        subscription("music", subscription_price="9999999999.99"),
+        subscription("video", subscription_price="10000000000"),
+        subscription("cloud", subscription_price=1e20),
+        subscription("news", subscription_price="9999999999.995")
+    ])
+
+    assert [result["status"] for result in results] == ["inserted", "error", "error", "error"]
+    assert "digits before the decimal point" in results[1]["detail"]
+    assert columns["subscription_prices"] == [Decimal("9999999999.99")]
+
+
+def test_prices_are_rounded_to_the_column_scale():
+    columns, _ = prepare_bulk_subscriptions([
+        subscription("music", subscription_price="4.995"),
+        subscription("video", subscription_price=10)
+    ])
+
+    assert columns["subscription_prices"] == [Decimal("5.00"), Decimal("10.00")]
+
+
+def test_deletions_resolve_to_deleted_not_found_and_error():
+    items = [
+        {"email": "a@example.com", "deleted_subs_name": "music"},
+        {"email": "a@example.com"},
+        {"email": "a@example.com", "deleted_subs_name": "video"},
+        {"email": "b@example.com", "deleted_subs_name": "music"}
+    ]
+    columns, results = prepare_bulk_deletions(items)
+
+    assert columns == {
+        "user_emails": ["a@example.com", "a@example.com", "b@example.com"],
+        "subscription_names": ["music", "video", "music"]
+    }
+
+    deleted_rows = [("b@example.com", "music"), ("a@example.com", "music")]
+    resolved = resolve_bulk_deletions(columns, results, deleted_rows)
+
+    assert [(result["index"], result["status"]) for result in resolved] == [
+        (0, "deleted"), (1, "error"), (2, "not_found"), (3, "deleted")
+    ]
+
+
+def test_repeated_deletion_in_one_batch_is_reported_for_each_item():
+    columns, results = prepare_bulk_deletions([
+        {"email": "a@example.com", "deleted_subs_name": "music"},
+        {"email": "a@example.com", "deleted_subs_name": "music"}
+    ])
+    resolved = resolve_bulk_deletions(columns, results, [("a@example.com", "music")])
+
+    assert [result["status"] for result in resolved] == ["deleted", "deleted"]
@@ -0,0 +1,83 @@
+import asyncio
+import httpx
+import api
+from module import create_jwt
+from serialization import MSGPACK_MEDIA_TYPE
+
+API_KEY = api.settings.backend_api_secret_key
+SUBSCRIPTIONS = [
+    {"subscription_name": f"service-{index}", "subscription_period": "1 month", "subscription_price": 9.99}
+    for index in range(100)
+]
+
+
+def get(headers: dict):
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            client.cookies.set("cookie_session", create_jwt({"email": "etag@example.com"}))
+            return await client.get(
+                "/get-subscription-data", headers={"Authorization": f"Bearer {API_KEY}", **headers}
+            )
+
+    return asyncio.run(run())
+
+
+def stub_data(monkeypatch, version: list = None):
+    version = version or [1]
+
+    async def get_subscription_version(user_email):
+        return version[0]
+
+    async def get_subs_data(user_email, version):
+        return SUBSCRIPTIONS
+
+    monkeypatch.setattr(api, "get_subscription_version", get_subscription_version)
+    monkeypatch.setattr(api, "get_subs_data", get_subs_data)
+
+
+def test_etag_differs_per_negotiated_media_type(monkeypatch):
+    stub_data(monkeypatch)
+    json_response = get({"Accept-Encoding": "identity"})
+    msgpack_response = get({"Accept": MSGPACK_MEDIA_TYPE, "Accept-Encoding": "identity"})
+
+    assert json_response.headers["etag"] != msgpack_response.headers["etag"]
+    assert "Accept" in json_response.headers["vary"]
+
+    # A JSON copy does not validate a MessagePack request
+    revalidated = get({
+        "Accept": MSGPACK_MEDIA_TYPE,
+        "Accept-Encoding": "identity",
+        "If-None-Match": json_response.headers["etag"]
+    })
+    assert revalidated.status_code == 200
+    assert revalidated.headers["content-type"] == MSGPACK_MEDIA_TYPE
+
+    not_modified = get({"Accept-Encoding": "identity", "If-None-Match": json_response.headers["etag"]})
+    assert not_modified.status_code == 304
+
+
+def test_compressed_responses_carry_a_weak_etag(monkeypatch):
+    stub_data(monkeypatch)
+    identity = get({"Accept-Encoding": "identity"})
+    compressed = get({"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] == f"W/{identity.headers['etag']}"
+    assert {"Accept", "Accept-Encoding"} <= set(compressed.headers["vary"].replace(" ", "").split(","))
+
+    not_modified = get({"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == compressed.headers["etag"]
+
+
+def test_new_version_in_the_database_changes_the_etag(monkeypatch):
+    version = [1]
+    stub_data(monkeypatch, version)
+    before = get({"Accept-Encoding": "identity"})
+
+    version[0] = 2
+    after_write = get({"Accept-Encoding": "identity", "If-None-Match": before.headers["etag"]})
+
+    assert after_write.status_code == 200
+    assert after_write.headers["etag"] != before.headers["etag"]
@@ -0,0 +1,137 @@
+import threading
+import psycopg2
+import psycopg2.extensions
+import pytest
+from database import ConnectionPool, PoolTimeoutError
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        if self.connection.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    """
+    Stand-in psycopg2 connection, broken ones fail the health check query
+    """
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.transaction_status
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture(autouse=True)
+def fake_connect(monkeypatch):
+    monkeypatch.setattr(psycopg2, "connect", lambda **kwargs: FakeConnection())
+
+
+def make_pool(max_size: int = 1, timeout: float = 0.05, health_check: bool = True):
+    return ConnectionPool(min_size=0, max_size=max_size, timeout=timeout, health_check=health_check)
+
+
+def test_checkout_times_out_when_every_connection_is_in_use():
+    pool = make_pool(max_size=1)
+    pool.getconn()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+    assert pool.stats()["waits"] == 1
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiting_checkout_gets_the_returned_connection():
+    pool = make_pool(max_size=1, timeout=5)
+    connection = pool.getconn()
+    threading.Timer(0.05, pool.putconn, args=(connection,)).start()
+
+    assert pool.getconn() is connection
+    assert pool.stats()["timeouts"] == 0
+
+
+def test_connections_are_reused():
+    pool = make_pool(max_size=2)
+    connection = pool.getconn()
+    pool.putconn(connection)
+
+    assert pool.getconn() is connection
+    assert pool.stats()["in_use"] == 1
+
+
+def test_closed_connection_is_discarded_on_return():
+    pool = make_pool()
+    connection = pool.getconn()
+    connection.closed = 1
+    pool.putconn(connection)
+
+    assert pool.getconn() is not connection
+    assert pool.stats()["connections_discarded"] == 1
+
+
+def test_open_transaction_is_rolled_back_on_return():
+    pool = make_pool()
+    connection = pool.getconn()
+    connection.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(connection)
+
+    assert connection.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    assert pool.getconn() is connection
+
+
+def test_health_check_replaces_a_broken_idle_connection():
+    pool = make_pool()
+    connection = pool.getconn()
+    pool.putconn(connection)
+    connection.broken = True
+
+    replacement = pool.getconn()
+
+    assert replacement is not connection
+    assert connection.closed
+    assert pool.stats()["connections_discarded"] == 1
+    assert pool.stats()["connections_created"] == 2
+
+
+def test_without_health_check_idle_connections_are_handed_out_as_they_are():
+    pool = make_pool(health_check=False)
+    connection = pool.getconn()
+    pool.putconn(connection)
+    connection.broken = True
+
+    assert pool.getconn() is connection
+
+
+def test_failed_connect_releases_the_reserved_slot(monkeypatch):
+    pool = make_pool(max_size=1)
+
+    def connect(**kwargs):
+        raise psycopg2.OperationalError("could not connect to server")
+
+    monkeypatch.setattr(psycopg2, "connect", connect)
+    with pytest.raises(psycopg2.OperationalError):
+        pool.getconn()
+
+    monkeypatch.setattr(psycopg2, "connect", lambda **kwargs: FakeConnection())
+    assert pool.getconn() is not None
+    assert pool.stats()["in_use"] == 1
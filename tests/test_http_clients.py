@@ -0,0 +1,163 @@
+import asyncio
+import dataclasses
+import httpx
+import jwt
+import pytest
+import http_clients
+import paypal_auth
+from paypal_auth import PayPalTokenCache
+from google_auth import GoogleJWKSCache
+
+PAYPAL_BASE_URL = "https://api-m.sandbox.paypal.com"
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    """
+    Shared clients whose transports are httpx.MockTransport handlers, set per test
+    """
+    handlers = {}
+    monkeypatch.setattr(http_clients, "_clients", {})
+    monkeypatch.setattr(http_clients, "_transports", {})
+    monkeypatch.setattr(paypal_auth, "settings", dataclasses.replace(
+        paypal_auth.settings, paypal_base_url=PAYPAL_BASE_URL, paypal_client_id="id", paypal_client_secret="secret"
+    ))
+    http_clients.init_http_clients({
+        upstream: httpx.MockTransport(lambda request, upstream=upstream: handlers[upstream](request))
+        for upstream in ("paypal", "google")
+    })
+    yield handlers
+    asyncio.run(http_clients.close_http_clients())
+
+
+def google_key_set(key_id: str = "google-key-1"):
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    public_key = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key()
+    signing_key = jwt.algorithms.RSAAlgorithm.to_jwk(public_key, as_dict=True)
+
+    return {"keys": [{**signing_key, "kid": key_id, "alg": "RS256", "use": "sig"}]}
+
+
+def make_google_cache():
+    return GoogleJWKSCache(GOOGLE_JWKS_URL, default_max_age=3600, refresh_margin=300, min_refresh_interval=30)
+
+
+def test_every_call_reuses_the_shared_client(upstreams):
+    connections = []
+
+    def paypal(request):
+        connections.append(request.url.path)
+        return httpx.Response(200, json={"access_token": "token", "expires_in": 0})
+
+    upstreams["paypal"] = paypal
+    client = http_clients.get_http_client("paypal")
+    cache = PayPalTokenCache(refresh_margin=300)
+
+    async def run():
+        # expires_in 0 forces a new token request on every call
+        return [await cache.get_token() for _ in range(3)]
+
+    assert asyncio.run(run()) == ["token"] * 3
+    assert http_clients.get_http_client("paypal") is client
+    assert connections == ["/v1/oauth2/token"] * 3
+    assert http_clients.http_client_stats()["paypal"]["requests"] == 3
+
+
+def test_requests_carry_the_upstream_timeouts(upstreams):
+    timeouts = {}
+
+    def record(upstream, payload):
+        def handler(request):
+            timeouts[upstream] = request.extensions["timeout"]
+            return httpx.Response(200, json=payload)
+        return handler
+
+    upstreams["paypal"] = record("paypal", {"access_token": "token", "expires_in": 3600})
+    upstreams["google"] = record("google", google_key_set())
+    asyncio.run(PayPalTokenCache(refresh_margin=300).get_token())
+    asyncio.run(make_google_cache().refresh())
+
+    assert timeouts["paypal"] == http_clients.UPSTREAM_TIMEOUTS["paypal"].as_dict()
+    assert timeouts["google"] == http_clients.UPSTREAM_TIMEOUTS["google"].as_dict()
+    assert timeouts["paypal"]["connect"] == 5.0
+
+
+def test_timeout_is_counted_as_an_upstream_failure(upstreams):
+    def timeout(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    upstreams["paypal"] = timeout
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(PayPalTokenCache(refresh_margin=300).get_token())
+
+    stats = http_clients.http_client_stats()["paypal"]
+    assert stats["failures"] == 1 and stats["in_flight"] == 0
+
+
+def test_refused_paypal_token_is_not_cached(upstreams):
+    statuses = [401, 200]
+
+    def paypal(request):
+        status_code = statuses.pop(0)
+        return httpx.Response(status_code, json={"access_token": "token", "expires_in": 3600})
+
+    upstreams["paypal"] = paypal
+    cache = PayPalTokenCache(refresh_margin=300)
+
+    async def run():
+        return await cache.get_token(), await cache.get_token(), await cache.get_token()
+
+    assert asyncio.run(run()) == (None, "token", "token")
+    assert statuses == []
+
+
+def test_failed_google_key_refresh_raises_and_is_counted(upstreams):
+    upstreams["google"] = lambda request: httpx.Response(503)
+    cache = make_google_cache()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(cache.refresh())
+    assert cache.stats()["refresh_failures"] == 1
+
+    key_set = google_key_set("google-key-1")
+    upstreams["google"] = lambda request: httpx.Response(200, json=key_set, headers={"Cache-Control": "max-age=600"})
+
+    async def run():
+        signing_key = await cache.get_signing_key("google-key-1")
+        with pytest.raises(jwt.PyJWKError):
+            await cache.get_signing_key("unknown-kid")
+        return signing_key
+
+    assert asyncio.run(run()).key_id == "google-key-1"
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_paypal_401_drops_the_cached_token_and_reports_the_error_page(upstreams, monkeypatch):
+    import api
+
+    def paypal(request):
+        if request.url.path == "/v1/oauth2/token":
+            return httpx.Response(200, json={"access_token": "stale-token", "expires_in": 3600})
+        return httpx.Response(401, json={"name": "AUTHENTICATION_FAILURE"})
+
+    upstreams["paypal"] = paypal
+    monkeypatch.setattr(api, "settings", dataclasses.replace(api.settings, paypal_base_url=PAYPAL_BASE_URL))
+    monkeypatch.setattr(api, "paypal_token_cache", PayPalTokenCache(refresh_margin=300))
+    monkeypatch.setattr(paypal_auth, "paypal_token_cache", api.paypal_token_cache)
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/create-paypal-payment",
+                json={"amount": 10, "user_email": "a@example.com"},
+                headers={"Authorization": f"Bearer {api.settings.backend_api_secret_key}"}
+            )
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert response.json()["payment_url"] == f"{api.settings.website_url}/error"
+    assert api.paypal_token_cache._access_token is None
@@ -0,0 +1,107 @@
+import jwt
+import jwt.api_jwt
+import pytest
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+import module
+from module import VerifiedTokenCache, decode_jwt
+from settings import settings
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    token_cache = VerifiedTokenCache(max_size=100)
+    monkeypatch.setattr(module, "jwt_cache", token_cache)
+
+    return token_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Moves the clock of the token cache and of PyJWT's exp check forward together
+    """
+    offset = [0.0]
+
+    class ShiftedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(seconds=offset[0])
+
+    monkeypatch.setattr(module, "time", SimpleNamespace(time=lambda: _wall_time() + offset[0]))
+    monkeypatch.setattr(jwt.api_jwt, "datetime", ShiftedDatetime)
+
+    def advance(seconds: float):
+        offset[0] += seconds
+
+    return advance
+
+
+def _wall_time():
+    return datetime.now().timestamp()
+
+
+def make_token(expires_in: float = 60, key: str = None):
+    claims = {"email": "a@example.com", "exp": int(_wall_time() + expires_in)}
+
+    return jwt.encode(claims, key or settings.jwt_secret_key, settings.jwt_algorithm)
+
+
+def test_token_expiring_while_cached_is_dropped_from_the_cache(cache, clock):
+    token = make_token(expires_in=60)
+    assert decode_jwt(token)["email"] == "a@example.com"
+    assert cache.get(token) is not None
+
+    clock(120)
+
+    assert cache.get(token) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_cached_token_is_rejected_once_its_exp_passes(cache, clock):
+    token = make_token(expires_in=60)
+    decode_jwt(token)
+    assert decode_jwt(token)["email"] == "a@example.com"
+    assert cache.stats()["hits"] == 1
+
+    clock(120)
+
+    assert decode_jwt(token) == {"error": "Token expired"}
+    assert cache.stats()["size"] == 0
+
+
+def test_invalid_signature_is_never_cached(cache):
+    forged_token = make_token(key="another-secret-of-at-least-thirty-two-bytes")
+
+    assert decode_jwt(forged_token) == {"error": "Invalid token"}
+    assert decode_jwt(forged_token) == {"error": "Invalid token"}
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["hits"] == 0
+
+
+def test_expired_and_exp_less_tokens_are_not_cached(cache):
+    assert decode_jwt(make_token(expires_in=-60)) == {"error": "Token expired"}
+    assert decode_jwt(jwt.encode({"email": "a@example.com"}, settings.jwt_secret_key, settings.jwt_algorithm))
+
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_keeps_the_most_recently_used_tokens_within_its_bound():
+    token_cache = VerifiedTokenCache(max_size=2)
+    expires_at = _wall_time() + 60
+    for name in ("first", "second"):
+        token_cache.set(name, {"email": f"{name}@example.com", "exp": expires_at})
+    token_cache.get("first")
+    token_cache.set("third", {"email": "third@example.com", "exp": expires_at})
+
+    assert token_cache.stats()["size"] == 2
+    assert token_cache.get("second") is None
+    assert token_cache.get("first")["email"] == "first@example.com"
+    assert token_cache.get("third")["email"] == "third@example.com"
+
+
+def test_cached_claims_are_copies(cache):
+    token = make_token()
+    decode_jwt(token)["email"] = "changed@example.com"
+
+    assert decode_jwt(token)["email"] == "a@example.com"
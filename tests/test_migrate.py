@@ -0,0 +1,66 @@
+import pytest
+import migrate
+
+UNIQUE_EMAIL_INDEX = (
+    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_user_email_key\n"
+    "    ON subscription_tracker_user (email)"
+)
+ACTIVE_NAME_INDEX = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS subscription_tracker_list_active_name_idx\n"
+    "    ON subscription_tracker_list (user_email, subscription_name)\n"
+    "    WHERE deleted_at IS NULL"
+)
+
+
+class FakeCursor:
+    """
+    Answers the indisvalid lookups in order, None for a missing index
+    """
+    def __init__(self, index_states, duplicates=()):
+        self.index_states = list(index_states)
+        self.duplicates = list(duplicates)
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append(" ".join(query.split()))
+
+    def fetchone(self):
+        state = self.index_states.pop(0)
+        return None if state is None else (state,)
+
+    def fetchall(self):
+        return self.duplicates
+
+
+def test_split_statements_skips_comments():
+    statements = migrate.split_statements("-- comment\nCREATE TABLE a(id INT);\n\nCREATE TABLE b(id INT);\n")
+
+    assert statements == ["CREATE TABLE a(id INT)", "CREATE TABLE b(id INT)"]
+
+
+def test_invalid_index_is_dropped_and_rebuilt():
+    cursor = FakeCursor([False, True])
+    migrate.create_index_concurrently(cursor, ACTIVE_NAME_INDEX)
+
+    assert "DROP INDEX CONCURRENTLY IF EXISTS subscription_tracker_list_active_name_idx" in cursor.statements
+    assert cursor.statements[-2].startswith("CREATE INDEX CONCURRENTLY")
+
+
+def test_index_left_invalid_fails_the_migration():
+    with pytest.raises(migrate.MigrationError):
+        migrate.create_index_concurrently(FakeCursor([None, False]), ACTIVE_NAME_INDEX)
+
+
+def test_duplicate_emails_are_reported_before_the_unique_index_is_built():
+    cursor = FakeCursor([None], duplicates=[("a@example.com", 3), ("b@example.com", 2)])
+    with pytest.raises(migrate.MigrationError, match="a@example.com \\(3 rows\\), b@example.com \\(2 rows\\)"):
+        migrate.create_index_concurrently(cursor, UNIQUE_EMAIL_INDEX)
+
+    assert not any(statement.startswith("CREATE") for statement in cursor.statements)
+
+
+def test_partial_unique_index_checks_only_its_rows():
+    cursor = FakeCursor([None, True])
+    migrate.create_index_concurrently(cursor, UNIQUE_EMAIL_INDEX + " WHERE email <> ''")
+
+    assert "FROM subscription_tracker_user WHERE email <> '' GROUP BY email" in cursor.statements[1]
@@ -0,0 +1,41 @@
+import pytest
+from database import Query, QueryParameterError, QUERIES
+
+
+def test_repeated_parameter_is_bound_once():
+    query = Query("repeated", "SELECT @USER_EMAIL, @LIMIT WHERE email = @USER_EMAIL")
+
+    assert query.param_names == ("user_email", "limit")
+    assert query.positional_text == "SELECT $1, $2 WHERE email = $1"
+    assert query.pyformat_text == "SELECT %(user_email)s, %(limit)s WHERE email = %(user_email)s"
+    assert query.values({"limit": 5, "user_email": "a@example.com"}) == ("a@example.com", 5)
+
+
+def test_casts_next_to_placeholders_are_kept():
+    query = Query("casts", "SELECT * FROM unnest(@USER_EMAILS::text[], @PRICES::numeric[]) WHERE @ID::int > 0")
+
+    assert query.param_names == ("user_emails", "prices", "id")
+    assert query.positional_text == "SELECT * FROM unnest($1::text[], $2::numeric[]) WHERE $3::int > 0"
+    assert query.pyformat_text == (
+        "SELECT * FROM unnest(%(user_emails)s::text[], %(prices)s::numeric[]) WHERE %(id)s::int > 0"
+    )
+
+
+def test_literal_percent_signs_are_escaped_for_psycopg2():
+    query = Query("like", "SELECT 1 WHERE name LIKE 'a%' AND email = @EMAIL")
+
+    assert query.pyformat_text == "SELECT 1 WHERE name LIKE 'a%%' AND email = %(email)s"
+    assert query.positional_text == "SELECT 1 WHERE name LIKE 'a%' AND email = $1"
+
+
+def test_missing_parameter_names_the_query_and_the_placeholder():
+    query = Query("get_user", "SELECT * FROM subscription_tracker_user WHERE email = @EMAIL AND id = @ID")
+
+    with pytest.raises(QueryParameterError, match="Query get_user is missing the parameter @ID"):
+        query.values({"email": "a@example.com"})
+    with pytest.raises(QueryParameterError):
+        query.named_values({"id": 1})
+
+
+def test_registry_queries_load_with_their_parameters():
+    assert QUERIES["get_list_subscription_page"].param_names == ("user_email", "cursor_end_date", "cursor_id", "limit")
@@ -0,0 +1,125 @@
+import json
+import asyncio
+from datetime import timedelta
+import renewal_scheduler
+from renewal_scheduler import RenewalHeap, RenewalScheduler, LocalEventSink, utc_now
+
+
+def make_scheduler():
+    scheduler = RenewalScheduler(LocalEventSink(), horizon_days=30, reload_seconds=3600, load_batch_size=100)
+    scheduler._loaded_until = utc_now() + timedelta(days=30)
+
+    return scheduler
+
+
+def notification(scheduler, user_email, subscription_name, due_at, deleted=False):
+    payload = json.dumps({
+        "user_email": user_email,
+        "subscription_name": subscription_name,
+        "subscription_period": "1 month",
+        "subscription_end_date": due_at.isoformat(),
+        "deleted": deleted
+    })
+    scheduler._on_notification(None, 0, "subscription_renewals", payload)
+
+
+def test_heap_pops_due_entries_in_order_and_skips_removed():
+    now = utc_now()
+    heap = RenewalHeap()
+    heap.push("a@example.com", "music", "1 month", now + timedelta(days=2))
+    heap.push("a@example.com", "video", "1 month", now + timedelta(days=1))
+    heap.push("b@example.com", "cloud", "1 month", now + timedelta(days=3))
+    heap.remove("b@example.com", "cloud")
+
+    due_entries = heap.pop_due(now + timedelta(days=5))
+
+    assert [entry["subscription_name"] for entry in due_entries] == ["video", "music"]
+    assert len(heap) == 0
+
+
+def test_heap_reschedule_keeps_only_the_latest_end_date():
+    now = utc_now()
+    heap = RenewalHeap()
+    heap.push("a@example.com", "music", "1 month", now + timedelta(days=1))
+    heap.push("a@example.com", "music", "1 month", now + timedelta(days=10))
+
+    assert heap.pop_due(now + timedelta(days=2)) == []
+    assert heap.next_due_at() == now + timedelta(days=10)
+
+
+def test_notifications_schedule_and_unschedule():
+    scheduler = make_scheduler()
+    due_at = (utc_now() + timedelta(days=1)).replace(microsecond=0)
+
+    notification(scheduler, "a@example.com", "music", due_at)
+    assert scheduler.heap.next_due_at() == due_at
+
+    notification(scheduler, "a@example.com", "music", due_at, deleted=True)
+    assert len(scheduler.heap) == 0
+
+
+def test_notifications_beyond_the_loaded_window_are_left_to_the_loader():
+    scheduler = make_scheduler()
+    notification(scheduler, "a@example.com", "music", utc_now() + timedelta(days=60))
+
+    assert len(scheduler.heap) == 0
+
+
+def test_notifications_during_a_window_load_are_applied_after_it(monkeypatch):
+    scheduler = make_scheduler()
+    scheduler._loaded_until = None
+    due_at = (utc_now() + timedelta(days=1)).replace(microsecond=0)
+
+    async def fetch(name, params):
+        # The row is deleted and notified while the window snapshot still has it
+        notification(scheduler, "a@example.com", "music", due_at, deleted=True)
+        return [("a@example.com", "music", "1 month", due_at, 1)]
+
+    monkeypatch.setattr(renewal_scheduler, "fetch", fetch)
+    asyncio.run(scheduler._load_window(utc_now() + timedelta(days=30)))
+
+    assert len(scheduler.heap) == 0
+    assert scheduler._loaded_until is not None
+
+
+class FakeConnection:
+    def __init__(self, locked: bool):
+        self.locked = locked
+        self.listeners = {}
+        self.closed = False
+
+    async def fetchval(self, query, *args):
+        return self.locked
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def add_termination_listener(self, callback):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+def test_only_the_worker_holding_the_lock_leads(monkeypatch):
+    connections = [FakeConnection(locked=True), FakeConnection(locked=False)]
+
+    async def connect():
+        return connections.pop(0)
+
+    monkeypatch.setattr(renewal_scheduler, "connect", connect)
+    leader, follower = make_scheduler(), make_scheduler()
+
+    async def elect():
+        return await leader._acquire_leadership(), await follower._acquire_leadership()
+
+    assert asyncio.run(elect()) == (True, False)
+    assert leader.is_leader() and not follower.is_leader()
+    assert "subscription_renewals" in leader._leader_connection.listeners
+    assert leader.stats()["leader"] is True
+
+    asyncio.run(leader._release_leadership())
+    assert not leader.is_leader()
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = 0
+
+    async def refresh():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run():
+        flight = SingleFlight(refresh)
+        first = await asyncio.gather(*(flight() for _ in range(10)))
+        second = await flight()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == [1] * 10
+    assert second == 2
+
+
+def test_callers_share_the_error():
+    async def refresh():
+        await asyncio.sleep(0)
+        raise ValueError("upstream refused")
+
+    async def run():
+        flight = SingleFlight(refresh)
+        return await asyncio.gather(flight(), flight(), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+
+
+def test_cancelled_caller_does_not_cancel_the_call_for_others():
+    async def refresh():
+        await asyncio.sleep(0.02)
+        return "token"
+
+    async def run():
+        flight = SingleFlight(refresh)
+        cancelled_caller = asyncio.ensure_future(flight())
+        other_caller = asyncio.ensure_future(flight())
+        await asyncio.sleep(0.005)
+        cancelled_caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled_caller
+        return await other_caller
+
+    assert asyncio.run(run()) == "token"
@@ -0,0 +1,79 @@
+import asyncio
+from subscription_cache import SubscriptionCache, InMemoryCacheBackend
+
+
+def make_cache(list_size: int = 2):
+    return SubscriptionCache(
+        backend=InMemoryCacheBackend(list_size),
+        ttl=60,
+        marker_backend=InMemoryCacheBackend(1000)
+    )
+
+
+def counting_loader():
+    loads = []
+
+    async def load(user_email):
+        loads.append(user_email)
+        return [{"subscription_name": f"{user_email}-music-{len(loads)}"}]
+
+    return load, loads
+
+
+def test_entry_is_served_at_the_version_it_was_loaded_at():
+    load, loads = counting_loader()
+
+    async def run():
+        cache = make_cache()
+        first = await cache.get_or_load("a@example.com", 1, load)
+        return first, await cache.get_or_load("a@example.com", 1, load)
+
+    first, second = asyncio.run(run())
+
+    assert first == second
+    assert loads == ["a@example.com"]
+
+
+def test_newer_version_reloads_without_an_invalidation():
+    # A write from another worker or a script only moved the version in the database
+    load, loads = counting_loader()
+
+    async def run():
+        cache = make_cache()
+        await cache.get_or_load("a@example.com", 1, load)
+        reloaded = await cache.get_or_load("a@example.com", 2, load)
+        return reloaded, await cache.get_or_load("a@example.com", 2, load)
+
+    reloaded, cached = asyncio.run(run())
+
+    assert reloaded == cached == [{"subscription_name": "a@example.com-music-2"}]
+    assert len(loads) == 2
+
+
+def test_evicting_lists_keeps_the_recent_write_markers():
+    load, _ = counting_loader()
+
+    async def run():
+        cache = make_cache(list_size=2)
+        await cache.mark_recent_write("a@example.com", 60)
+        for index in range(10):
+            await cache.get_or_load(f"user-{index}@example.com", 1, load)
+        return await cache.wrote_recently("a@example.com")
+
+    assert asyncio.run(run())
+
+
+def test_invalidate_drops_the_list():
+    load, loads = counting_loader()
+
+    async def run():
+        cache = make_cache()
+        await cache.get_or_load("a@example.com", 1, load)
+        await cache.invalidate("a@example.com")
+        await cache.get_or_load("a@example.com", 1, load)
+        return cache.stats()
+
+    stats = asyncio.run(run())
+
+    assert len(loads) == 2
+    assert stats["invalidations"] == 1 and stats["hits"] == 0
@@ -0,0 +1,130 @@
+import asyncio
+import httpx
+import pytest
+from contextlib import asynccontextmanager
+import api
+import async_module
+from module import create_jwt
+from subscription_io import (SUBSCRIPTION_IMPORT_MAX_LINE_LENGTH,
+                             ImportSpool,
+                             iter_text_lines,
+                             iter_csv_records,
+                             iter_ndjson_records)
+
+CSV_HEADER = b"subscription_name,subscription_period,subscription_start_date,subscription_price\n"
+
+
+async def upload(*chunks, delay: float = 0.0):
+    for chunk in chunks:
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+async def collect(records):
+    return [record async for record in records]
+
+
+def test_line_without_a_newline_is_rejected_before_it_is_buffered():
+    consumed = []
+
+    async def endless_line():
+        while True:
+            consumed.append(1)
+            yield b"x" * 1000
+
+    with pytest.raises(ValueError, match="Line longer than 4096 characters"):
+        asyncio.run(collect(iter_text_lines(endless_line(), max_line_length=4096)))
+    assert len(consumed) == 5
+
+
+def test_quoted_csv_field_spanning_lines_is_bounded_by_the_row_length():
+    rows = upload(CSV_HEADER, b'music,1 month,2025-01-01,"', b"a\n" * 3000)
+
+    with pytest.raises(ValueError, match="CSV row longer than 4096 characters"):
+        asyncio.run(collect(iter_csv_records(rows, max_line_length=4096)))
+
+
+def test_lines_within_the_limit_are_parsed():
+    records = asyncio.run(collect(iter_ndjson_records(upload(b'{"subscription_name": "mus', b'ic"}\n{"a": 1}'))))
+
+    assert records == [{"subscription_name": "music"}, {"a": 1}]
+
+
+def test_spool_keeps_chunks_in_order_past_its_memory_size():
+    spool = ImportSpool(max_memory_bytes=64)
+    spool.write_chunk([("a@example.com", "music")] * 10)
+    spool.write_chunk([("a@example.com", "video")])
+
+    assert [len(rows) for rows in spool.iter_chunks()] == [10, 1]
+    assert spool.rows == 11
+    spool.close()
+
+
+def test_upload_is_read_and_validated_without_a_connection(monkeypatch):
+    copied = []
+    events = []
+
+    class FakeConnection:
+        async def execute(self, query, *args):
+            events.append("execute")
+
+        async def copy_records_to_table(self, table_name, records, columns):
+            copied.extend(records)
+
+    @asynccontextmanager
+    async def transaction():
+        events.append("transaction")
+        yield FakeConnection()
+
+    async def no_op(user_email, *args):
+        pass
+
+    monkeypatch.setattr(async_module, "transaction", transaction)
+    monkeypatch.setattr(async_module, "stick_to_primary", no_op)
+    monkeypatch.setattr(async_module.subscription_cache, "invalidate", no_op)
+
+    async def run():
+        records = iter_csv_records(upload(
+            CSV_HEADER,
+            b"music,1 month,2025-01-31,9.99\n",
+            b"video,one month,2025-01-01,\n",
+            b"cloud,12 month,2025-02-01,\n"
+        ))
+        spool, result = await async_module.spool_import_records("a@example.com", records)
+        assert events == []
+        await async_module.import_spooled_subscriptions("a@example.com", spool)
+        spool.close()
+        return result
+
+    result = asyncio.run(run())
+
+    assert result["imported"] == 2 and result["rejected"] == 1
+    assert result["errors"][0]["index"] == 1
+    assert events == ["transaction", "execute", "execute"]
+    assert [row[1] for row in copied] == ["music", "cloud"]
+
+
+def test_slow_upload_times_out():
+    records = iter_ndjson_records(upload(b'{"subscription_name": "music"}\n', b"\n", delay=0.2))
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(async_module.spool_import_records("a@example.com", records, timeout=0.05))
+
+
+def test_overlong_line_is_a_400():
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            client.cookies.set("cookie_session", create_jwt({"email": "a@example.com"}))
+            return await client.post(
+                "/import-subscriptions",
+                params={"format": "ndjson"},
+                content=b"x" * (SUBSCRIPTION_IMPORT_MAX_LINE_LENGTH + 1),
+                headers={"Authorization": f"Bearer {api.settings.backend_api_secret_key}"}
+            )
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 400
+    assert "Line longer than" in response.json()["detail"]
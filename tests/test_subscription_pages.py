@@ -0,0 +1,92 @@
+import base64
+import asyncio
+import httpx
+import pytest
+from datetime import datetime
+import api
+from database import QUERIES
+from module import (create_jwt,
+                    encode_page_cursor,
+                    decode_page_cursor,
+                    page_query_params,
+                    build_subscription_page)
+
+SUBSCRIPTION_ROWS = [
+    # user_email, subscription_name, subscription_period, subscription_start_date, subscription_end_date, id
+    ("a@example.com", f"service-{row_id}", "1 month", datetime(2025, 1, 1), datetime(2025, 2, 1 + row_id // 3), row_id)
+    for row_id in range(1, 11)
+]
+
+
+def fetch_page(params: dict):
+    """
+    get_list_subscription_page in Python: rows after the (end date, id) cursor in keyset order
+    """
+    position = (params["cursor_end_date"], params["cursor_id"])
+    rows = sorted((row for row in SUBSCRIPTION_ROWS if (row[4], row[5]) > position), key=lambda row: (row[4], row[5]))
+
+    return rows[:params["limit"]]
+
+
+def test_cursor_round_trip():
+    page_cursor = encode_page_cursor(datetime(2025, 3, 31, 12, 30), 42)
+
+    assert decode_page_cursor(page_cursor) == {"cursor_end_date": datetime(2025, 3, 31, 12, 30), "cursor_id": 42}
+    assert decode_page_cursor(None) == {"cursor_end_date": datetime.min, "cursor_id": 0}
+
+
+def test_pages_break_end_date_ties_by_id():
+    seen = []
+    page_cursor = None
+    while True:
+        params, limit = page_query_params("a@example.com", 2, page_cursor)
+        page = build_subscription_page("a@example.com", fetch_page(params), limit)["data"]
+        seen.extend(subscription["subscription_name"] for subscription in page["list_data"])
+        page_cursor = page["next_cursor"]
+        if page_cursor is None:
+            break
+
+    # Three rows share every end date, none is skipped or repeated across page boundaries
+    assert seen == [f"service-{row_id}" for row_id in range(1, 11)]
+    # fetch_page has the same keyset semantics as the query
+    query_text = " ".join(QUERIES["get_list_subscription_page"].text.split())
+    assert "(subscription_end_date, id) > (@CURSOR_END_DATE, @CURSOR_ID) ORDER BY subscription_end_date, id" in query_text
+
+
+def test_limit_is_clamped_and_one_extra_row_is_requested():
+    params, limit = page_query_params("a@example.com", 0)
+
+    assert limit == 1 and params["limit"] == 2
+
+
+@pytest.mark.parametrize("page_cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"2025-01-01T00:00:00").decode(),
+    base64.urlsafe_b64encode(b"yesterday|1").decode(),
+    base64.urlsafe_b64encode(b"2025-01-01T00:00:00|1|2").decode(),
+    base64.urlsafe_b64encode(b"2025-01-01T00:00:00|99999999999999999999").decode(),
+    base64.urlsafe_b64encode(b"2025-01-01T00:00:00+02:00|1").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|1").decode()
+])
+def test_malformed_or_tampered_cursor_is_a_400(page_cursor, monkeypatch):
+    async def get_subscription_version(user_email):
+        return 1
+
+    monkeypatch.setattr(api, "get_subscription_version", get_subscription_version)
+    with pytest.raises(ValueError):
+        decode_page_cursor(page_cursor)
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            client.cookies.set("cookie_session", create_jwt({"email": "a@example.com"}))
+            return await client.get(
+                "/get-subscription-data",
+                params={"limit": 2, "cursor": page_cursor},
+                headers={"Authorization": f"Bearer {api.settings.backend_api_secret_key}"}
+            )
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor !"
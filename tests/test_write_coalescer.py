@@ -0,0 +1,108 @@
+import asyncio
+import asyncpg
+import pytest
+import write_coalescer
+from write_coalescer import WriteCoalescer
+
+
+class StubWrites:
+    """
+    Stand-in single and bulk writes recording every row they write
+    """
+    def __init__(self, bulk_error=None, side_effect_error=None):
+        self.bulk_error = bulk_error
+        self.side_effect_error = side_effect_error
+        self.bulk_calls = []
+        self.single_calls = []
+
+    async def single(self, data):
+        self.single_calls.append(data)
+        if data.get("bad"):
+            raise ValueError("bad row")
+        return {"status": "inserted"}
+
+    async def bulk(self, list_data):
+        self.bulk_calls.append(list_data)
+        if self.bulk_error is not None:
+            raise self.bulk_error
+        results = [
+            {"index": index, "status": "error", "detail": "invalid"} if data.get("invalid")
+            else {"index": index, "status": "inserted"}
+            for index, data in enumerate(list_data)
+        ]
+        return results, {data["user_email"] for data in list_data}
+
+    async def after_writes(self, user_emails):
+        if self.side_effect_error is not None:
+            raise self.side_effect_error
+
+
+def submit_all(monkeypatch, stub: StubWrites, list_data: list):
+    monkeypatch.setitem(write_coalescer.WRITE_OPERATIONS, "insert", (stub.single, stub.bulk))
+    monkeypatch.setattr(write_coalescer, "after_subscription_writes", stub.after_writes)
+
+    async def run():
+        coalescer = WriteCoalescer(window_seconds=0.01, max_batch_size=100, max_queue_size=1000)
+        coalescer.start()
+        try:
+            return await asyncio.gather(
+                *(coalescer.submit("insert", data) for data in list_data), return_exceptions=True
+            ), coalescer.stats()
+        finally:
+            await coalescer.stop()
+
+    return asyncio.run(run())
+
+
+def rows(count: int, **extra):
+    return [{"user_email": f"user-{index % 3}@example.com", "index": index, **extra} for index in range(count)]
+
+
+def test_concurrent_writes_are_flushed_as_one_statement(monkeypatch):
+    stub = StubWrites()
+    results, stats = submit_all(monkeypatch, stub, rows(20))
+
+    assert results == [{"index": index, "status": "inserted"} for index in range(20)]
+    assert len(stub.bulk_calls) == 1 and not stub.single_calls
+    assert stats["batches"] == 1
+
+
+def test_invalid_item_fails_only_its_caller(monkeypatch):
+    stub = StubWrites()
+    list_data = rows(3)
+    list_data[1]["invalid"] = True
+    results, _ = submit_all(monkeypatch, stub, list_data)
+
+    assert isinstance(results[1], ValueError)
+    assert results[0]["status"] == "inserted" and results[2]["status"] == "inserted"
+
+
+def test_rejected_statement_is_retried_row_by_row(monkeypatch):
+    stub = StubWrites(bulk_error=asyncpg.NumericValueOutOfRangeError("numeric field overflow"))
+    list_data = rows(3)
+    list_data[2]["bad"] = True
+    results, stats = submit_all(monkeypatch, stub, list_data)
+
+    assert len(stub.single_calls) == 3
+    assert results[0] == results[1] == {"status": "inserted"}
+    assert isinstance(results[2], ValueError)
+    assert stats["fallbacks"] == 1
+
+
+def test_failing_side_effect_never_writes_the_rows_again(monkeypatch):
+    stub = StubWrites(side_effect_error=ConnectionError("redis is down"))
+    results, stats = submit_all(monkeypatch, stub, rows(5))
+
+    assert len(stub.bulk_calls) == 1
+    assert not stub.single_calls
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert stats["fallbacks"] == 0
+
+
+@pytest.mark.parametrize("error", [OSError("connection reset"), asyncio.TimeoutError()])
+def test_connection_errors_fail_the_run_without_retrying(monkeypatch, error):
+    stub = StubWrites(bulk_error=error)
+    results, _ = submit_all(monkeypatch, stub, rows(4))
+
+    assert not stub.single_calls
+    assert all(isinstance(result, type(error)) for result in results)
@@ -0,0 +1,190 @@
+import os
+import asyncio
+import asyncpg
+import traceback
+from itertools import groupby
+from async_module import (insert_new_subscription_data,
+                          delete_subscription_data,
+                          insert_subscriptions_rows,
+                          delete_subscriptions_rows,
+                          after_subscription_writes)
+
+# Define global variables from environment
+WRITE_COALESCER_ENABLED=True if str(os.getenv("WRITE_COALESCER_ENABLED", "False")) == "True" else False
+WRITE_COALESCER_WINDOW_MS=float(os.getenv("WRITE_COALESCER_WINDOW_MS", "5"))
+WRITE_COALESCER_MAX_BATCH_SIZE=int(os.getenv("WRITE_COALESCER_MAX_BATCH_SIZE", "100"))
+WRITE_COALESCER_MAX_QUEUE_SIZE=int(os.getenv("WRITE_COALESCER_MAX_QUEUE_SIZE", "10000"))
+
+# Single write function and the bulk statement a batch of it is flushed with, the
+# post-commit side effects of a batch run separately through after_subscription_writes
+WRITE_OPERATIONS = {
+    "insert": (insert_new_subscription_data, insert_subscriptions_rows),
+    "delete": (delete_subscription_data, delete_subscriptions_rows)
+}
+
+
+class WriteCoalescer:
+    """
+    Group commit for single subscription writes. Callers queue an operation and
+    wait on a future, a background task collects operations for up to window
+    seconds or max_batch_size items and flushes each run of the same operation
+    as one multi-row statement and one commit. Every caller gets the result or
+    error of its own item. Only a statement Postgres rejected is retried row by
+    row, any other error fails the whole run
+    """
+    def __init__(self, window_seconds: float, max_batch_size: int, max_queue_size: int):
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_queue_size = max_queue_size
+        self._queue = None
+        self._queued = None
+        self._task = None
+
+        self.items = 0
+        self.batches = 0
+        self.flushes = 0
+        self.fallbacks = 0
+        self.max_batch_seen = 0
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._queued = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop accepting writes, flush whatever is still queued and end the task
+        """
+        task, self._task = self._task, None
+        if task is not None:
+            await self._queue.put(None)
+            self._queued.set()
+            await task
+
+    async def submit(self, operation: str, data: dict):
+        """
+        Queue one write and wait for its own result, runs it directly when the
+        coalescer is not started
+        """
+        if self._task is None:
+            return await WRITE_OPERATIONS[operation][0](data)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, data, future))
+        self._queued.set()
+
+        return await future
+
+    def _drain(self, batch: list):
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is None:
+                return True
+            batch.append(item)
+
+        return False
+
+    async def _collect(self):
+        """
+        One batch of queued writes and whether stop() was requested
+        """
+        item = await self._queue.get()
+        if item is None:
+            return [], True
+
+        batch = [item]
+        deadline = asyncio.get_running_loop().time() + self.window_seconds
+        while True:
+            self._queued.clear()
+            if self._drain(batch):
+                return batch, True
+            timeout = deadline - asyncio.get_running_loop().time()
+            if len(batch) >= self.max_batch_size or timeout <= 0:
+                return batch, False
+            # Waiting on the event rather than on get() so a timeout never drops a queued item
+            try:
+                await asyncio.wait_for(self._queued.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect()
+            if not batch:
+                continue
+            try:
+                await self._flush(batch)
+            except Exception as error:
+                traceback.print_exc()
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    async def _flush(self, batch: list):
+        self.batches += 1
+        self.items += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+        # Consecutive runs keep the order of writes to the same subscription
+        for operation, run in groupby(batch, key=lambda item: item[0]):
+            await self._flush_run(operation, list(run))
+
+    async def _flush_run(self, operation: str, run: list):
+        single_function, bulk_function = WRITE_OPERATIONS[operation]
+        self.flushes += 1
+        try:
+            results, user_emails = await bulk_function([data for _, data, _ in run])
+        except asyncpg.PostgresError:
+            # Postgres rejected the statement and rolled it back, one bad row fails the
+            # whole statement, so retry one by one and only its caller gets the error
+            self.fallbacks += 1
+            for _, data, future in run:
+                try:
+                    result = await single_function(data)
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+                    continue
+                if not future.done():
+                    future.set_result(result)
+            return
+
+        # The rows are committed from here on, a failing side effect is reported
+        # to the callers like on the single write path but never writes them again
+        side_effect_error = None
+        try:
+            await after_subscription_writes(user_emails)
+        except Exception as error:
+            traceback.print_exc()
+            side_effect_error = error
+
+        for (_, _, future), result in zip(run, results):
+            if future.done():
+                continue
+            if result["status"] == "error":
+                future.set_exception(ValueError(result["detail"]))
+            elif side_effect_error is not None:
+                future.set_exception(side_effect_error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "enabled": self._task is not None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "items": self.items,
+            "batches": self.batches,
+            "flushes": self.flushes,
+            "fallbacks": self.fallbacks,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen
+        }
+
+
+write_coalescer = WriteCoalescer(
+    window_seconds=WRITE_COALESCER_WINDOW_MS / 1000,
+    max_batch_size=WRITE_COALESCER_MAX_BATCH_SIZE,
+    max_queue_size=WRITE_COALESCER_MAX_QUEUE_SIZE
+)